@@ -183,6 +183,9 @@ def generate_node_to_external_map(
 
 @final
 class XnnpackBackend(BackendDetails):
+    # preprocess runs the XNNPACK passes on its own copy of the edge program
+    preprocess_modifies_edge_program = False
+
     @staticmethod
     def preprocess(
         edge_program: ExportedProgram,
@@ -8,16 +8,21 @@
 
 # TODO(T138924864): Refactor to unify the serialization for bundled program and executorch program.
 
+import functools
 import json
 import os
 import tempfile
 
 # @manual=fbsource//third-party/pypi/setuptools:setuptools
 import pkg_resources
+from executorch.bundled_program import schema as bp_schema
 from executorch.bundled_program.schema import BundledProgram
 
 from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
 from executorch.exir._serialize._flatbuffer import _flatc_compile, _flatc_decompile
+from executorch.exir._serialize._flatbuffer_builder import _dataclass_to_flatbuffer
+from executorch.exir._serialize._flatbuffer_schema import _parse_schema, _Schema
+from executorch.exir._serialize._flatbuffer_view import _enum_types, _open_view
 
 # The prefix of schema files used for bundled program
 BUNDLED_PROGRAM_SCHEMA_NAME = "bundled_program_schema"
@@ -32,6 +37,14 @@ def write_schema(d: str, schema_name: str) -> None:
         )
 
 
+@functools.lru_cache(maxsize=1)
+def _bundled_program_schema() -> _Schema:
+    return _parse_schema(
+        lambda name: pkg_resources.resource_string(__name__, name),
+        "{}.fbs".format(BUNDLED_PROGRAM_SCHEMA_NAME),
+    )
+
+
 def serialize_from_bundled_program_to_json(bundled_program: BundledProgram) -> str:
     return json.dumps(bundled_program, cls=_DataclassEncoder)
 
@@ -87,8 +100,10 @@ def serialize_from_bundled_program_to_flatbuffer(
         The serialized FlatBuffer binary data in bytes.
     """
 
-    return convert_to_flatbuffer(
-        serialize_from_bundled_program_to_json(bundled_program)
+    return _dataclass_to_flatbuffer(
+        bundled_program,
+        _bundled_program_schema(),
+        size_hint=2 * len(bundled_program.program),
     )
 
 
@@ -103,4 +118,7 @@ def deserialize_from_flatbuffer_to_bundled_program(flatbuffer: bytes) -> Bundled
     Returns:
         A `BundledProgram` instance.
     """
-    return deserialize_from_json_to_bundled_program(convert_from_flatbuffer(flatbuffer))
+    schema = _bundled_program_schema()
+    return _open_view(flatbuffer, schema, _enum_types(bp_schema, schema)).to_dataclass(
+        bp_schema
+    )
@@ -15,18 +15,19 @@ from typing import Any, List
 import torch
 import yaml
 from executorch.codegen.tools.yaml_util import BlankLineDumper
-from executorch.exir._serialize import _deserialize_pte_binary
+from executorch.exir._serialize import _ProgramView
 from executorch.exir.schema import Operator
 
 
 def get_operators(model_file: str) -> List[Operator]:
     print("Processing model file: ", model_file)
-    with open(model_file, "rb") as f:
-        flatbuffer = f.read()
-    program = _deserialize_pte_binary(flatbuffer)
-    print(f"Program loaded from model file: {model_file}")
-    operators = program.execution_plan[0].operators
-    return operators
+    # Only the operator table is decoded; the rest of the file is never read.
+    with _ProgramView.from_file(model_file) as program:
+        print(f"Program loaded from model file: {model_file}")
+        return [
+            Operator(name=op.name, overload=op.overload)
+            for op in program.execution_plan[0].operators
+        ]
 
 
 def dump_yaml(model_file: str, output_file: str) -> None:
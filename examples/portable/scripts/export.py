@@ -40,4 +40,4 @@ if __name__ == "__main__":
     )
 
     prog = export_to_exec_prog(model, example_inputs)
-    save_pte_program(prog.buffer, args.model_name)
+    save_pte_program(prog, args.model_name)
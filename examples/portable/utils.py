@@ -78,11 +78,18 @@ def export_to_exec_prog(
     return exec_prog
 
 
-def save_pte_program(buffer: bytes, model_name: str) -> None:
+def save_pte_program(
+    program: Union[bytes, ExecutorchProgramManager], model_name: str
+) -> None:
     filename = f"{model_name}.pte"
     try:
-        with open(filename, "wb") as file:
-            file.write(buffer)
-            logging.info(f"Saved exported program to {filename}")
+        if isinstance(program, ExecutorchProgramManager):
+            # Streams the program to the file without serializing it into a
+            # single buffer first.
+            program.write_to(filename)
+        else:
+            with open(filename, "wb") as file:
+                file.write(program)
+        logging.info(f"Saved exported program to {filename}")
     except Exception as e:
         logging.error(f"Error while saving to {filename}: {e}")
@@ -191,7 +191,7 @@ if __name__ == "__main__":
 
     start = time.perf_counter()
     prog = edge_m.to_executorch(None)
-    save_pte_program(prog.buffer, f"{args.model_name}_quantized")
+    save_pte_program(prog, f"{args.model_name}_quantized")
     end = time.perf_counter()
     logging.info(f"Save time: {end - start}s")
     logging.info("finished")
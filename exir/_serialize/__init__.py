@@ -7,12 +7,20 @@
 # pyre-strict
 
 from executorch.exir._serialize._program import (
+    delegate_segment_report as _delegate_segment_report,
     deserialize_pte_binary as _deserialize_pte_binary,
+    ProgramView as _ProgramView,
+    SegmentExtractionReport as _SegmentExtractionReport,
     serialize_pte_binary as _serialize_pte_binary,
+    write_pte_binary as _write_pte_binary,
 )
 
 # Internal APIs that should not be used outside of exir.
 __all__ = [
+    "_delegate_segment_report",
     "_deserialize_pte_binary",
+    "_ProgramView",
+    "_SegmentExtractionReport",
     "_serialize_pte_binary",
+    "_write_pte_binary",
 ]
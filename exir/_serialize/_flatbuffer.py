@@ -13,7 +13,7 @@ import subprocess
 import tempfile
 
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Sequence
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 
 def _is_valid_alignment(alignment: int) -> bool:
@@ -106,6 +106,10 @@ class _ResourceFiles:
         for name in self._files.keys():
             self._files[name] = patch_fn(self._files[name])
 
+    def get(self, name: str) -> bytes:
+        """Returns the current contents of the named file."""
+        return self._files[name]
+
     def write_to(self, out_dir: str) -> None:
         """Writes the files to the specified directory. File names are based on
         the original resource names.
@@ -126,20 +130,25 @@ class _SchemaInfo:
     max_alignment: int
 
 
-def _prepare_schema(
-    out_dir: str,
+# Name of the root program schema resource.
+_PROGRAM_SCHEMA_NAME: str = "program.fbs"
+
+# Schema resources included by the root program schema; must also be present.
+_PROGRAM_SCHEMA_DEPS: Sequence[str] = ("scalar_type.fbs",)
+
+
+def _load_program_schemas(
     constant_tensor_alignment: Optional[int] = None,
     delegate_alignment: Optional[int] = None,
-) -> _SchemaInfo:
-    """Returns the path to the program schema file after copying it and its deps
-    into out_dir. May patch the schema contents depending on the parameters to
-    this function.
-    """
-    program_schema = "program.fbs"
-    # Included by the root program schema; must also be present.
-    deps = ["scalar_type.fbs"]
+) -> Tuple[_ResourceFiles, int]:
+    """Loads the program schema and its deps, patching their contents depending
+    on the parameters to this function.
 
-    schemas = _ResourceFiles([program_schema] + deps)
+    Returns:
+        A tuple of (the patched schema files, an alignment value that can
+        satisfy all "force_align" entries found in the patched schema files).
+    """
+    schemas = _ResourceFiles([_PROGRAM_SCHEMA_NAME] + list(_PROGRAM_SCHEMA_DEPS))
 
     # Update annotated alignments in the schema files.
     schemas.patch_files(
@@ -153,12 +162,29 @@ def _prepare_schema(
     get_alignments = _SchemaMaxAlignmentGetter()
     schemas.patch_files(get_alignments)
 
+    return schemas, get_alignments.max_alignment
+
+
+def _prepare_schema(
+    out_dir: str,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+) -> _SchemaInfo:
+    """Returns the path to the program schema file after copying it and its deps
+    into out_dir. May patch the schema contents depending on the parameters to
+    this function.
+    """
+    schemas, max_alignment = _load_program_schemas(
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+    )
+
     # Write the patched schema files to the filesystem.
     schemas.write_to(out_dir)
 
     return _SchemaInfo(
-        root_path=os.path.join(out_dir, program_schema),
-        max_alignment=get_alignments.max_alignment,
+        root_path=os.path.join(out_dir, _PROGRAM_SCHEMA_NAME),
+        max_alignment=max_alignment,
     )
 
 
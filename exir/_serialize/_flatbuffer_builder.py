@@ -0,0 +1,418 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Serializes schema dataclasses directly into flatbuffer binary data.
+
+This avoids the JSON text, temporary files and `flatc` subprocess used by
+`_program_json_to_flatbuffer()`. To produce output that is byte-identical to
+`flatc --binary`, the builder mirrors the C++ `FlatBufferBuilder`, and the
+serializer visits fields in the same order that the `flatc` JSON parser does:
+
+- Strings, vectors and sub-tables are created in declaration order of the
+  dataclass fields, which is the order that `_DataclassEncoder` writes them.
+- Inline table fields are then added from the largest to the smallest scalar
+  size, and within a size from the highest to the lowest field id.
+"""
+
+import struct
+
+from dataclasses import fields
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from executorch.exir._serialize._flatbuffer import (
+    _FlatbufferResult,
+    _load_program_schemas,
+    _PROGRAM_SCHEMA_NAME,
+)
+from executorch.exir._serialize._flatbuffer_schema import (
+    _FieldDef,
+    _OFFSET_FORMAT,
+    _parse_schema,
+    _Schema,
+    _TableDef,
+)
+from executorch.exir.schema import Program
+
+# Sizes of the inline scalars in the order that `flatc` adds them to tables.
+_FIELD_SIZE_ORDER: Sequence[int] = (8, 4, 2, 1)
+
+# The size of a uoffset_t/soffset_t, which also prefixes vectors and strings.
+_UOFFSET_SIZE: int = 4
+
+
+def _padding_bytes(buf_size: int, scalar_size: int) -> int:
+    """Returns the padding needed to align `buf_size` to `scalar_size`."""
+    return (-buf_size) & (scalar_size - 1)
+
+
+class _FlatbufferBuilder:
+    """Builds a flatbuffer back-to-front in a single growing buffer.
+
+    Offsets returned by this class are measured from the end of the buffer,
+    like the offsets returned by the C++ `FlatBufferBuilder`.
+    """
+
+    def __init__(self, initial_size: int = 1024) -> None:
+        # The data lives at the end of the buffer, in `_buf[_head:]`.
+        self._buf: bytearray = bytearray(max(initial_size, 64))
+        self._head: int = len(self._buf)
+        self._minalign: int = 1
+        # (voffset, offset) of each field added to the current table.
+        self._field_locs: List[Tuple[int, int]] = []
+        self._max_voffset: int = 0
+        # Maps the contents of each vtable to its offset, for deduplication.
+        self._vtables: Dict[bytes, int] = {}
+
+    def size(self) -> int:
+        """Returns the number of bytes written so far."""
+        return len(self._buf) - self._head
+
+    def _reserve(self, length: int) -> int:
+        """Makes room for `length` more bytes and returns their start index."""
+        if length > self._head:
+            used = self.size()
+            new_size = max(2 * len(self._buf), used + length)
+            new_buf = bytearray(new_size)
+            new_buf[new_size - used :] = memoryview(self._buf)[self._head :]
+            self._buf = new_buf
+            self._head = new_size - used
+        self._head -= length
+        return self._head
+
+    def _fill(self, length: int) -> None:
+        """Writes `length` zero bytes."""
+        if length > 0:
+            start = self._reserve(length)
+            self._buf[start : start + length] = bytes(length)
+
+    def _track_min_align(self, alignment: int) -> None:
+        if alignment > self._minalign:
+            self._minalign = alignment
+
+    def _align(self, elem_size: int) -> None:
+        """Pads so that the next `elem_size` bytes written are aligned."""
+        self._track_min_align(elem_size)
+        self._fill(_padding_bytes(self.size(), elem_size))
+
+    def _pre_align(self, length: int, alignment: int) -> None:
+        """Pads so that, after writing `length` bytes, the data is aligned."""
+        if length == 0:
+            return
+        self._track_min_align(alignment)
+        self._fill(_padding_bytes(self.size() + length, alignment))
+
+    def _push_bytes(self, data: Any) -> None:
+        """Writes raw bytes without any alignment."""
+        length = len(data)
+        if length > 0:
+            start = self._reserve(length)
+            self._buf[start : start + length] = data
+
+    def _push_scalar(self, fmt: str, value: Any) -> int:
+        """Writes an aligned scalar and returns its offset."""
+        size = struct.calcsize(fmt)
+        self._align(size)
+        struct.pack_into("<" + fmt, self._buf, self._reserve(size), value)
+        return self.size()
+
+    def _refer_to(self, offset: int) -> int:
+        """Returns the relative uoffset_t value to write to point at `offset`."""
+        self._align(_UOFFSET_SIZE)
+        return self.size() - offset + _UOFFSET_SIZE
+
+    def create_string(self, value: str) -> int:
+        """Writes a null-terminated string and returns its offset."""
+        data = value.encode("utf-8")
+        self._pre_align(len(data) + 1, _UOFFSET_SIZE)
+        self._fill(1)
+        self._push_bytes(data)
+        return self._push_scalar(_OFFSET_FORMAT, len(data))
+
+    def create_scalar_vector(
+        self,
+        fmt: str,
+        values: Any,
+        force_align: Optional[int] = None,
+    ) -> int:
+        """Writes a vector of scalars and returns its offset.
+
+        Args:
+            fmt: The `struct` format character of the elements.
+            values: The elements. If `fmt` is a single-byte type, may also be
+                a bytes-like object, which is copied without conversion.
+            force_align: If provided, the alignment of the first element.
+        """
+        elem_size = struct.calcsize(fmt)
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            assert elem_size == 1, f"Cannot write bytes as a vector of {fmt}"
+            data = values
+        else:
+            data = struct.pack(f"<{len(values)}{fmt}", *values)
+        count = len(data) // elem_size
+        if force_align is not None and force_align > 1 and count > 0:
+            self._pre_align(len(data), force_align)
+        self._pre_align(len(data), _UOFFSET_SIZE)
+        self._pre_align(len(data), elem_size)
+        self._push_bytes(data)
+        return self._push_scalar(_OFFSET_FORMAT, count)
+
+    def create_offset_vector(self, offsets: Sequence[int]) -> int:
+        """Writes a vector of offsets to strings or tables, returning its
+        offset.
+        """
+        self._pre_align(len(offsets) * _UOFFSET_SIZE, _UOFFSET_SIZE)
+        for offset in reversed(offsets):
+            self._push_scalar(_OFFSET_FORMAT, self._refer_to(offset))
+        return self._push_scalar(_OFFSET_FORMAT, len(offsets))
+
+    def start_table(self) -> int:
+        """Starts a new table and returns the value to pass to end_table()."""
+        self._field_locs = []
+        self._max_voffset = 0
+        return self.size()
+
+    def add_scalar(self, voffset: int, fmt: str, value: Any, default: Any) -> None:
+        """Adds a scalar field to the current table unless it is the default."""
+        if value == default:
+            return
+        self._track_field(voffset, self._push_scalar(fmt, value))
+
+    def add_offset(self, voffset: int, offset: int) -> None:
+        """Adds a field pointing to a string, vector or table."""
+        self._track_field(
+            voffset, self._push_scalar(_OFFSET_FORMAT, self._refer_to(offset))
+        )
+
+    def _track_field(self, voffset: int, offset: int) -> None:
+        self._field_locs.append((voffset, offset))
+        self._max_voffset = max(self._max_voffset, voffset)
+
+    def end_table(self, start: int) -> int:
+        """Finishes the current table, writing or reusing its vtable."""
+        table_offset = self._push_scalar("i", 0)
+        vtable_size = max(self._max_voffset + 2, 4)
+        vtable = bytearray(vtable_size)
+        struct.pack_into("<HH", vtable, 0, vtable_size, table_offset - start)
+        for voffset, offset in self._field_locs:
+            struct.pack_into("<H", vtable, voffset, table_offset - offset)
+        key = bytes(vtable)
+
+        vtable_offset = self._vtables.get(key)
+        if vtable_offset is None:
+            self._push_bytes(key)
+            vtable_offset = self.size()
+            self._vtables[key] = vtable_offset
+
+        # Point the table at its vtable.
+        struct.pack_into(
+            "<i",
+            self._buf,
+            len(self._buf) - table_offset,
+            vtable_offset - table_offset,
+        )
+        self._field_locs = []
+        self._max_voffset = 0
+        return table_offset
+
+    def finish(self, root: int, file_identifier: Optional[str]) -> bytes:
+        """Writes the root offset and file identifier, returning the data."""
+        identifier = file_identifier.encode("ascii") if file_identifier else b""
+        self._pre_align(_UOFFSET_SIZE + len(identifier), self._minalign)
+        self._push_bytes(identifier)
+        self._push_scalar(_OFFSET_FORMAT, self._refer_to(root))
+        data = bytes(memoryview(self._buf)[self._head :])
+        # Release the working buffer now that it has been copied.
+        self._buf = bytearray()
+        self._head = 0
+        return data
+
+
+class _DataclassSerializer:
+    """Writes schema dataclasses (like those in exir/schema.py) as flatbuffer
+    tables, matching dataclass fields to schema fields by name.
+    """
+
+    def __init__(self, schema: _Schema, builder: _FlatbufferBuilder) -> None:
+        self._schema = schema
+        self._builder = builder
+
+    def serialize(self, root: Any) -> bytes:
+        """Returns the finished flatbuffer data for the root table `root`."""
+        offset = self._serialize_table(root, self._schema.root_type)
+        return self._builder.finish(offset, self._schema.file_identifier)
+
+    def _serialize_table(self, obj: Any, table_name: str) -> int:
+        schema = self._schema
+        table = schema.tables[table_name]
+        if table.is_struct:
+            raise ValueError(f"Serializing struct {table_name} is not supported")
+        # (field, struct format, value, is_offset) for every field stored
+        # inline in the table. Offset fields hold the offset of their target.
+        inline: List[Tuple[_FieldDef, str, Any, bool]] = []
+        for dc_field in fields(obj):
+            fdef = table.fields_by_name.get(dc_field.name)
+            if fdef is None or fdef.is_union_type:
+                raise ValueError(
+                    f"{type(obj).__name__}.{dc_field.name} is not a field "
+                    + f"of table {table_name}"
+                )
+            value = getattr(obj, dc_field.name)
+            if value is None:
+                # Like `null` in JSON: leave the field unset.
+                continue
+            scalar_fmt = schema.scalar_format(fdef.type_name)
+            if scalar_fmt is not None and not fdef.is_vector:
+                if isinstance(value, str) and scalar_fmt in ("f", "d"):
+                    # Like the JSON parser, accept "inf", "+inf", "nan", etc.
+                    value = float(value)
+                inline.append((fdef, scalar_fmt, value, False))
+                continue
+            if fdef.type_name in schema.unions and not fdef.is_vector:
+                offset = self._serialize_union(table, fdef, value, inline)
+            else:
+                offset = self._serialize_value(fdef, value)
+            inline.append((fdef, _OFFSET_FORMAT, offset, True))
+
+        builder = self._builder
+        start = builder.start_table()
+        inline.sort(key=lambda entry: entry[0].id, reverse=True)
+        for size in _FIELD_SIZE_ORDER:
+            for fdef, fmt, value, is_offset in inline:
+                if _Schema.format_size(fmt) != size:
+                    continue
+                if is_offset:
+                    builder.add_offset(fdef.voffset, value)
+                else:
+                    builder.add_scalar(fdef.voffset, fmt, value, fdef.default)
+        return builder.end_table(start)
+
+    def _serialize_union(
+        self,
+        table: _TableDef,
+        fdef: _FieldDef,
+        value: Any,
+        inline: List[Tuple[_FieldDef, str, Any, bool]],
+    ) -> int:
+        """Writes the member table of a union field and returns its offset.
+        The member index is appended to `inline` as the `<name>_type` field.
+        """
+        union = self._schema.unions[fdef.type_name]
+        member = type(value).__name__
+        if member not in union.members:
+            raise ValueError(f"{member} is not a member of union {fdef.type_name}")
+        index = union.members.index(member)
+        type_fdef = table.fields_by_name[fdef.name + "_type"]
+        inline.append(
+            (type_fdef, self._schema.field_format(type_fdef), index + 1, False)
+        )
+        return self._serialize_table(value, union.member_tables[index])
+
+    def _serialize_value(self, fdef: _FieldDef, value: Any) -> int:
+        """Writes the out-of-line data for a string, vector or table field and
+        returns its offset.
+        """
+        schema = self._schema
+        builder = self._builder
+        if not fdef.is_vector:
+            if fdef.type_name == "string":
+                return builder.create_string(value)
+            return self._serialize_table(value, fdef.type_name)
+
+        scalar_fmt = schema.scalar_format(fdef.type_name)
+        if scalar_fmt is not None:
+            return builder.create_scalar_vector(
+                scalar_fmt, value, force_align=fdef.force_align
+            )
+        if fdef.type_name == "string":
+            return builder.create_offset_vector(
+                [builder.create_string(v) for v in value]
+            )
+        if fdef.type_name in schema.tables:
+            return builder.create_offset_vector(
+                [self._serialize_table(v, fdef.type_name) for v in value]
+            )
+        raise ValueError(f"Unsupported vector type [{fdef.type_name}]")
+
+
+def _program_size_hint(program: Program) -> int:
+    """Estimates the serialized size of the program, so that the builder rarely
+    needs to grow and copy its buffer.
+    """
+    blob_size = sum(len(b.storage) for b in program.constant_buffer) + sum(
+        len(d.data) for d in program.backend_delegate_data
+    )
+    num_blobs = len(program.constant_buffer) + len(program.backend_delegate_data)
+    # Rough upper bounds on the size of each value and instruction table,
+    # including alignment padding.
+    num_values = sum(len(plan.values) for plan in program.execution_plan)
+    num_instructions = sum(
+        len(chain.instructions)
+        for plan in program.execution_plan
+        for chain in plan.chains
+    )
+    return (
+        blob_size
+        + 32 * num_blobs
+        + 128 * num_values
+        + 64 * num_instructions
+        + (1 << 16)
+    )
+
+
+def _program_to_flatbuffer(
+    program: Program,
+    *,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+) -> _FlatbufferResult:
+    """Converts a Program into binary flatbuffer data in-process.
+
+    Produces the same bytes as
+    `_program_json_to_flatbuffer(_program_to_json(program))`.
+
+    Args:
+        program: The Program to serialize.
+        constant_tensor_alignment: If provided, the alignment to use for tensor
+            data embedded in the output flatbuffer data. If not provided, uses
+            the alignment in the schema.
+        delegate_alignment: If provided, the alignment to use for delegate
+            data embedded in the output flatbuffer data. If not provided, uses
+            the alignment in the schema.
+
+    Returns: The flatbuffer data and associated metadata.
+    """
+    schemas, max_alignment = _load_program_schemas(
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+    )
+    return _FlatbufferResult(
+        data=_dataclass_to_flatbuffer(
+            program,
+            _parse_schema(schemas.get, _PROGRAM_SCHEMA_NAME),
+            size_hint=_program_size_hint(program),
+        ),
+        max_alignment=max_alignment,
+    )
+
+
+def _dataclass_to_flatbuffer(root: Any, schema: _Schema, size_hint: int = 0) -> bytes:
+    """Converts a tree of schema dataclasses into binary flatbuffer data.
+
+    `bytes` fields are copied straight into their `[ubyte]` vectors, so large
+    blobs are never expanded into lists of integers along the way.
+
+    Args:
+        root: The dataclass to serialize as the root table of `schema`.
+        schema: The parsed flatbuffer schema that describes `root`.
+        size_hint: The expected size of the output, used to size the initial
+            buffer.
+
+    Returns: The flatbuffer data.
+    """
+    builder = _FlatbufferBuilder(initial_size=max(size_hint, 1024))
+    return _DataclassSerializer(schema, builder).serialize(root)
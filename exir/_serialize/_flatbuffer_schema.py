@@ -0,0 +1,475 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""A minimal parser for the subset of the flatbuffer IDL used by ExecuTorch.
+
+This lets in-process serializers and readers use the exact same (possibly
+alignment-patched) .fbs files that would otherwise be handed to `flatc`, so
+that field ids, types, defaults and `force_align` values always agree with the
+schema instead of being duplicated by hand.
+"""
+
+import re
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Union
+
+# Maps flatbuffer scalar type names to `struct` format characters.
+_SCALAR_FORMATS: Dict[str, str] = {
+    "bool": "?",
+    "byte": "b",
+    "int8": "b",
+    "ubyte": "B",
+    "uint8": "B",
+    "short": "h",
+    "int16": "h",
+    "ushort": "H",
+    "uint16": "H",
+    "int": "i",
+    "int32": "i",
+    "uint": "I",
+    "uint32": "I",
+    "float": "f",
+    "float32": "f",
+    "long": "q",
+    "int64": "q",
+    "ulong": "Q",
+    "uint64": "Q",
+    "double": "d",
+    "float64": "d",
+}
+
+# Size in bytes of each `struct` format character used above.
+_FORMAT_SIZES: Dict[str, int] = {
+    "?": 1,
+    "b": 1,
+    "B": 1,
+    "h": 2,
+    "H": 2,
+    "i": 4,
+    "I": 4,
+    "f": 4,
+    "q": 8,
+    "Q": 8,
+    "d": 8,
+}
+
+# The `struct` format of a union type field, which holds the index of the
+# union member.
+_UNION_TYPE_FORMAT: str = "B"
+
+# The `struct` format of an offset to a string, vector or table.
+_OFFSET_FORMAT: str = "I"
+
+_Scalar = Union[bool, int, float]
+
+
+@dataclass
+class _FieldDef:
+    """A field of a flatbuffer table."""
+
+    # The name of the field.
+    name: str
+    # The field id, which determines the position of the field in the vtable.
+    id: int
+    # The name of the element type: a scalar type name, "string", or the name
+    # of an enum, union or table.
+    type_name: str
+    # True if the field is a vector of `type_name` elements.
+    is_vector: bool = False
+    # True if this is the implicit `<name>_type` field of a union field.
+    is_union_type: bool = False
+    # The default value of a scalar field.
+    default: _Scalar = 0
+    # Attributes of the field, like `force_align`.
+    attributes: Dict[str, str] = field(default_factory=dict)
+    # The byte offset of the field from the start of its struct, if the field
+    # belongs to a struct rather than a table.
+    struct_offset: int = 0
+
+    @property
+    def voffset(self) -> int:
+        """Returns the offset of this field's entry in its table's vtable."""
+        # The vtable begins with two uint16 size entries.
+        return 4 + 2 * self.id
+
+    @property
+    def force_align(self) -> Optional[int]:
+        """Returns the `force_align` attribute value, if present."""
+        value = self.attributes.get("force_align")
+        return int(value) if value is not None else None
+
+
+@dataclass
+class _TableDef:
+    """A flatbuffer table or struct, in field id order.
+
+    Struct fields are stored inline at fixed offsets instead of through a
+    vtable, and whole structs are stored inline in the tables and vectors that
+    contain them.
+    """
+
+    name: str
+    fields: List[_FieldDef]
+    is_struct: bool = False
+    # The size and alignment in bytes of a struct.
+    struct_size: int = 0
+    struct_alignment: int = 1
+
+    def __post_init__(self) -> None:
+        self.fields_by_name: Dict[str, _FieldDef] = {f.name: f for f in self.fields}
+
+
+@dataclass
+class _EnumDef:
+    """A flatbuffer enum and its underlying integer type."""
+
+    name: str
+    underlying_type: str
+    values: Dict[str, int]
+
+
+@dataclass
+class _UnionDef:
+    """A flatbuffer union. Member `i` has type index `i + 1`; zero is NONE."""
+
+    name: str
+    # The names of the union members. These are usually table names, but may
+    # be aliases like `XNNAdd` in `XNNAdd: _XNNNode2x1`.
+    members: List[str]
+    # The names of the tables that each member refers to.
+    member_tables: List[str]
+
+
+@dataclass
+class _Schema:
+    """The parsed contents of a flatbuffer schema and all of its includes."""
+
+    tables: Dict[str, _TableDef]
+    enums: Dict[str, _EnumDef]
+    unions: Dict[str, _UnionDef]
+    root_type: str
+    file_identifier: Optional[str]
+
+    def scalar_format(self, type_name: str) -> Optional[str]:
+        """Returns the `struct` format character of a scalar or enum type, or
+        None if the type is not a scalar.
+        """
+        if type_name in self.enums:
+            type_name = self.enums[type_name].underlying_type
+        return _SCALAR_FORMATS.get(type_name)
+
+    def field_format(self, fdef: _FieldDef) -> str:
+        """Returns the `struct` format of the inline value of a table field."""
+        if fdef.is_union_type:
+            return _UNION_TYPE_FORMAT
+        if fdef.is_vector:
+            return _OFFSET_FORMAT
+        return self.scalar_format(fdef.type_name) or _OFFSET_FORMAT
+
+    @staticmethod
+    def format_size(fmt: str) -> int:
+        """Returns the size in bytes of a `struct` format character."""
+        return _FORMAT_SIZES[fmt]
+
+
+# Splits schema text into identifiers, numbers, strings, and punctuation.
+_TOKEN_RE = re.compile(
+    rb"""
+    \s+ | //[^\n]* | /\*.*?\*/      # Whitespace and comments; skipped.
+    | (?P<string>"[^"]*")
+    | (?P<number>[-+]?[0-9][0-9a-zA-Z_.+-]*)
+    | (?P<ident>[A-Za-z_][A-Za-z0-9_.]*)
+    | (?P<punct>[{}\[\]():;,=])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+class _Tokens:
+    """A stream of tokens from a single schema file."""
+
+    def __init__(self, data: bytes, name: str) -> None:
+        self._name = name
+        self._tokens: List[str] = []
+        pos = 0
+        while pos < len(data):
+            m = _TOKEN_RE.match(data, pos)
+            if m is None:
+                raise ValueError(
+                    f"{name}: unexpected character {data[pos:pos + 1]!r} at {pos}"
+                )
+            pos = m.end()
+            if m.lastgroup is not None:
+                self._tokens.append(m.group(m.lastgroup).decode("utf-8"))
+        self._pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def next(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise ValueError(f"{self._name}: unexpected end of schema")
+        self._pos += 1
+        return token
+
+    def expect(self, expected: str) -> None:
+        token = self.next()
+        if token != expected:
+            raise ValueError(f"{self._name}: expected {expected!r}, got {token!r}")
+
+    def accept(self, expected: str) -> bool:
+        if self.peek() == expected:
+            self._pos += 1
+            return True
+        return False
+
+
+def _unquote(token: str) -> str:
+    return token[1:-1] if token.startswith('"') else token
+
+
+def _unqualified(type_name: str) -> str:
+    """Strips the namespace from a type name like `namespace.Type`."""
+    return type_name.rsplit(".", 1)[-1]
+
+
+def _parse_attributes(tokens: _Tokens) -> Dict[str, str]:
+    """Parses an optional `(key[: value], ...)` metadata list."""
+    attributes: Dict[str, str] = {}
+    if not tokens.accept("("):
+        return attributes
+    while not tokens.accept(")"):
+        key = tokens.next()
+        attributes[key] = _unquote(tokens.next()) if tokens.accept(":") else ""
+        tokens.accept(",")
+    return attributes
+
+
+def _parse_scalar(token: str, type_name: str, enums: Dict[str, _EnumDef]) -> _Scalar:
+    """Parses the default value of a scalar or enum field."""
+    if token in ("true", "false"):
+        return token == "true"
+    if type_name in enums and token in enums[type_name].values:
+        return enums[type_name].values[token]
+    if _SCALAR_FORMATS.get(type_name) in ("f", "d"):
+        return float(token)
+    return int(token, 0)
+
+
+def _layout_struct(struct: _TableDef, enums: Dict[str, _EnumDef]) -> None:
+    """Sets the offsets of the fields of a struct, and its size and alignment.
+
+    Like flatc, aligns each field to its size and pads the struct to the largest
+    field alignment.
+    """
+    offset = 0
+    for fdef in struct.fields:
+        fmt = (
+            _SCALAR_FORMATS.get(enums[fdef.type_name].underlying_type)
+            if fdef.type_name in enums
+            else _SCALAR_FORMATS.get(fdef.type_name)
+        )
+        if fmt is None or fdef.is_vector:
+            raise ValueError(
+                f"struct {struct.name} field {fdef.name} must be a scalar or enum"
+            )
+        size = _FORMAT_SIZES[fmt]
+        offset = (offset + size - 1) // size * size
+        fdef.struct_offset = offset
+        offset += size
+        struct.struct_alignment = max(struct.struct_alignment, size)
+    struct.struct_size = (
+        (offset + struct.struct_alignment - 1)
+        // struct.struct_alignment
+        * struct.struct_alignment
+    )
+
+
+class _SchemaParser:
+    """Parses the declarations of a schema file and the files it includes."""
+
+    def __init__(self, files: Callable[[str], bytes]) -> None:
+        self._files = files
+        self.tables: Dict[str, _TableDef] = {}
+        self.enums: Dict[str, _EnumDef] = {}
+        self.unions: Dict[str, _UnionDef] = {}
+        self.root_type: Optional[str] = None
+        self.file_identifier: Optional[str] = None
+        # Default values may refer to enums, so resolve them after parsing.
+        self.pending_defaults: List[Callable[[], None]] = []
+        self._visited: Set[str] = set()
+
+    def parse_file(self, name: str) -> None:
+        if name in self._visited:
+            return
+        self._visited.add(name)
+        tokens = _Tokens(self._files(name), name)
+        while tokens.peek() is not None:
+            keyword = tokens.next()
+            if keyword == "enum":
+                self._parse_enum(tokens)
+            elif keyword == "union":
+                self._parse_union(tokens)
+            elif keyword in ("table", "struct"):
+                table = self._parse_table(tokens)
+                table.is_struct = keyword == "struct"
+                self.tables[table.name] = table
+            else:
+                self._parse_statement(keyword, tokens, name)
+
+    def _parse_statement(self, keyword: str, tokens: _Tokens, name: str) -> None:
+        """Parses a `<keyword> <value>;` statement."""
+        if keyword == "include":
+            self.parse_file(_unquote(tokens.next()))
+        elif keyword in ("namespace", "attribute", "file_extension"):
+            tokens.next()
+        elif keyword == "file_identifier":
+            self.file_identifier = _unquote(tokens.next())
+        elif keyword == "root_type":
+            self.root_type = _unquote(tokens.next())
+        else:
+            raise ValueError(f"{name}: unexpected token {keyword!r}")
+        tokens.expect(";")
+
+    def _parse_enum(self, tokens: _Tokens) -> None:
+        enum_name = tokens.next()
+        tokens.expect(":")
+        underlying_type = tokens.next()
+        _parse_attributes(tokens)
+        tokens.expect("{")
+        values: Dict[str, int] = {}
+        next_value = 0
+        while not tokens.accept("}"):
+            value_name = tokens.next()
+            if tokens.accept("="):
+                next_value = int(tokens.next(), 0)
+            values[value_name] = next_value
+            next_value += 1
+            tokens.accept(",")
+        self.enums[enum_name] = _EnumDef(enum_name, underlying_type, values)
+
+    def _parse_union(self, tokens: _Tokens) -> None:
+        union_name = tokens.next()
+        _parse_attributes(tokens)
+        tokens.expect("{")
+        members: List[str] = []
+        member_tables: List[str] = []
+        while not tokens.accept("}"):
+            members.append(tokens.next())
+            member_tables.append(
+                _unqualified(tokens.next()) if tokens.accept(":") else members[-1]
+            )
+            if tokens.accept("="):
+                tokens.next()
+            tokens.accept(",")
+        self.unions[union_name] = _UnionDef(union_name, members, member_tables)
+
+    def _parse_table(self, tokens: _Tokens) -> _TableDef:
+        table_name = tokens.next()
+        _parse_attributes(tokens)
+        tokens.expect("{")
+        fields: List[_FieldDef] = []
+        next_id = 0
+        while not tokens.accept("}"):
+            fdef = self._parse_field(tokens, fields, next_id)
+            fields.append(fdef)
+            next_id = fdef.id + 1
+        fields.sort(key=lambda f: f.id)
+        return _TableDef(table_name, fields)
+
+    def _parse_field(
+        self, tokens: _Tokens, fields: List[_FieldDef], next_id: int
+    ) -> _FieldDef:
+        """Parses a table field. The implicit `<name>_type` field of a union
+        field is appended to `fields`; the field itself is returned.
+        """
+        field_name = tokens.next()
+        tokens.expect(":")
+        is_vector = tokens.accept("[")
+        type_name = _unqualified(tokens.next())
+        if is_vector:
+            tokens.expect("]")
+        default_token: Optional[str] = None
+        if tokens.accept("="):
+            default_token = tokens.next()
+        attributes = _parse_attributes(tokens)
+        tokens.expect(";")
+
+        fdef = _FieldDef(
+            name=field_name,
+            id=int(attributes["id"]) if "id" in attributes else next_id,
+            type_name=type_name,
+            is_vector=is_vector,
+            attributes=attributes,
+        )
+        if type_name in self.unions and not is_vector:
+            # Unions are represented by two fields: an implicit `<name>_type`
+            # field holding the member index, followed by the offset to the
+            # member table.
+            if "id" not in attributes:
+                fdef.id += 1
+            fields.append(
+                _FieldDef(
+                    name=field_name + "_type",
+                    id=fdef.id - 1,
+                    type_name=type_name,
+                    is_union_type=True,
+                )
+            )
+        if default_token is not None:
+            self._add_pending_default(fdef, default_token)
+        elif _SCALAR_FORMATS.get(type_name) == "?":
+            fdef.default = False
+        return fdef
+
+    def _add_pending_default(self, fdef: _FieldDef, token: str) -> None:
+        def resolve() -> None:
+            fdef.default = _parse_scalar(token, fdef.type_name, self.enums)
+
+        self.pending_defaults.append(resolve)
+
+
+def _parse_schema(files: Callable[[str], bytes], root_name: str) -> _Schema:
+    """Parses a flatbuffer schema file and the files it includes.
+
+    Only supports the subset of the IDL used by ExecuTorch schemas: includes,
+    namespaces, enums, unions (including aliased members), tables, vectors,
+    attributes and default values. Types from all namespaces share a single
+    scope.
+
+    Args:
+        files: Returns the contents of a schema file given its name.
+        root_name: The name of the root schema file.
+    Returns:
+        The parsed schema.
+    Raises:
+        ValueError: If the schema could not be parsed.
+    """
+    parser = _SchemaParser(files)
+    parser.parse_file(root_name)
+    for resolve in parser.pending_defaults:
+        resolve()
+    for table in parser.tables.values():
+        if table.is_struct:
+            try:
+                _layout_struct(table, parser.enums)
+            except ValueError as e:
+                raise ValueError(f"{root_name}: {e}") from e
+
+    root_type = parser.root_type
+    if root_type is None or root_type not in parser.tables:
+        raise ValueError(f"{root_name}: missing or unknown root_type {root_type!r}")
+    return _Schema(
+        tables=parser.tables,
+        enums=parser.enums,
+        unions=parser.unions,
+        root_type=root_type,
+        file_identifier=parser.file_identifier,
+    )
@@ -0,0 +1,271 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Read-only, lazily-decoded views of binary flatbuffer data.
+
+Tables are only decoded when their fields are accessed, and byte vectors are
+returned as `memoryview` slices of the underlying data, so large buffers are
+never copied unless the caller asks for it.
+"""
+
+import enum
+import struct
+
+from dataclasses import fields
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    overload,
+    Sequence,
+    Union,
+)
+
+from executorch.exir._serialize._flatbuffer_schema import (
+    _FieldDef,
+    _OFFSET_FORMAT,
+    _Schema,
+    _TableDef,
+    _UNION_TYPE_FORMAT,
+)
+
+_Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _read_uoffset(buf: _Buffer, pos: int) -> int:
+    """Returns the absolute position that the uoffset_t at `pos` points to."""
+    return pos + struct.unpack_from("<" + _OFFSET_FORMAT, buf, pos)[0]
+
+
+def _read_string(buf: _Buffer, pos: int) -> str:
+    (length,) = struct.unpack_from("<" + _OFFSET_FORMAT, buf, pos)
+    return bytes(buf[pos + 4 : pos + 4 + length]).decode("utf-8")
+
+
+class _TableView:
+    """A lazily-decoded flatbuffer table or struct.
+
+    Fields are available as attributes with the same names as in the schema.
+    Scalars and strings are decoded on access, `[ubyte]`/`[byte]` vectors are
+    returned as memoryviews, other scalar vectors as lists, and tables,
+    structs, unions and vectors of tables or structs as further views.
+    """
+
+    __slots__ = ("_buf", "_pos", "_table", "_schema", "_enums", "_name")
+
+    def __init__(
+        self,
+        buf: memoryview,
+        pos: int,
+        table: _TableDef,
+        schema: _Schema,
+        enums: Dict[str, Callable[[int], Any]],
+        name: Optional[str] = None,
+    ) -> None:
+        self._buf = buf
+        self._pos = pos
+        self._table = table
+        self._schema = schema
+        # Maps schema enum names to the Python enum classes, or other
+        # functions of the integer value, to decode them as.
+        self._enums = enums
+        # The union member name if this table is a union value, which may be
+        # an alias of the table name.
+        self._name: str = name or table.name
+
+    @property
+    def table_name(self) -> str:
+        """The schema name of this table's type, or its union member name."""
+        return self._name
+
+    def _field_pos(self, fdef: _FieldDef) -> int:
+        """Returns the absolute position of a field's inline data, or zero if
+        the field is not present.
+        """
+        if self._table.is_struct:
+            return self._pos + fdef.struct_offset
+        vtable = self._pos - struct.unpack_from("<i", self._buf, self._pos)[0]
+        (vtable_size,) = struct.unpack_from("<H", self._buf, vtable)
+        if fdef.voffset >= vtable_size:
+            return 0
+        (field_offset,) = struct.unpack_from("<H", self._buf, vtable + fdef.voffset)
+        return self._pos + field_offset if field_offset else 0
+
+    def _table_view(
+        self, pos: int, table_name: str, name: Optional[str] = None
+    ) -> "_TableView":
+        return _TableView(
+            self._buf,
+            pos,
+            self._schema.tables[table_name],
+            self._schema,
+            self._enums,
+            name,
+        )
+
+    def _is_struct(self, type_name: str) -> bool:
+        table = self._schema.tables.get(type_name)
+        return table is not None and table.is_struct
+
+    def __getattr__(self, name: str) -> Any:
+        fdef = self._table.fields_by_name.get(name)
+        if fdef is None:
+            raise AttributeError(f"Table {self._table.name} has no field {name!r}")
+        schema = self._schema
+        pos = self._field_pos(fdef)
+
+        if fdef.is_union_type:
+            if not pos:
+                return None
+            (index,) = struct.unpack_from("<" + _UNION_TYPE_FORMAT, self._buf, pos)
+            return schema.unions[fdef.type_name].members[index - 1] if index else None
+
+        scalar_fmt = schema.scalar_format(fdef.type_name)
+        if scalar_fmt is not None and not fdef.is_vector:
+            value = (
+                struct.unpack_from("<" + scalar_fmt, self._buf, pos)[0]
+                if pos
+                else fdef.default
+            )
+            enum_type = self._enums.get(fdef.type_name)
+            return enum_type(value) if enum_type is not None else value
+
+        if not pos:
+            return None
+        if not fdef.is_vector and self._is_struct(fdef.type_name):
+            # Structs are stored inline.
+            return self._table_view(pos, fdef.type_name)
+        target = _read_uoffset(self._buf, pos)
+        if fdef.type_name in schema.unions and not fdef.is_vector:
+            union = schema.unions[fdef.type_name]
+            member = getattr(self, fdef.name + "_type")
+            member_table = union.member_tables[union.members.index(member)]
+            return self._table_view(target, member_table, member)
+        if not fdef.is_vector:
+            if fdef.type_name == "string":
+                return _read_string(self._buf, target)
+            return self._table_view(target, fdef.type_name)
+
+        (length,) = struct.unpack_from("<" + _OFFSET_FORMAT, self._buf, target)
+        start = target + 4
+        if scalar_fmt is not None:
+            size = _Schema.format_size(scalar_fmt)
+            if size == 1 and scalar_fmt != "?":
+                return self._buf[start : start + length]
+            return list(struct.unpack_from(f"<{length}{scalar_fmt}", self._buf, start))
+        return _VectorView(self, start, length, fdef.type_name)
+
+    def to_dataclass(self, module: Any) -> Any:
+        """Recursively copies this table into the dataclass with the same name
+        found in `module`.
+        """
+        cls = getattr(module, self._name)
+        kwargs: Dict[str, Any] = {}
+        for dc_field in fields(cls):
+            kwargs[dc_field.name] = _to_python(
+                getattr(self, dc_field.name), dc_field.type, module
+            )
+        return cls(**kwargs)
+
+    def __repr__(self) -> str:
+        return f"<{self._name} view at {self._pos}>"
+
+
+class _VectorView(Sequence[Any]):
+    """A lazily-decoded vector of strings, tables or structs."""
+
+    def __init__(
+        self, parent: _TableView, start: int, length: int, type_name: str
+    ) -> None:
+        self._parent = parent
+        self._start = start
+        self._length = length
+        self._type_name = type_name
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _get(self, index: int) -> Any:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"Index {index} out of range [0, {self._length})")
+        parent = self._parent
+        if parent._is_struct(self._type_name):
+            # Structs are stored inline, one after another.
+            size = parent._schema.tables[self._type_name].struct_size
+            return parent._table_view(self._start + size * index, self._type_name)
+        target = _read_uoffset(parent._buf, self._start + 4 * index)
+        if self._type_name == "string":
+            return _read_string(parent._buf, target)
+        return parent._table_view(target, self._type_name)
+
+    @overload
+    def __getitem__(self, index: int) -> Any:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Any]:
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(self._length))]
+        return self._get(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._length):
+            yield self._get(i)
+
+    def __repr__(self) -> str:
+        return f"<[{self._type_name}] view of length {self._length}>"
+
+
+def _to_python(value: Any, hint: Any, module: Any) -> Any:
+    """Converts a decoded view value into the form used by the dataclasses in
+    `module`: bytes for `bytes` fields, lists for vectors, and dataclasses for
+    tables.
+    """
+    if isinstance(value, _TableView):
+        return value.to_dataclass(module)
+    if isinstance(value, _VectorView):
+        return [_to_python(v, None, module) for v in value]
+    if isinstance(value, memoryview):
+        return bytes(value) if hint is bytes else list(value)
+    return value
+
+
+def _open_view(
+    buf: _Buffer,
+    schema: _Schema,
+    enums: Optional[Dict[str, Callable[[int], Any]]] = None,
+) -> _TableView:
+    """Returns a view of the root table of the flatbuffer data in `buf`."""
+    view = memoryview(buf)
+    if len(view) < 8:
+        raise ValueError(f"Flatbuffer data length {len(view)} < 8")
+    return _TableView(
+        view,
+        _read_uoffset(view, 0),
+        schema.tables[schema.root_type],
+        schema,
+        enums or {},
+    )
+
+
+def _enum_types(module: Any, schema: _Schema) -> Dict[str, Callable[[int], Any]]:
+    """Returns the enum classes in `module` that share names with schema enums."""
+    enums: Dict[str, Callable[[int], Any]] = {}
+    for name in schema.enums:
+        cls = getattr(module, name, None)
+        if isinstance(cls, enum.EnumMeta):
+            enums[name] = cls
+    return enums
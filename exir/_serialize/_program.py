@@ -7,25 +7,55 @@
 # pyre-strict
 
 import copy
+import functools
 import json
+import logging
+import mmap
+import os
 import re
 
 from dataclasses import dataclass
-from typing import ClassVar, List, Literal, Optional, Tuple
+from types import TracebackType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from executorch.exir import schema
 
 from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
 from executorch.exir._serialize._flatbuffer import (
     _FlatbufferResult,
-    _program_flatbuffer_to_json,
-    _program_json_to_flatbuffer,
+    _load_program_schemas,
+    _PROGRAM_SCHEMA_NAME,
+)
+from executorch.exir._serialize._flatbuffer_builder import _program_to_flatbuffer
+from executorch.exir._serialize._flatbuffer_schema import _parse_schema, _Schema
+from executorch.exir._serialize._flatbuffer_view import (
+    _enum_types,
+    _open_view,
+    _TableView,
 )
 
 from executorch.exir.schema import (
+    BackendDelegate,
     BackendDelegateDataReference,
     BackendDelegateInlineData,
+    Buffer,
     DataLocation,
     DataSegment,
     Program,
+    SubsegmentOffsets,
 )
 
 
@@ -34,6 +64,25 @@ from executorch.exir.schema import (
 # endian.
 _HEADER_BYTEORDER: Literal["little"] = "little"
 
+# A piece of serialized program data.
+_Chunk = Union[bytes, memoryview]
+
+# The data of a segment: either a single blob, or pieces to be written
+# back-to-back.
+_Segment = Union[bytes, List[_Chunk]]
+
+# Alignment of each tensor in the constant segment if no constant tensor
+# alignment is provided. Matches the default force_align value of
+# Buffer.storage in program.fbs.
+_DEFAULT_CONSTANT_TENSOR_ALIGNMENT: int = 16
+
+
+def _segment_size(segment: _Segment) -> int:
+    """Returns the size of a segment's data in bytes."""
+    if isinstance(segment, list):
+        return sum(len(chunk) for chunk in segment)
+    return len(segment)
+
 
 def _program_to_json(program: Program) -> str:
     """Returns the JSON representation of the given Program."""
@@ -59,10 +108,14 @@ def _aligned_size(input_size: int, alignment: int) -> int:
     return input_size + _padding_required(input_size, alignment)
 
 
-def _insert_flatbuffer_header(
+def _flatbuffer_header_chunks(
     flatbuffer_data: bytes, magic_regex: str, header_data: bytes
-) -> bytes:
-    """Inserts a header just after the magic string of the provided flatbuffer data.
+) -> List[_Chunk]:
+    """Returns pieces that, when concatenated, form the provided flatbuffer data
+    with a header inserted just after its magic string.
+
+    Avoids copying `flatbuffer_data`, which can be O(10MB to 100MB); the last
+    piece is a view of it.
 
     Args:
         flatbuffer_data: The input data to modify.
@@ -73,7 +126,7 @@ def _insert_flatbuffer_header(
             guaranteed that its length is a power of 2 >= the largest
             force_align value in the schema.
     Returns:
-        The modified flatbuffer_data with header_data inserted.
+        The pieces of the modified flatbuffer_data.
     Raises:
         ValueError: If flatbuffer_data is too short to be valid.
         ValueError: If the magic bytes of flatbuffer_data does not match
@@ -93,24 +146,39 @@ def _insert_flatbuffer_header(
             + f"does not match pattern /{magic_regex}/"
         )
 
-    # Avoid a potentially big allocation/copy if there's nothing to do.
     if len(header_data) == 0:
-        return flatbuffer_data
+        return [flatbuffer_data]
 
     # We will need to adjust the root object offset after inserting the header.
     root_offset = int.from_bytes(flatbuffer_data[0:4], byteorder=_HEADER_BYTEORDER)
 
-    return (
+    return [
         # New root offset.
         (root_offset + len(header_data)).to_bytes(4, byteorder=_HEADER_BYTEORDER)
         # Existing magic bytes.
-        + flatbuffer_data[4:8]
+        + flatbuffer_data[4:8],
         # Provided header + padding.
-        + header_data
-        # Remainder of the file. Note that this can be O(10MB to 100MB), so it
-        # can trigger a large allocation + copy.
-        + flatbuffer_data[8:]
-    )
+        header_data,
+        # Remainder of the file.
+        memoryview(flatbuffer_data)[8:],
+    ]
+
+
+def _insert_flatbuffer_header(
+    flatbuffer_data: bytes, magic_regex: str, header_data: bytes
+) -> bytes:
+    """Inserts a header just after the magic string of the provided flatbuffer data.
+
+    See `_flatbuffer_header_chunks()` for a description of the arguments.
+
+    Returns:
+        The modified flatbuffer_data with header_data inserted.
+    """
+    chunks = _flatbuffer_header_chunks(flatbuffer_data, magic_regex, header_data)
+    # Avoid a potentially big allocation/copy if there's nothing to do.
+    if len(chunks) == 1:
+        return flatbuffer_data
+    return b"".join(chunks)
 
 
 @dataclass
@@ -237,20 +305,115 @@ def _get_extended_header(program_data: bytes) -> Optional[_ExtendedHeader]:
     return None
 
 
+@dataclass
+class SegmentExtractionReport:
+    """Describes where delegate data was placed when extracting segments."""
+
+    # The number of delegate blobs moved into segments, and their total size.
+    num_segments: int = 0
+    segment_bytes: int = 0
+    # The number of non-empty delegate blobs that the extraction policy kept
+    # inline in the flatbuffer, and their total size.
+    num_inline: int = 0
+    inline_bytes: int = 0
+    # Alignment padding between the extracted segments.
+    padding_bytes: int = 0
+    # An estimate of the alignment padding that would have been added if the
+    # inline blobs had been extracted too. Only counts the padding between
+    # segments: the padding before the first segment depends on the final size
+    # of the flatbuffer data, and inline blobs may be padded to
+    # `delegate_alignment` inside it, so neither is included.
+    padding_bytes_saved: int = 0
+    # The number of distinct delegate data entries that were identical to a blob
+    # already placed in a segment or kept inline, and so share it, and the bytes
+    # that saved. Delegates that already shared an entry aren't counted.
+    num_deduplicated: int = 0
+    deduplicated_bytes: int = 0
+
+
+def _segments_padding(sizes: List[int], alignment: int) -> int:
+    """Returns the padding between back-to-back segments of the given sizes
+    when each segment starts at a multiple of `alignment`.
+    """
+    # The last segment doesn't need padding after it.
+    return sum(_padding_required(size, alignment) for size in sizes[:-1])
+
+
+def _get_inline_data(
+    program: Program, delegate: BackendDelegate
+) -> BackendDelegateInlineData:
+    """Returns the entry of Program.backend_delegate_data that `delegate` refers
+    to.
+    """
+    if delegate.processed.location != DataLocation.INLINE:
+        raise ValueError(
+            f"Program must only contain inline delegate data, saw {repr(delegate)}"
+        )
+    try:
+        return program.backend_delegate_data[delegate.processed.index]
+    except IndexError:
+        raise ValueError(
+            f"Delegate processed index {delegate.processed.index} "
+            + ">= len(Program.backend_delegate_data) "
+            + f"{len(program.backend_delegate_data)} "
+            + f"in {repr(delegate)}"
+        )
+
+
+def _dedup_index(data: bytes, index_by_data: Dict[bytes, int]) -> Tuple[int, bool]:
+    """Returns the index of the first blob with the same data as `data`, and
+    whether there was one. Otherwise, `data` is assigned the next index.
+    """
+    index = index_by_data.get(data)
+    if index is not None:
+        return (index, True)
+    index = len(index_by_data)
+    index_by_data[data] = index
+    return (index, False)
+
+
+def _append_segment(program: Program, size: int, segment_alignment: int) -> None:
+    """Appends a segment of `size` bytes to the segment list of `program`,
+    aligned after the previous segment.
+    """
+    prev_end = (
+        program.segments[-1].offset + program.segments[-1].size
+        if program.segments
+        else 0
+    )
+    program.segments.append(
+        DataSegment(
+            offset=_aligned_size(prev_end, segment_alignment),
+            size=size,
+        ),
+    )
+
+
 def _extract_segments(
-    program: Program, segment_alignment: int
-) -> Tuple[Program, List[bytes]]:
+    program: Program,
+    segment_alignment: int,
+    min_segment_size: int = 0,
+    should_extract: Optional[Callable[[BackendDelegate], bool]] = None,
+) -> Tuple[Program, List[bytes], SegmentExtractionReport]:
     """Moves data from the Program into a list of segments.
 
-    The returned program is a copy of `program`. Program.segments parallels the
-    returned list of buffers.
+    The returned program is a shallow copy of `program` that shares its data
+    blobs and constant buffers; `program` itself is not modified.
+    Program.segments parallels the returned list of buffers.
 
     Args:
         program: The program to extract segments from.
         segment_alignment: Alignment in bytes. The starting offset of each
             segment will be aligned to this value.
+        min_segment_size: Delegate data smaller than this many bytes stays
+            inline in the flatbuffer instead of taking up its own aligned
+            segment.
+        should_extract: If provided, called for each delegate whose data is at
+            least `min_segment_size` bytes; the data stays inline if it returns
+            False.
     Returns:
-        A tuple of (modified program, list of segment data).
+        A tuple of (modified program, list of segment data, report describing
+        which delegate data was extracted).
     """
     if program.segments:
         raise ValueError(
@@ -258,64 +421,61 @@ def _extract_segments(
             + f"{repr(program.segments)}"
         )
 
-    # Don't modify the original program.
-    # TODO(T144120904): Could avoid yet more huge copies with a more shallow
-    # copy, reusing the actual data blobs.
-    program = copy.deepcopy(program)
+    # Don't modify the original program. Only the segment table, the delegate
+    # data list and the delegates' data references change, so copy just the
+    # objects on the path to them. The constant buffers and the delegate data
+    # blobs themselves are shared with the original program.
+    program = copy.copy(program)
+    program.segments = []
+    program.execution_plan = [copy.copy(plan) for plan in program.execution_plan]
+    for plan in program.execution_plan:
+        plan.delegates = [copy.copy(delegate) for delegate in plan.delegates]
 
     segments: List[bytes] = []
     remaining_inline: List[BackendDelegateInlineData] = []
+    # Map the data of each segment and remaining inline blob to its index, so
+    # that delegates with identical data, in any execution plan, share one copy.
+    segment_index_by_data: Dict[bytes, int] = {}
+    inline_index_by_data: Dict[bytes, int] = {}
+    num_deduplicated: int = 0
+    deduplicated_bytes: int = 0
     inline_indices_seen: set[int] = set()
+    # Sizes of the non-empty blobs that were kept inline.
+    inline_sizes: List[int] = []
     for plan in program.execution_plan:
         for delegate in plan.delegates:
-            if delegate.processed.location != DataLocation.INLINE:
-                raise ValueError(
-                    "Program must only contain inline delegate data, "
-                    + f"saw {repr(delegate)}"
-                )
-            # TODO(T144120904): Don't extract small blobs into segments;
-            # have a cutoff. Or callers could provide a callback that
-            # returns true/false for a given BackendDelegate, letting them
-            # use their own logic.
-            try:
-                inline: BackendDelegateInlineData = program.backend_delegate_data[
-                    delegate.processed.index
-                ]
-            except IndexError:
-                raise ValueError(
-                    f"Delegate processed index {delegate.processed.index} "
-                    + ">= len(Program.backend_delegate_data) "
-                    + f"{len(program.backend_delegate_data)} "
-                    + f"in {repr(delegate)}"
-                )
+            inline = _get_inline_data(program, delegate)
+            # Delegates that the emitter already pointed at the same entry
+            # share it without being counted as deduplicated.
+            first_use = delegate.processed.index not in inline_indices_seen
             inline_indices_seen.add(delegate.processed.index)
-            if inline.data:
+            extract = bool(
+                inline.data
+                and len(inline.data) >= min_segment_size
+                and (should_extract is None or should_extract(delegate))
+            )
+            new_index, duplicate = _dedup_index(
+                inline.data,
+                segment_index_by_data if extract else inline_index_by_data,
+            )
+            if duplicate:
+                if first_use and inline.data:
+                    num_deduplicated += 1
+                    deduplicated_bytes += len(inline.data)
+            elif extract:
                 # Move the delegate data out of the program.
-                segment_index = len(segments)
                 segments.append(inline.data)
-                delegate.processed = BackendDelegateDataReference(
-                    location=DataLocation.SEGMENT,
-                    index=segment_index,
-                )
-
-                # Update the segment list in the root Program object.
-                prev_end = (
-                    program.segments[-1].offset + program.segments[-1].size
-                    if program.segments
-                    else 0
-                )
-                program.segments.append(
-                    DataSegment(
-                        offset=_aligned_size(prev_end, segment_alignment),
-                        size=len(inline.data),
-                    ),
-                )
+                _append_segment(program, len(inline.data), segment_alignment)
             else:
                 # Not moving into a segment. Keep it inline, but update the
                 # index.
-                new_index = len(remaining_inline)
+                if inline.data:
+                    inline_sizes.append(len(inline.data))
                 remaining_inline.append(inline)
-                delegate.processed.index = new_index
+            delegate.processed = BackendDelegateDataReference(
+                location=DataLocation.SEGMENT if extract else DataLocation.INLINE,
+                index=new_index,
+            )
 
     # Make sure we visited all entries in backend_delegate_data, so that it's
     # safe to overwrite it.
@@ -331,35 +491,134 @@ def _extract_segments(
     # Preserve any entries that were not moved into segments.
     program.backend_delegate_data = remaining_inline
 
-    return (program, segments)
+    segment_sizes: List[int] = [len(segment) for segment in segments]
+    padding_bytes: int = _segments_padding(segment_sizes, segment_alignment)
+    report = SegmentExtractionReport(
+        num_segments=len(segments),
+        segment_bytes=sum(segment_sizes),
+        num_inline=len(inline_sizes),
+        inline_bytes=sum(inline_sizes),
+        padding_bytes=padding_bytes,
+        padding_bytes_saved=(
+            _segments_padding(segment_sizes + inline_sizes, segment_alignment)
+            - padding_bytes
+        ),
+        num_deduplicated=num_deduplicated,
+        deduplicated_bytes=deduplicated_bytes,
+    )
+    return (program, segments, report)
 
 
-def _append_segments(
-    program_data: bytes,
-    segments: List[bytes],
+def delegate_segment_report(
+    program: Program,
+    segment_alignment: int = 4096,
+    delegate_segment_min_size: int = 0,
+    delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]] = None,
+    extract_segments: bool = True,
+) -> SegmentExtractionReport:
+    """Returns a report of which delegate data of `program` would be moved into
+    segments by `serialize_pte_binary()` with the same arguments, and an
+    estimate of how much segment padding keeping the rest inline saves.
+
+    If `extract_segments` is False, all delegate data stays inline as emitted.
+
+    Does not modify `program`.
+    """
+    if not extract_segments:
+        inline_sizes = [
+            len(inline.data) for inline in program.backend_delegate_data if inline.data
+        ]
+        return SegmentExtractionReport(
+            num_inline=len(inline_sizes),
+            inline_bytes=sum(inline_sizes),
+            padding_bytes_saved=_segments_padding(inline_sizes, segment_alignment),
+        )
+    return _extract_segments(
+        program,
+        segment_alignment=segment_alignment,
+        min_segment_size=delegate_segment_min_size,
+        should_extract=delegate_segment_predicate,
+    )[2]
+
+
+def _extract_constant_segment(
+    program: Program, segment_alignment: int, tensor_alignment: int
+) -> Tuple[Program, List[_Chunk]]:
+    """Moves the data of Program.constant_buffer into a new segment.
+
+    Each tensor starts at an offset aligned to `tensor_alignment` within the
+    segment. The returned program has an empty constant_buffer, an extra entry
+    in segments, and a constant_segment listing the offset of each tensor in
+    the same order as the original constant_buffer.
+
+    Args:
+        program: The program to extract constants from. Not modified.
+        segment_alignment: Alignment in bytes of the start of the new segment.
+        tensor_alignment: Alignment in bytes of each tensor in the segment.
+    Returns:
+        A tuple of (modified program, the pieces of the constant segment data).
+        If there is no constant data, returns the input program and an empty
+        list.
+    """
+    chunks: List[_Chunk] = []
+    offsets: List[int] = []
+    size: int = 0
+    for buffer in program.constant_buffer:
+        pad_length: int = _padding_required(size, tensor_alignment)
+        if pad_length > 0:
+            chunks.append(b"\x00" * pad_length)
+            size += pad_length
+        offsets.append(size)
+        if buffer.storage:
+            chunks.append(buffer.storage)
+            size += len(buffer.storage)
+    if size == 0:
+        # Nothing worth a segment; keep the (empty) buffers inline.
+        return (program, [])
+
+    # Don't modify the original program. Only the top-level fields change, so
+    # a shallow copy is enough.
+    program = copy.copy(program)
+    prev_end = (
+        program.segments[-1].offset + program.segments[-1].size
+        if program.segments
+        else 0
+    )
+    program.segments = program.segments + [
+        DataSegment(offset=_aligned_size(prev_end, segment_alignment), size=size)
+    ]
+    program.constant_segment = SubsegmentOffsets(
+        segment_index=len(program.segments) - 1, offsets=offsets
+    )
+    program.constant_buffer = []
+    return (program, chunks)
+
+
+def _segment_chunks(
+    program_size: int,
+    segments: List[_Segment],
     alignment: int,
     segment_table: List[DataSegment],
     base_offset: int,
-) -> bytes:
-    """Appends segments to the end of the program data.
+) -> Iterator[_Chunk]:
+    """Yields the padding and data of each segment that follows the program
+    data.
 
-    Appends each element of `segments` to `program_data`, with '\0' padding to
-    ensure that the offset of each segment is aligned to `alignment`.
+    Yields each element of `segments` with '\0' padding before it, to ensure
+    that the offset of each segment is aligned to `alignment`.
 
     Args:
-        program_data: The flatbuffer-serialized Program.
-        segments: The list of segments to append to `program_data`.
+        program_size: The size of the flatbuffer-serialized Program that the
+            segments follow.
+        segments: The list of segments to yield.
         alignment: Alignment in bytes. The starting offset of each
             segment will be aligned to this value in the output data.
         segment_table: The expected offsets and sizes of each element in
             `segments`. This is typically `program.segments`. Must have the
             same length as `segments`.
         base_offset: The expected segment base offset from the extended header.
-            Should point to the aligned offset following the end of
-            `program_data`.
-    Returns:
-        A copy of `program_data` with the segment data and padding appended.
-        If there are no segments, returns `program_data` directly.
+            Should point to the aligned offset following the end of the
+            program data.
     Raises:
         ValueError: If the length of `segments` doesn't match the length of
             `segment_table`.
@@ -369,100 +628,130 @@ def _append_segments(
             f"Segments length {len(segments)} does not match "
             + f"segment_table length {len(segment_table)}"
         )
-    if not segments:
-        return program_data
 
-    # The pieces that will be concatenated to create the output data.
-    # `program_data` will be its first element.
-    padded_segments: List[bytes] = []
-    # Length of all elements in padded_segments. Only used for assertions.
-    current_offset: int = 0
-    for i, segment in enumerate([program_data] + segments):
+    current_offset: int = program_size
+    for i, segment in enumerate(segments):
         # Add padding if necessary to align the start of this segment.
         pad_length: int = _padding_required(current_offset, alignment)
         if pad_length > 0:
-            padded_segments.append(b"\x00" * pad_length)
+            yield b"\x00" * pad_length
             current_offset += pad_length
 
         # Make sure that we're about to add this segment to the offset that
-        # agrees with program.segments. Skip the first entry, which is the
-        # Program itself and isn't included in program.segments.
-        if i == 1:
-            # The first real segment should start at the base offset.
+        # agrees with program.segments.
+        if i == 0:
+            # The first segment should start at the base offset.
             assert current_offset == base_offset, (
                 f"Offset of first segment {current_offset} "
                 + f"!= base_offset {base_offset}"
             )
-        if i > 0:
-            # Adding a real segment, not `program_data`.
-            expected_segment = segment_table[i - 1]
-            expected_offset = base_offset + expected_segment.offset
-            assert current_offset == expected_offset, (
-                f"Segment {i} offset {current_offset} "
-                + f"!= expected offset {expected_offset} "
-                + f"(base {base_offset} + {expected_segment.offset}) "
-            )
-            assert expected_segment.size == len(segment), (
-                f"Segment {i} size {len(segment)} "
-                + f"!= expected size {expected_segment.size}"
-            )
+        expected_segment = segment_table[i]
+        expected_offset = base_offset + expected_segment.offset
+        assert current_offset == expected_offset, (
+            f"Segment {i + 1} offset {current_offset} "
+            + f"!= expected offset {expected_offset} "
+            + f"(base {base_offset} + {expected_segment.offset}) "
+        )
+        segment_size: int = _segment_size(segment)
+        assert expected_segment.size == segment_size, (
+            f"Segment {i + 1} size {segment_size} "
+            + f"!= expected size {expected_segment.size}"
+        )
 
         # Add the payload. If this is the final segment, it does not need
         # padding after it.
-        padded_segments.append(segment)
-        current_offset += len(segment)
+        if isinstance(segment, list):
+            yield from segment
+        else:
+            yield segment
+        current_offset += segment_size
+
 
+def _append_segments(
+    program_data: bytes,
+    segments: List[_Segment],
+    alignment: int,
+    segment_table: List[DataSegment],
+    base_offset: int,
+) -> bytes:
+    """Appends segments to the end of the program data.
+
+    See `_segment_chunks()` for a description of the arguments.
+
+    Returns:
+        A copy of `program_data` with the segment data and padding appended.
+        If there are no segments, returns `program_data` directly.
+    """
+    chunks = list(
+        _segment_chunks(
+            len(program_data), segments, alignment, segment_table, base_offset
+        )
+    )
+    if not chunks:
+        return program_data
     # Use join() instead of appending to avoid O(n) reallocation of these
     # potentially-large buffers.
-    return b"".join(padded_segments)
+    return b"".join([program_data] + chunks)
 
 
-def serialize_pte_binary(
+def _pte_chunks(
     program: Program,
     *,
-    extract_segments: bool = False,
-    segment_alignment: int = 4096,
-    constant_tensor_alignment: Optional[int] = None,
-    delegate_alignment: Optional[int] = None,
-) -> bytes:
-    """Returns the runtime binary representation of the given Program.
-
-    Args:
-        program: The Program to serialize.
-        extract_segments: Whether to move certain data blobs from the Program
-            into separate segments, rather than encoding those blobs in the
-            flatbuffer data. When true, will also:
-            - Add an extended header to the output, containing the program size
-              and the starting segment offset.
-            - Update the Program.segments field with the offsets and lengths
-              of each segment.
-        segment_alignment: Alignment in bytes. The starting offset of each
-            segment will be aligned to this value in the output data.
-        constant_tensor_alignment: If provided, the minimum alignment of tensor
-            buffers in the program. Must be a power of 2. If not provided, uses
-            the value in the schema file.
-        delegate_alignment: If provided, the minimum alignment of delegate data
-            in the program. Must be a power of 2. If not provided, uses the
-            value in the schema file.
-    Returns:
-        The serialized form of the Program, ready for execution by the runtime.
+    extract_segments: bool,
+    extract_constant_segment: bool,
+    segment_alignment: int,
+    constant_tensor_alignment: Optional[int],
+    delegate_alignment: Optional[int],
+    delegate_segment_min_size: int,
+    delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]],
+) -> Iterator[_Chunk]:
+    """Yields the pieces of the runtime binary representation of the given
+    Program, in file order.
+
+    See `serialize_pte_binary()` for a description of the arguments.
     """
     # Segment data to be written to the file following the flatbuffer data.
-    segments: List[bytes] = []
+    segments: List[_Segment] = []
     if extract_segments:
         # May return a copy of the program to avoid modifying the input.
-        program, segments = _extract_segments(
-            program=program, segment_alignment=segment_alignment
+        program, delegate_segments, report = _extract_segments(
+            program=program,
+            segment_alignment=segment_alignment,
+            min_segment_size=delegate_segment_min_size,
+            should_extract=delegate_segment_predicate,
         )
-
-    # Convert to a standard flatbuffer binary.
-    result: _FlatbufferResult = _program_json_to_flatbuffer(
-        _program_to_json(program),
+        segments.extend(delegate_segments)
+        if report.num_inline:
+            logging.info(
+                f"Kept {report.num_inline} delegate blobs ({report.inline_bytes} "
+                + f"bytes) inline, saving about {report.padding_bytes_saved} "
+                + "bytes of segment padding"
+            )
+    if extract_constant_segment:
+        # May return a copy of the program to avoid modifying the input.
+        program, constant_segment = _extract_constant_segment(
+            program=program,
+            segment_alignment=segment_alignment,
+            tensor_alignment=(
+                constant_tensor_alignment or _DEFAULT_CONSTANT_TENSOR_ALIGNMENT
+            ),
+        )
+        if constant_segment:
+            segments.append(constant_segment)
+    # Segments require the extended header.
+    add_header: bool = extract_segments or bool(segments)
+
+    # Convert to a standard flatbuffer binary. This writes the Program tables
+    # directly into the output buffer, producing the same bytes as converting
+    # _program_to_json(program) with flatc.
+    result: _FlatbufferResult = _program_to_flatbuffer(
+        program,
         constant_tensor_alignment=constant_tensor_alignment,
         delegate_alignment=delegate_alignment,
     )
-    if not extract_segments:
-        return result.data
+    if not add_header:
+        yield result.data
+        return
 
     # Size of the header to insert. Its size is padded to the largest
     # force_align value present in the schema.
@@ -485,36 +774,150 @@ def serialize_pte_binary(
     ).to_bytes()
     header_data = _pad_to(header_data, padded_header_length)
 
-    # Insert the header into the flatbuffer data.
-    program_data: bytes = _insert_flatbuffer_header(
+    # Double-check that the extended header has the right contents.
+    eh = _get_extended_header(b"\x00" * 8 + header_data)
+    assert eh is not None
+    assert eh.program_size == program_size
+    assert eh.segment_base_offset == segment_base_offset
+
+    # Insert the header into the flatbuffer data, without copying it.
+    yield from _flatbuffer_header_chunks(
         flatbuffer_data=result.data,
         magic_regex=r"ET[0-9a-zA-Z][0-9a-zA-Z]",
         header_data=header_data,
     )
-    assert len(program_data) == program_size
 
-    # Potentially large. Try to free it as soon as we can.
-    del result.data
+    # Add segments to the end of the data, in order, with the appropriate
+    # padding.
+    yield from _segment_chunks(
+        program_size=program_size,
+        segments=segments,
+        alignment=segment_alignment,
+        segment_table=program.segments,
+        base_offset=segment_base_offset,
+    )
 
-    # Double-check that the extended header is in the right place and has the
-    # right contents.
-    eh = _get_extended_header(program_data)
-    assert eh is not None
-    assert eh.program_size == program_size
-    assert eh.segment_base_offset == segment_base_offset
 
-    if segments:
-        # Add segments to the end of the data, in order, with the appropriate
-        # padding.
-        program_data = _append_segments(
-            program_data=program_data,
-            segments=segments,
-            alignment=segment_alignment,
-            segment_table=program.segments,
-            base_offset=segment_base_offset,
+def serialize_pte_binary(
+    program: Program,
+    *,
+    extract_segments: bool = False,
+    extract_constant_segment: bool = False,
+    segment_alignment: int = 4096,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+    delegate_segment_min_size: int = 0,
+    delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]] = None,
+) -> bytes:
+    """Returns the runtime binary representation of the given Program.
+
+    Args:
+        program: The Program to serialize.
+        extract_segments: Whether to move certain data blobs from the Program
+            into separate segments, rather than encoding those blobs in the
+            flatbuffer data. When true, will also:
+            - Add an extended header to the output, containing the program size
+              and the starting segment offset.
+            - Update the Program.segments field with the offsets and lengths
+              of each segment.
+        extract_constant_segment: Whether to move the data of
+            Program.constant_buffer into a segment, so that the runtime can
+            load or mmap constant tensors separately from the flatbuffer data.
+            Tensors in the segment are aligned to `constant_tensor_alignment`,
+            and the segment itself to `segment_alignment`. Also adds the
+            extended header if there is any constant data.
+        segment_alignment: Alignment in bytes. The starting offset of each
+            segment will be aligned to this value in the output data.
+        constant_tensor_alignment: If provided, the minimum alignment of tensor
+            buffers in the program. Must be a power of 2. If not provided, uses
+            the value in the schema file.
+        delegate_alignment: If provided, the minimum alignment of delegate data
+            in the program. Must be a power of 2. If not provided, uses the
+            value in the schema file.
+        delegate_segment_min_size: When extracting segments, delegate data
+            smaller than this many bytes stays inline in the flatbuffer. Each
+            segment is padded to `segment_alignment`, so small blobs can cost
+            more in padding than the ability to mmap them is worth.
+        delegate_segment_predicate: When extracting segments, if provided,
+            called with each BackendDelegate whose data meets
+            `delegate_segment_min_size`. Its data stays inline if this returns
+            False.
+    Returns:
+        The serialized form of the Program, ready for execution by the runtime.
+    """
+    chunks = list(
+        _pte_chunks(
+            program,
+            extract_segments=extract_segments,
+            extract_constant_segment=extract_constant_segment,
+            segment_alignment=segment_alignment,
+            constant_tensor_alignment=constant_tensor_alignment,
+            delegate_alignment=delegate_alignment,
+            delegate_segment_min_size=delegate_segment_min_size,
+            delegate_segment_predicate=delegate_segment_predicate,
         )
+    )
+    if len(chunks) == 1 and isinstance(chunks[0], bytes):
+        return chunks[0]
+    # Use join() instead of appending to avoid O(n) reallocation of these
+    # potentially-large buffers.
+    return b"".join(chunks)
+
+
+def write_pte_binary(
+    program: Program,
+    path_or_file: Union[str, "os.PathLike[str]", BinaryIO],
+    *,
+    extract_segments: bool = False,
+    extract_constant_segment: bool = False,
+    segment_alignment: int = 4096,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+    delegate_segment_min_size: int = 0,
+    delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]] = None,
+) -> int:
+    """Writes the runtime binary representation of the given Program.
 
-    return program_data
+    Produces the same data as `serialize_pte_binary()`, but writes the header,
+    flatbuffer data, padding and each segment sequentially instead of
+    concatenating them into a single buffer first.
+
+    Args:
+        program: The Program to serialize.
+        path_or_file: The path of the file to create or overwrite, or a binary
+            file-like object with a `write()` method to write to.
+        See `serialize_pte_binary()` for a description of the other arguments.
+    Returns:
+        The number of bytes written.
+    """
+    if isinstance(path_or_file, (str, os.PathLike)):
+        with open(path_or_file, "wb") as fp:
+            return write_pte_binary(
+                program,
+                fp,
+                extract_segments=extract_segments,
+                extract_constant_segment=extract_constant_segment,
+                segment_alignment=segment_alignment,
+                constant_tensor_alignment=constant_tensor_alignment,
+                delegate_alignment=delegate_alignment,
+                delegate_segment_min_size=delegate_segment_min_size,
+                delegate_segment_predicate=delegate_segment_predicate,
+            )
+
+    written: int = 0
+    for chunk in _pte_chunks(
+        program,
+        extract_segments=extract_segments,
+        extract_constant_segment=extract_constant_segment,
+        segment_alignment=segment_alignment,
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+        delegate_segment_min_size=delegate_segment_min_size,
+        delegate_segment_predicate=delegate_segment_predicate,
+    ):
+        path_or_file.write(chunk)
+        written += len(chunk)
+    return written
 
 
 def _restore_segments(program: Program, segment_data: bytes) -> Program:
@@ -540,7 +943,9 @@ def _restore_segments(program: Program, segment_data: bytes) -> Program:
             raise ValueError(
                 f"Segment {i} {segment} overflows data length {len(segment_data)}"
             )
-        segments.append(segment_data[segment.offset : segment.offset + segment.size])
+        segments.append(
+            bytes(segment_data[segment.offset : segment.offset + segment.size])
+        )
 
     # Find and replace the Program's references to these segments, inlining the
     # data.
@@ -564,32 +969,154 @@ def _restore_segments(program: Program, segment_data: bytes) -> Program:
                 location=DataLocation.INLINE, index=data_index
             )
 
+    # Move constant tensor data back into constant_buffer. The segment does not
+    # record the size of each tensor, so each buffer also includes any padding
+    # that preceded the next tensor.
+    constant_segment = program.constant_segment
+    if constant_segment is not None and constant_segment.offsets:
+        data = segments[constant_segment.segment_index]
+        ends = constant_segment.offsets[1:] + [len(data)]
+        program.constant_buffer = [
+            Buffer(storage=data[start:end])
+            for start, end in zip(constant_segment.offsets, ends)
+        ]
+    program.constant_segment = None
+
     # Clear out the segments list since the original Program didn't have one.
     program.segments = []
     return program
 
 
-def deserialize_pte_binary(program_data: bytes) -> Program:
-    """Returns a Program deserialized from the given runtime binary data."""
-    program_size = len(program_data)
-    segment_base_offset = 0
+@functools.lru_cache(maxsize=1)
+def _program_schema() -> _Schema:
+    """Returns the parsed program schema used to read serialized programs."""
+    # No need to patch the alignment when reading. "force_align" is only used
+    # during serialization.
+    schemas, _ = _load_program_schemas()
+    return _parse_schema(schemas.get, _PROGRAM_SCHEMA_NAME)
 
-    # Look for an extended header to see if segments follow the flatbuffer
-    # data.
-    eh: Optional[_ExtendedHeader] = _get_extended_header(program_data)
-    if eh and eh.is_valid():
-        program_size = eh.program_size
-        segment_base_offset = eh.segment_base_offset
-
-    # Parse the flatbuffer data.
-    program: Program = _json_to_program(
-        _program_flatbuffer_to_json(program_data[:program_size])
-    )
 
-    if segment_base_offset != 0:
-        # Move segment data back into the Program.
-        program = _restore_segments(
-            program=program, segment_data=program_data[segment_base_offset:]
+class ProgramView:
+    """A read-only view of a serialized program that decodes fields lazily.
+
+    Opening a view only reads the headers; tables such as execution plans,
+    operators, delegates and constant buffers are decoded when their
+    attributes are accessed. Byte vectors like `Buffer.storage` and segment
+    data are returned as `memoryview` slices of the underlying data, so they
+    are never copied. Use `from_file()` to mmap a .pte file instead of reading
+    it into memory.
+
+    Attributes of the root `Program` table (e.g., `execution_plan`,
+    `constant_buffer`, `segments`) are available directly on the view, with
+    the same names as in program.fbs:
+
+        with ProgramView.from_file("model.pte") as program:
+            ops = [op.name for op in program.execution_plan[0].operators]
+    """
+
+    def __init__(self, program_data: Union[bytes, bytearray, memoryview]) -> None:
+        self._data: memoryview = memoryview(program_data)
+        self._mmap: Optional[mmap.mmap] = None
+
+        # Look for an extended header to see if segments follow the flatbuffer
+        # data.
+        eh: Optional[_ExtendedHeader] = _get_extended_header(self._data)
+        self.program_size: int = eh.program_size if eh else len(self._data)
+        self.segment_base_offset: int = eh.segment_base_offset if eh else 0
+
+        program_schema = _program_schema()
+        self._root: _TableView = _open_view(
+            self._data[: self.program_size],
+            program_schema,
+            _enum_types(schema, program_schema),
         )
 
-    return program
+    @staticmethod
+    def from_file(path: str) -> "ProgramView":
+        """Returns a view of the program in the file at `path`, which is
+        memory-mapped rather than read.
+        """
+        with open(path, "rb") as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        view = ProgramView(mapped)
+        view._mmap = mapped
+        return view
+
+    def __getattr__(self, name: str) -> Any:
+        # Fields of the root Program table.
+        return getattr(self._root, name)
+
+    def segment_data(self, index: int) -> memoryview:
+        """Returns the data of the segment at the given index in `segments`."""
+        segment = self._root.segments[index]
+        start = self.segment_base_offset + segment.offset
+        if self.segment_base_offset == 0 or start + segment.size > len(self._data):
+            raise ValueError(
+                f"Segment {index} (offset {segment.offset}, size {segment.size}) "
+                + f"is outside of the data length {len(self._data)}"
+            )
+        return self._data[start : start + segment.size]
+
+    def delegate_data(self, delegate: _TableView) -> memoryview:
+        """Returns the processed data of a `BackendDelegate` view, whether it is
+        stored inline or in a segment.
+        """
+        processed = delegate.processed
+        if processed.location == DataLocation.SEGMENT:
+            return self.segment_data(processed.index)
+        return self._root.backend_delegate_data[processed.index].data
+
+    def constant_data(self, index: int) -> memoryview:
+        """Returns the data of the constant tensor with the given
+        `Tensor.constant_buffer_idx`, whether it is stored in constant_buffer
+        or in the constant segment. Data in the constant segment may be
+        followed by padding.
+        """
+        constant_segment = self._root.constant_segment
+        if constant_segment is None or len(constant_segment.offsets) == 0:
+            return self._root.constant_buffer[index].storage
+        offsets = constant_segment.offsets
+        data = self.segment_data(constant_segment.segment_index)
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(data)
+        return data[offsets[index] : end]
+
+    def to_program(self) -> Program:
+        """Decodes the entire view into a Program, moving any segment data back
+        into `Program.backend_delegate_data`.
+        """
+        program: Program = self._root.to_dataclass(schema)
+        if self.segment_base_offset != 0:
+            program = _restore_segments(
+                program=program, segment_data=self._data[self.segment_base_offset :]
+            )
+        return program
+
+    def close(self) -> None:
+        """Releases the underlying data. Views and memoryviews returned by this
+        object must not be used afterwards.
+        """
+        self._data.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Slices of the mapping are still referenced; the mapping will
+                # be released once they are garbage collected.
+                pass
+            self._mmap = None
+
+    def __enter__(self) -> "ProgramView":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def deserialize_pte_binary(program_data: bytes) -> Program:
+    """Returns a Program deserialized from the given runtime binary data."""
+    return ProgramView(program_data).to_program()
@@ -0,0 +1,155 @@
+#!/usr/bin/env fbpython
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Compares the in-process flatbuffer builder with the JSON + flatc path.
+
+Builds a synthetic Program with many constant buffers and values, serializes
+it both ways, checks that the outputs are byte-identical, and prints the wall
+time and peak Python heap usage of each path.
+
+Usage: benchmark_serialize.py [--num-buffers N] [--buffer-size BYTES]
+    [--num-values N] [--iterations N]
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from executorch.exir._serialize._flatbuffer import (
+    _FlatbufferResult,
+    _program_json_to_flatbuffer,
+)
+from executorch.exir._serialize._flatbuffer_builder import _program_to_flatbuffer
+from executorch.exir._serialize._program import _program_to_json
+from executorch.exir.schema import (
+    AllocationDetails,
+    Buffer,
+    Chain,
+    ContainerMetadata,
+    EValue,
+    ExecutionPlan,
+    Instruction,
+    KernelCall,
+    Operator,
+    Program,
+    ScalarType,
+    Tensor,
+    TensorShapeDynamism,
+)
+
+
+def make_program(num_buffers: int, buffer_size: int, num_values: int) -> Program:
+    """Returns a Program with `num_buffers` constant tensors of `buffer_size`
+    bytes each, plus `num_values` planned activation tensors.
+    """
+    values: List[EValue] = []
+    for i in range(num_buffers + num_values):
+        is_constant = i < num_buffers
+        values.append(
+            EValue(
+                Tensor(
+                    scalar_type=ScalarType.FLOAT,
+                    storage_offset=0,
+                    sizes=[buffer_size // 4],
+                    dim_order=[0],
+                    requires_grad=False,
+                    layout=0,
+                    constant_buffer_idx=i + 1 if is_constant else 0,
+                    allocation_info=(
+                        None
+                        if is_constant
+                        else AllocationDetails(memory_id=1, memory_offset=i * 64)
+                    ),
+                    shape_dynamism=TensorShapeDynamism.STATIC,
+                )
+            )
+        )
+    instructions = [
+        Instruction(KernelCall(op_index=0, args=[i, i + 1, i + 2]))
+        for i in range(0, len(values) - 2, 3)
+    ]
+    return Program(
+        version=0,
+        execution_plan=[
+            ExecutionPlan(
+                name="forward",
+                container_meta_type=ContainerMetadata(
+                    encoded_inp_str="", encoded_out_str=""
+                ),
+                values=values,
+                inputs=[],
+                outputs=[],
+                chains=[
+                    Chain(
+                        inputs=[],
+                        outputs=[],
+                        instructions=instructions,
+                        stacktrace=None,
+                    )
+                ],
+                operators=[Operator(name="aten::add", overload="out")],
+                delegates=[],
+                non_const_buffer_sizes=[0, num_values * 64],
+            )
+        ],
+        constant_buffer=[Buffer(storage=b"")]
+        + [Buffer(storage=bytes([i % 256]) * buffer_size) for i in range(num_buffers)],
+        backend_delegate_data=[],
+        segments=[],
+    )
+
+
+def measure(fn: Callable[[], _FlatbufferResult]) -> Tuple[float, int, bytes]:
+    """Returns (seconds, peak traced bytes, output data) for one call of fn."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result.data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-buffers", type=int, default=200)
+    parser.add_argument("--buffer-size", type=int, default=256 * 1024)
+    parser.add_argument("--num-values", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    program = make_program(args.num_buffers, args.buffer_size, args.num_values)
+    paths = {
+        "json+flatc": lambda: _program_json_to_flatbuffer(_program_to_json(program)),
+        "builder": lambda: _program_to_flatbuffer(program),
+    }
+
+    outputs = {}
+    for name, fn in paths.items():
+        best_time = float("inf")
+        best_peak = 0
+        for _ in range(args.iterations):
+            elapsed, peak, data = measure(fn)
+            if elapsed < best_time:
+                best_time, best_peak = elapsed, peak
+            outputs[name] = data
+        print(
+            f"{name:>12}: {best_time:8.3f} s, "
+            + f"peak Python heap {best_peak / (1 << 20):8.1f} MiB, "
+            + f"output {len(outputs[name]) / (1 << 20):8.1f} MiB"
+        )
+
+    if outputs["json+flatc"] != outputs["builder"]:
+        raise AssertionError("Builder output differs from flatc output")
+    print("Outputs are byte-identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,18 @@
 # LICENSE file in the root directory of this source tree.
 
 import os
+import sys
 import tempfile
 import unittest
-from typing import Dict, Optional, Sequence
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
 from unittest.mock import patch
 
 from executorch.exir._serialize import _flatbuffer
 from executorch.exir._serialize._flatbuffer import _ResourceFiles, _SchemaInfo
+from executorch.exir._serialize._flatbuffer_builder import _dataclass_to_flatbuffer
+from executorch.exir._serialize._flatbuffer_schema import _parse_schema
+from executorch.exir._serialize._flatbuffer_view import _open_view
 
 
 def read_file(dir: str, filename: str) -> bytes:
@@ -266,3 +271,143 @@ class TestPrepareSchema(unittest.TestCase):
                             out_dir,
                             delegate_alignment=bad_alignment,
                         )
+
+
+# A schema with a namespaced include and aliased union members, like the
+# XNNPACK delegate schema.
+ALIAS_SCHEMA_FILES: Dict[str, bytes] = {
+    "common.fbs": b"""
+        namespace common;
+        table Blob {
+          data: [ubyte] (force_align: 16);
+        }
+    """,
+    "alias.fbs": b"""
+        include "common.fbs";
+        namespace alias;
+        file_identifier "AL00";
+
+        table _Binary {
+          lhs: int;
+          rhs: int;
+        }
+
+        table Unary {
+          input: int;
+        }
+
+        union Node {
+          Add: _Binary,
+          Unary,
+          Mul: alias._Binary,
+        }
+
+        table NodeHolder {
+          node: Node;
+        }
+
+        table Graph {
+          nodes: [NodeHolder];
+          blob: common.Blob;
+          scale: float = 1.0;
+        }
+
+        root_type Graph;
+    """,
+}
+
+
+@dataclass
+class Binary:
+    lhs: int
+    rhs: int
+
+
+@dataclass
+class Add(Binary):
+    pass
+
+
+@dataclass
+class Mul(Binary):
+    pass
+
+
+@dataclass
+class Unary:
+    input: int
+
+
+@dataclass
+class NodeHolder:
+    node: Union[Add, Unary, Mul]
+
+
+@dataclass
+class Blob:
+    data: bytes
+
+
+@dataclass
+class Graph:
+    nodes: List[NodeHolder]
+    blob: Blob
+    scale: Union[float, str]
+
+
+class TestDataclassFlatbuffer(unittest.TestCase):
+    def test_parse_union_aliases(self) -> None:
+        schema = _parse_schema(ALIAS_SCHEMA_FILES.__getitem__, "alias.fbs")
+        node = schema.unions["Node"]
+        self.assertEqual(node.members, ["Add", "Unary", "Mul"])
+        self.assertEqual(node.member_tables, ["_Binary", "Unary", "_Binary"])
+        self.assertEqual(
+            schema.tables["Graph"].fields_by_name["blob"].type_name, "Blob"
+        )
+
+    def test_parse_struct_layout(self) -> None:
+        schema = _parse_schema(
+            {
+                "struct.fbs": b"""
+                    enum Kind : byte { A, B }
+                    struct Entry { kind: Kind; offset: ulong; count: short; }
+                    table Root { entries: [Entry]; }
+                    root_type Root;
+                """
+            }.__getitem__,
+            "struct.fbs",
+        )
+        entry = schema.tables["Entry"]
+        self.assertTrue(entry.is_struct)
+        self.assertEqual([f.struct_offset for f in entry.fields], [0, 8, 16])
+        self.assertEqual(entry.struct_size, 24)
+        self.assertEqual(entry.struct_alignment, 8)
+
+    def test_round_trip(self) -> None:
+        schema = _parse_schema(ALIAS_SCHEMA_FILES.__getitem__, "alias.fbs")
+        graph = Graph(
+            nodes=[
+                NodeHolder(Add(lhs=1, rhs=2)),
+                NodeHolder(Unary(input=3)),
+                NodeHolder(Mul(lhs=4, rhs=5)),
+            ],
+            blob=Blob(data=bytes(range(256)) * 4),
+            scale="+inf",
+        )
+        data = _dataclass_to_flatbuffer(graph, schema)
+        self.assertEqual(data[4:8], b"AL00")
+
+        view = _open_view(data, schema)
+        self.assertEqual(
+            [n.node.table_name for n in view.nodes], ["Add", "Unary", "Mul"]
+        )
+        # Byte vectors are exposed without copying.
+        blob_data = view.blob.data
+        self.assertIsInstance(blob_data, memoryview)
+        self.assertEqual(blob_data.obj, data)
+        self.assertEqual(bytes(blob_data), graph.blob.data)
+
+        decoded = view.to_dataclass(sys.modules[__name__])
+        self.assertEqual(decoded.nodes, graph.nodes)
+        self.assertEqual(decoded.blob, graph.blob)
+        self.assertEqual(decoded.scale, float("inf"))
@@ -7,25 +7,38 @@
 
 import copy
 import difflib
+import io
 import json
+import os
+import tempfile
+import tracemalloc
 import unittest
 
 from typing import List, Sequence
 
-from executorch.exir._serialize._flatbuffer import _program_flatbuffer_to_json
+from executorch.exir._serialize._flatbuffer import (
+    _program_flatbuffer_to_json,
+    _program_json_to_flatbuffer,
+)
+from executorch.exir._serialize._flatbuffer_builder import _program_to_flatbuffer
 from executorch.exir._serialize._program import (
     _ExtendedHeader,
+    _extract_segments,
     _get_extended_header,
     _json_to_program,
     _program_to_json,
+    delegate_segment_report,
     deserialize_pte_binary,
+    ProgramView,
     serialize_pte_binary,
+    write_pte_binary,
 )
 
 from executorch.exir.schema import (
     BackendDelegate,
     BackendDelegateDataReference,
     BackendDelegateInlineData,
+    Buffer,
     ContainerMetadata,
     DataLocation,
     DataSegment,
@@ -456,6 +469,365 @@ class TestProgram(unittest.TestCase):
                 program, extract_segments=True, segment_alignment=SEGMENT_ALIGNMENT
             )
 
+    def test_extract_segments_shares_large_blobs(self) -> None:
+        # Four 16 MiB delegate blobs.
+        blob_size = 16 << 20
+        program = get_test_program()
+        blobs = tuple(bytes([i + 1]) * blob_size for i in range(4))
+        add_delegate_data(program, program.execution_plan[0], blobs)
+
+        tracemalloc.start()
+        try:
+            program_with_segments, segments, _ = _extract_segments(
+                program, segment_alignment=SEGMENT_ALIGNMENT
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # The blobs should be moved into segments without copying them, so the
+        # peak allocation should be tiny compared to a single blob.
+        self.assertLess(peak, blob_size // 16)
+        self.assertEqual(len(segments), len(blobs))
+        for segment, blob in zip(segments, blobs):
+            self.assertIs(segment, blob)
+        # Parts of the program that don't refer to delegate data are shared.
+        self.assertIs(program_with_segments.constant_buffer, program.constant_buffer)
+        self.assertIs(
+            program_with_segments.execution_plan[0].values,
+            program.execution_plan[0].values,
+        )
+        self.assertEqual(program_with_segments.backend_delegate_data, [])
+
+        # The input program should not have been modified.
+        self.assertEqual(program.segments, [])
+        self.assertEqual([d.data for d in program.backend_delegate_data], list(blobs))
+        for i, delegate in enumerate(program.execution_plan[0].delegates):
+            self.assertEqual(
+                delegate.processed,
+                BackendDelegateDataReference(location=DataLocation.INLINE, index=i),
+            )
+
+    def test_extract_segments_deduplicates_blobs(self) -> None:
+        # Two execution plans with the same large and small blobs, as emitted
+        # for methods sharing a lowered module.
+        program = get_test_program()
+        second_plan = copy.deepcopy(program.execution_plan[0])
+        second_plan.name = "second"
+        program.execution_plan.append(second_plan)
+        large = self.gen_blob_data(SEGMENT_ALIGNMENT + 1, b"\x10\x11\x01")
+        small = self.gen_blob_data(100, b"\x20\x22\x02")
+        for plan in program.execution_plan:
+            add_delegate_data(program, plan, (large, small))
+
+        program_with_segments, segments, report = _extract_segments(
+            program, segment_alignment=SEGMENT_ALIGNMENT, min_segment_size=1024
+        )
+        self.assertEqual(segments, [large])
+        self.assertEqual(
+            [d.data for d in program_with_segments.backend_delegate_data], [small]
+        )
+        for plan in program_with_segments.execution_plan:
+            self.assertEqual(
+                [d.processed for d in plan.delegates],
+                [
+                    BackendDelegateDataReference(
+                        location=DataLocation.SEGMENT, index=0
+                    ),
+                    BackendDelegateDataReference(location=DataLocation.INLINE, index=0),
+                ],
+            )
+        self.assertEqual(report.num_segments, 1)
+        self.assertEqual(report.num_inline, 1)
+        self.assertEqual(report.num_deduplicated, 2)
+        self.assertEqual(report.deduplicated_bytes, len(large) + len(small))
+
+    def test_extract_segments_does_not_count_shared_entries(self) -> None:
+        # Two execution plans whose delegates already share one entry of
+        # backend_delegate_data, as emitted for methods sharing a lowered module.
+        program = get_test_program()
+        large = self.gen_blob_data(SEGMENT_ALIGNMENT + 1, b"\x10\x11\x01")
+        add_delegate_data(program, program.execution_plan[0], (large,))
+        second_plan = copy.deepcopy(program.execution_plan[0])
+        second_plan.name = "second"
+        program.execution_plan.append(second_plan)
+
+        program_with_segments, segments, report = _extract_segments(
+            program, segment_alignment=SEGMENT_ALIGNMENT
+        )
+        self.assertEqual(segments, [large])
+        for plan in program_with_segments.execution_plan:
+            self.assertEqual(
+                [d.processed for d in plan.delegates],
+                [BackendDelegateDataReference(location=DataLocation.SEGMENT, index=0)],
+            )
+        self.assertEqual(report.num_segments, 1)
+        self.assertEqual(report.num_deduplicated, 0)
+        self.assertEqual(report.deduplicated_bytes, 0)
+
+    def test_delegate_segment_policy(self) -> None:
+        program = get_test_program()
+        blobs = (
+            self.gen_blob_data(100, b"\x10\x11\x01"),
+            self.gen_blob_data(SEGMENT_ALIGNMENT + 1, b"\x20\x22\x02"),
+            self.gen_blob_data(300, b"\x30\x33\x03"),
+            self.gen_blob_data(SEGMENT_ALIGNMENT * 2, b"\x40\x44\x04"),
+        )
+        add_delegate_data(program, program.execution_plan[0], blobs)
+
+        # Keep small blobs inline, and also the large blob of "delegate3".
+        policy = {
+            "delegate_segment_min_size": 1024,
+            "delegate_segment_predicate": lambda d: d.id != "delegate3",
+        }
+        report = delegate_segment_report(
+            program, segment_alignment=SEGMENT_ALIGNMENT, **policy
+        )
+        self.assertEqual(report.num_segments, 1)
+        self.assertEqual(report.segment_bytes, SEGMENT_ALIGNMENT + 1)
+        self.assertEqual(report.num_inline, 3)
+        self.assertEqual(report.inline_bytes, 100 + 300 + SEGMENT_ALIGNMENT * 2)
+        self.assertEqual(report.padding_bytes, 0)
+        # Extracting everything would pad all but the last segment.
+        self.assertEqual(
+            report.padding_bytes_saved,
+            (SEGMENT_ALIGNMENT - 1)
+            + (SEGMENT_ALIGNMENT - 100)
+            + (SEGMENT_ALIGNMENT - 300),
+        )
+        # Computing the report should not modify the program.
+        self.assertEqual(program.segments, [])
+
+        # Without extracting segments, all of the data stays inline.
+        report = delegate_segment_report(
+            program, segment_alignment=SEGMENT_ALIGNMENT, extract_segments=False
+        )
+        self.assertEqual(report.num_segments, 0)
+        self.assertEqual(report.segment_bytes, 0)
+        self.assertEqual(report.num_inline, 4)
+        self.assertEqual(report.inline_bytes, sum(len(blob) for blob in blobs))
+        self.assertEqual(report.padding_bytes, 0)
+
+        pte_data = serialize_pte_binary(
+            program,
+            extract_segments=True,
+            segment_alignment=SEGMENT_ALIGNMENT,
+            **policy,
+        )
+        with ProgramView(pte_data) as view:
+            self.assertEqual(len(view.segments), 1)
+            self.assertEqual(view.segments[0].offset, 0)
+            self.assertEqual(view.segments[0].size, SEGMENT_ALIGNMENT + 1)
+            self.assertEqual(
+                [d.processed.location for d in view.execution_plan[0].delegates],
+                [
+                    DataLocation.INLINE,
+                    DataLocation.SEGMENT,
+                    DataLocation.INLINE,
+                    DataLocation.INLINE,
+                ],
+            )
+            self.assertEqual(
+                [bytes(d.data) for d in view.backend_delegate_data],
+                [blobs[0], blobs[2], blobs[3]],
+            )
+
+        # The data should survive a round trip regardless of where it was put.
+        self.assert_programs_equal(program, deserialize_pte_binary(pte_data))
+
+    def test_round_trip_with_constant_segment(self) -> None:
+        program = get_test_program()
+        constants = [
+            b"",
+            self.gen_blob_data(5, b"\x10\x11\x01"),
+            self.gen_blob_data(SEGMENT_ALIGNMENT + 3, b"\x20\x22\x02"),
+            b"",
+            self.gen_blob_data(64, b"\x30\x33\x03"),
+        ]
+        program.constant_buffer = [Buffer(storage=c) for c in constants]
+        add_delegate_data(
+            program,
+            program.execution_plan[0],
+            [self.gen_blob_data(100, b"\x40\x44\x04")],
+        )
+        tensor_alignment = 32
+
+        pte_data = serialize_pte_binary(
+            program,
+            extract_segments=True,
+            extract_constant_segment=True,
+            segment_alignment=SEGMENT_ALIGNMENT,
+            constant_tensor_alignment=tensor_alignment,
+        )
+
+        # The input Program should not have been modified.
+        self.assertEqual(program.segments, [])
+        self.assertIsNone(program.constant_segment)
+        self.assertEqual(len(program.constant_buffer), len(constants))
+
+        with ProgramView(pte_data) as view:
+            # The constants live in the segment after the delegate segment.
+            self.assertEqual(len(view.constant_buffer), 0)
+            constant_segment = view.constant_segment
+            self.assertEqual(constant_segment.segment_index, 1)
+            self.assertEqual(len(constant_segment.offsets), len(constants))
+            for offset in constant_segment.offsets:
+                self.assertEqual(offset % tensor_alignment, 0)
+            self.assertEqual(view.segments[1].offset % SEGMENT_ALIGNMENT, 0)
+            for i, constant in enumerate(constants):
+                self.assertEqual(
+                    bytes(view.constant_data(i)[: len(constant)]), constant
+                )
+
+        # Deserializing moves the constants back into constant_buffer. Buffers
+        # may include trailing alignment padding.
+        program2 = deserialize_pte_binary(pte_data)
+        self.assertIsNone(program2.constant_segment)
+        self.assertEqual(program2.segments, [])
+        self.assertEqual(len(program2.constant_buffer), len(constants))
+        for buffer, constant in zip(program2.constant_buffer, constants):
+            self.assertEqual(buffer.storage[: len(constant)], constant)
+            self.assertLess(len(buffer.storage) - len(constant), tensor_alignment)
+        self.assertEqual(program2.backend_delegate_data, program.backend_delegate_data)
+
+    def test_write_pte_binary(self) -> None:
+        program = get_test_program()
+        add_delegate_data(
+            program,
+            program.execution_plan[0],
+            (
+                self.gen_blob_data(SEGMENT_ALIGNMENT // 3, b"\x10\x11\x01"),
+                self.gen_blob_data(SEGMENT_ALIGNMENT + 1, b"\x20\x22\x02"),
+            ),
+        )
+
+        for extract_segments in (False, True):
+            with self.subTest(extract_segments=extract_segments):
+                expected = serialize_pte_binary(
+                    program,
+                    extract_segments=extract_segments,
+                    segment_alignment=SEGMENT_ALIGNMENT,
+                )
+
+                # Write to a file-like object.
+                out = io.BytesIO()
+                size = write_pte_binary(
+                    program,
+                    out,
+                    extract_segments=extract_segments,
+                    segment_alignment=SEGMENT_ALIGNMENT,
+                )
+                self.assertEqual(size, len(expected))
+                self.assertEqual(out.getvalue(), expected)
+
+                # Write to a path.
+                with tempfile.TemporaryDirectory() as d:
+                    path = os.path.join(d, "program.pte")
+                    write_pte_binary(
+                        program,
+                        path,
+                        extract_segments=extract_segments,
+                        segment_alignment=SEGMENT_ALIGNMENT,
+                    )
+                    with open(path, "rb") as fp:
+                        self.assertEqual(fp.read(), expected)
+
+        # The input Program should not have been modified.
+        self.assertEqual(program.segments, [])
+
+    def test_program_view(self) -> None:
+        """Tests that ProgramView lazily exposes the fields of a serialized
+        program, including delegate data stored inline and in segments.
+        """
+        program = get_test_program()
+        blobs = (
+            self.gen_blob_data(SEGMENT_ALIGNMENT + 1, b"\x10\x11\x01"),
+            self.gen_blob_data(64, b"\x20\x22\x02"),
+        )
+        add_delegate_data(program, program.execution_plan[0], blobs)
+
+        for extract_segments in (False, True):
+            pte_data = serialize_pte_binary(
+                program,
+                extract_segments=extract_segments,
+                segment_alignment=SEGMENT_ALIGNMENT,
+            )
+            with tempfile.TemporaryDirectory() as temp_dir:
+                path = os.path.join(temp_dir, "program.pte")
+                with open(path, "wb") as fp:
+                    fp.write(pte_data)
+
+                with ProgramView.from_file(path) as view:
+                    plan = view.execution_plan[0]
+                    self.assertEqual(view.version, program.version)
+                    self.assertEqual(len(view.execution_plan), 1)
+                    self.assertEqual(plan.name, "forward")
+                    self.assertEqual(
+                        [(op.name, op.overload) for op in plan.operators],
+                        [("aten::add", "Tensor")],
+                    )
+                    self.assertEqual(plan.values[4].val.table_name, "Tensor")
+                    self.assertEqual(list(plan.values[4].val.sizes), [2, 2])
+                    self.assertEqual(
+                        len(view.segments), len(blobs) if extract_segments else 0
+                    )
+
+                    # Delegate data is returned without copying, wherever it
+                    # is stored.
+                    for delegate, blob in zip(plan.delegates, blobs):
+                        data = view.delegate_data(delegate)
+                        self.assertIsInstance(data, memoryview)
+                        self.assertEqual(bytes(data), blob)
+                        expected_location = (
+                            DataLocation.SEGMENT
+                            if extract_segments
+                            else DataLocation.INLINE
+                        )
+                        self.assertEqual(delegate.processed.location, expected_location)
+                        del data
+
+                    # Decoding the whole view recreates the original program.
+                    self.assert_programs_equal(program, view.to_program())
+
+    def test_builder_matches_flatc(self) -> None:
+        """Tests that the in-process flatbuffer builder produces exactly the
+        same bytes as converting the program's JSON with flatc.
+        """
+        program = get_test_program()
+        program.constant_buffer.append(
+            Buffer(storage=self.gen_blob_data(100, b"\x10\x11\x01"))
+        )
+        program.constant_buffer.append(Buffer(storage=b""))
+        add_delegate_data(
+            program,
+            program.execution_plan[0],
+            (self.gen_blob_data(33, b"\x20\x22\x02"), b""),
+        )
+        program.execution_plan[0].non_const_buffer_sizes = [0, 2**48]
+
+        for constant_tensor_alignment, delegate_alignment in (
+            (None, None),
+            (64, None),
+            (None, 256),
+            (128, 32),
+        ):
+            with self.subTest(
+                constant_tensor_alignment=constant_tensor_alignment,
+                delegate_alignment=delegate_alignment,
+            ):
+                expected = _program_json_to_flatbuffer(
+                    _program_to_json(program),
+                    constant_tensor_alignment=constant_tensor_alignment,
+                    delegate_alignment=delegate_alignment,
+                )
+                actual = _program_to_flatbuffer(
+                    program,
+                    constant_tensor_alignment=constant_tensor_alignment,
+                    delegate_alignment=delegate_alignment,
+                )
+                self.assertEqual(actual.max_alignment, expected.max_alignment)
+                self.assertEqual(actual.data, expected.data)
+
 
 # Common data for extended header tests. The two example values should produce
 # the example data.
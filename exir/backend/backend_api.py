@@ -6,9 +6,12 @@
 
 import copy
 import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
 from functools import singledispatch
-from typing import Generator, List, Type
+from typing import Dict, Generator, List, Optional, Tuple, Type
 
 import torch
 
@@ -16,10 +19,16 @@ from executorch.exir.backend.backend_details import BackendDetails, PreprocessRe
 from executorch.exir.backend.compile_spec_schema import CompileSpec
 
 from executorch.exir.backend.partitioner import (
+    DelegationSpec,
     Partitioner,
     PartitionResult,
     TPartitioner,
 )
+from executorch.exir.backend.preprocess_cache import (
+    compute_preprocess_cache_key,
+    get_debug_handle_offset,
+    PreprocessCache,
+)
 from executorch.exir.backend.utils import is_identical_graph
 
 from executorch.exir.delegate import executorch_call_delegate, get_lowered_module_name
@@ -33,6 +42,7 @@ from executorch.exir.lowered_backend_module import (
 )
 from executorch.exir.pass_base import ExportPass
 from torch.export import ExportedProgram
+from torch.fx.passes.utils.fuser_utils import legalize_graph
 
 
 @singledispatch
@@ -103,24 +113,42 @@ def _(
     """
     assert isinstance(edge_program, ExportedProgram)
 
+    backend = _get_backend_class(backend_id)
+    cache = _PREPROCESS_CACHE
+    cache_key = None
+    debug_handle_offset = 0
+    preprocess_result: Optional[PreprocessResult] = None
+    if cache is not None:
+        cache_key = compute_preprocess_cache_key(backend, edge_program, compile_specs)
+        debug_handle_offset = get_debug_handle_offset(edge_program)
+        preprocess_result = cache.get(cache_key, debug_handle_offset)
+    if preprocess_result is None:
+        preprocess_result = backend.preprocess(
+            (
+                copy.deepcopy(edge_program)
+                if backend.preprocess_modifies_edge_program
+                else edge_program
+            ),
+            compile_specs,
+        )
+        if cache is not None:
+            assert cache_key is not None
+            cache.put(cache_key, preprocess_result, debug_handle_offset)
+    lowered_module = LoweredBackendModule(
+        edge_program=edge_program,
+        backend_id=backend_id,
+        processed_bytes=preprocess_result.processed_bytes,
+        compile_specs=compile_specs,
+    )
+    lowered_module.meta = {"debug_handle_map": preprocess_result.debug_handle_map}
+    return lowered_module
+
+
+def _get_backend_class(backend_id: str) -> Type[BackendDetails]:
     # All backend implementation are final, so we don't need to consider nested subclasses.
     for cls in BackendDetails.__subclasses__():
         if backend_id == cls.__name__:
-            copied_edge_program = copy.deepcopy(edge_program)
-            preprocess_result: PreprocessResult = cls.preprocess(
-                copied_edge_program,
-                compile_specs,
-            )
-            lowered_module = LoweredBackendModule(
-                edge_program=edge_program,
-                backend_id=backend_id,
-                processed_bytes=preprocess_result.processed_bytes,
-                compile_specs=compile_specs,
-            )
-            lowered_module.meta = {
-                "debug_handle_map": preprocess_result.debug_handle_map
-            }
-            return lowered_module
+            return cls
     raise NotImplementedError(f"Backend {backend_id} was not found.")
 
 
@@ -150,51 +178,233 @@ def validation_disabled() -> Generator[None, None, None]:
         _ENABLE_VALIDATION = existing_setting
 
 
+# Cache of the preprocess results, used when set by preprocess_cache
+_PREPROCESS_CACHE: Optional[PreprocessCache] = None
+
+
+@contextmanager
+def preprocess_cache(cache: PreprocessCache) -> Generator[None, None, None]:
+    """
+    Reuses the backend preprocess results stored in cache for the programs
+    lowered by to_backend, and stores the new ones in it. The hits and misses
+    are counted in cache.stats.
+    """
+    global _PREPROCESS_CACHE
+    existing_setting = _PREPROCESS_CACHE
+    _PREPROCESS_CACHE = cache
+    try:
+        yield
+    finally:
+        _PREPROCESS_CACHE = existing_setting
+
+
+# Number of processes running backend preprocess when lowering a program with
+# a partitioner. Preprocess runs serially in the calling process when it is 1.
+_PREPROCESS_MAX_WORKERS: int = 1
+
+
+@contextmanager
+def parallel_preprocess(
+    max_workers: Optional[int] = None,
+) -> Generator[None, None, None]:
+    """
+    Runs the backend preprocess of all the partitions of a program concurrently
+    in a pool of max_workers processes (the number of CPUs by default) when
+    lowering it with a partitioner.
+
+    All the partitions are extracted first, and each one is sent to a worker as
+    a serialized ExportedProgram. The results are put back in the order of the
+    partition tags, so the lowered program is the same as the one lowered
+    serially as long as preprocess is deterministic. The backends must be
+    importable by the workers and can only rely on the node metadata that
+    survives serialization.
+    """
+    global _PREPROCESS_MAX_WORKERS
+    existing_setting = _PREPROCESS_MAX_WORKERS
+    _PREPROCESS_MAX_WORKERS = max_workers or os.cpu_count() or 1
+    try:
+        yield
+    finally:
+        _PREPROCESS_MAX_WORKERS = existing_setting
+
+
+# A lowered module whose processed bytes are yet to be generated by the backend.
+_PendingPreprocess = Tuple[Type[BackendDetails], LoweredBackendModule]
+
+
+def _lower_without_preprocess(
+    backend_id: str,
+    edge_program: ExportedProgram,
+    compile_specs: List[CompileSpec],
+    pending_preprocess: List[_PendingPreprocess],
+) -> LoweredBackendModule:
+    """
+    Same as to_backend(backend_id, edge_program, compile_specs), but leaves
+    the processed bytes empty and records the lowered module in
+    pending_preprocess to be filled in by _run_pending_preprocess.
+    """
+    backend = _get_backend_class(backend_id)
+    lowered_module = LoweredBackendModule(
+        edge_program=edge_program,
+        backend_id=backend_id,
+        processed_bytes=b"",
+        compile_specs=compile_specs,
+    )
+    pending_preprocess.append((backend, lowered_module))
+    return lowered_module
+
+
+def _preprocess_serialized_program(
+    backend: Type[BackendDetails],
+    serialized_program: Tuple[bytes, bytes],
+    compile_specs: List[CompileSpec],
+) -> PreprocessResult:
+    """Runs in the preprocess worker processes."""
+    # Imported here as executorch.exir depends on this module
+    from executorch.exir.serde.serialize import deserialize
+
+    return backend.preprocess(deserialize(*serialized_program), compile_specs)
+
+
+def _run_pending_preprocess(
+    pending_preprocess: List[_PendingPreprocess], max_workers: int
+) -> None:
+    from executorch.exir.serde.serialize import serialize
+
+    cache = _PREPROCESS_CACHE
+    preprocess_results: List[Optional[PreprocessResult]] = []
+    cache_keys: List[Optional[str]] = []
+    debug_handle_offsets: List[int] = []
+    for backend, lowered_module in pending_preprocess:
+        cache_key = None
+        debug_handle_offset = 0
+        preprocess_result = None
+        if cache is not None:
+            cache_key = compute_preprocess_cache_key(
+                backend, lowered_module.original_module, lowered_module.compile_specs
+            )
+            debug_handle_offset = get_debug_handle_offset(
+                lowered_module.original_module
+            )
+            preprocess_result = cache.get(cache_key, debug_handle_offset)
+        cache_keys.append(cache_key)
+        debug_handle_offsets.append(debug_handle_offset)
+        preprocess_results.append(preprocess_result)
+
+    # Only send the partitions that missed the cache to the workers
+    missed = [i for i, result in enumerate(preprocess_results) if result is None]
+    if missed:
+        backends = []
+        serialized_programs = []
+        compile_specs = []
+        for i in missed:
+            backend, lowered_module = pending_preprocess[i]
+            backends.append(backend)
+            serialized_programs.append(serialize(lowered_module.original_module))
+            compile_specs.append(lowered_module.compile_specs)
+
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(missed))) as executor:
+            # map returns the results in the order of the partitions
+            for i, preprocess_result in zip(
+                missed,
+                executor.map(
+                    _preprocess_serialized_program,
+                    backends,
+                    serialized_programs,
+                    compile_specs,
+                ),
+            ):
+                preprocess_results[i] = preprocess_result
+                cache_key = cache_keys[i]
+                if cache is not None and cache_key is not None:
+                    cache.put(cache_key, preprocess_result, debug_handle_offsets[i])
+
+    for (_, lowered_module), preprocess_result in zip(
+        pending_preprocess, preprocess_results
+    ):
+        assert preprocess_result is not None
+        lowered_module._processed_bytes = preprocess_result.processed_bytes
+        lowered_module.meta = {"debug_handle_map": preprocess_result.debug_handle_map}
+
+
+def _lower_partition(
+    delegation_spec: DelegationSpec,
+    submodule_program: ExportedProgram,
+    pending_preprocess: Optional[List[_PendingPreprocess]],
+) -> LoweredBackendModule:
+    """
+    Lowers a partition to the backend of its delegation spec, deferring the
+    backend preprocess if pending_preprocess is given.
+    """
+    if pending_preprocess is None:
+        return to_backend(
+            delegation_spec.backend_id,
+            submodule_program,
+            delegation_spec.compile_specs,
+        )
+    return _lower_without_preprocess(
+        delegation_spec.backend_id,
+        submodule_program,
+        delegation_spec.compile_specs,
+        pending_preprocess,
+    )
+
+
 def _partition_and_lower(
     tagged_graph_module: torch.fx.GraphModule,
     partition_result: PartitionResult,
     owning_program: ExportedProgram,
+    pending_preprocess: Optional[List[_PendingPreprocess]] = None,
 ) -> torch.fx.GraphModule:
+    """
+    Replaces each partition of tagged_graph_module with a call to its lowered
+    module. If pending_preprocess is given, the backend preprocess of the
+    partitions is deferred and the lowered modules are recorded in it instead.
+    """
+    # Group the nodes by tag in a single pass over the graph. The nodes stay
+    # valid while partitions are fused, as the graph is only legalized (which
+    # recreates all of its nodes) once every partition has been lowered.
+    tag_to_nodes: Dict[str, List[torch.fx.Node]] = defaultdict(list)
+    for node in tagged_graph_module.graph.nodes:
+        tag_to_nodes[node.meta.get("delegation_tag", "")].append(node)
+    tagged_graph_module_output_node = [
+        node for node in tagged_graph_module.graph.nodes if node.op == "output"
+    ]
+
+    lowered_any_partition = False
     for tag, delegation_spec in partition_result.partition_tags.items():
         # Create partition with nodes containing this tag. There should only be
         # one contained submodule per tag
-        node_list = []
-        for node in tagged_graph_module.graph.nodes:
-            if node.meta.get("delegation_tag", "") == tag:
-                node_list.append(node)
+        node_list = tag_to_nodes.get(tag, [])
 
         if len(node_list) == 0:
-            logging.debug(f"Did not find any nodes for tag {tag}")
+            logging.debug("Did not find any nodes for tag %s", tag)
             continue
 
-        logging.debug(f"For tag {tag}, found nodes {node_list}")
+        logging.debug("For tag %s, found nodes %s", tag, node_list)
         # Tag the nodes that are params as buffers, so we can order the submodule as (Parms + Buffers) (User Inputs)
         submodule, call_module_node = create_submodule_from_nodes(
-            tagged_graph_module, node_list, tag
+            tagged_graph_module, node_list, tag, skip_legalize_graph=True
         )
-        tagged_graph_module_output_node = [
-            node for node in tagged_graph_module.graph.nodes if node.op == "output"
-        ]
         submodule_output_node = [
             node for node in submodule.graph.nodes if node.op == "output"
         ]
         # Copy the output node meta from the original output node, because create_submodule_from_nodes doesn't cover the meta field
         submodule_output_node[0].meta = tagged_graph_module_output_node[0].meta
-        logging.debug(f"Partitioned graph module: {tagged_graph_module}")
+        logging.debug("Partitioned graph module: %s", tagged_graph_module)
 
         submodule_program = create_exported_program_from_submodule(
             submodule, owning_program
         )
 
-        lowered_submodule = to_backend(
-            delegation_spec.backend_id,
-            submodule_program,
-            delegation_spec.compile_specs,
+        lowered_submodule = _lower_partition(
+            delegation_spec, submodule_program, pending_preprocess
         )
 
         # call delegate args should only use user_inputs
+        call_module_inputs = call_module_node.all_input_nodes
         call_delegate_args = []
-        for inp in call_module_node.all_input_nodes:
+        for inp in call_module_inputs:
             if inp.name in submodule_program.graph_signature.user_inputs:
                 call_delegate_args.append(inp)
 
@@ -216,9 +426,15 @@ def _partition_and_lower(
             call_module_node.replace_all_uses_with(call_delegate_node)
             tagged_graph_module.graph.erase_node(call_module_node)
 
-        # Delete all parameters/buffers consumed by the created exported program
+        # Delete all parameters/buffers consumed by the created exported program.
+        # Unused ones are deleted with the first partition, so afterwards they
+        # can only be inputs of the partition.
         toplevel_signature = owning_program.graph_signature
-        for node in tagged_graph_module.graph.nodes:
+        for node in (
+            call_module_inputs
+            if lowered_any_partition
+            else list(tagged_graph_module.graph.nodes)
+        ):
             # Find placeholders consumed by the delegate
             if node.op != "placeholder" or len(node.users) != 0:
                 continue
@@ -236,12 +452,17 @@ def _partition_and_lower(
                 owning_program.state_dict.pop(param_name)
                 tagged_graph_module.graph.erase_node(node)
 
+        lowered_any_partition = True
+
+    if lowered_any_partition:
+        # Topologically sort the graph with the newly created delegate calls
+        legalize_graph(tagged_graph_module)
         tagged_graph_module.recompile()
 
     # Recursively partition and lower for submodules
     for name, submod, _node in get_control_flow_submodules(tagged_graph_module):
         partitioned_submodule = _partition_and_lower(
-            submod, partition_result, owning_program
+            submod, partition_result, owning_program, pending_preprocess
         )
         tagged_graph_module.add_module(name, partitioned_submodule)
 
@@ -309,9 +530,20 @@ def _(
         partitioner_result.partition_tags is not None
     ), f"Partitioner {partitioner} needs a `partition_tags` field containing a mapping of tags to delegate spec"
 
+    max_workers = _PREPROCESS_MAX_WORKERS
+    pending_preprocess: Optional[List[_PendingPreprocess]] = (
+        [] if max_workers > 1 else None
+    )
     tagged_graph_module = _partition_and_lower(
-        tagged_exported_program.graph_module, partitioner_result, edge_program
+        tagged_exported_program.graph_module,
+        partitioner_result,
+        edge_program,
+        pending_preprocess,
     )
+    if pending_preprocess:
+        # The lowered modules are referenced, not copied, by the final graph
+        # module, so they can be filled in after the graph has been rebuilt.
+        _run_pending_preprocess(pending_preprocess, max_workers)
 
     # TODO(angelayi): Update this signature in a less manual way (maybe through
     # retracing)
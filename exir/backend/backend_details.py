@@ -55,6 +55,11 @@ class BackendDetails(ABC):
             to debug handle id attached in the original exported program.
     """
 
+    # Backends whose preprocess doesn't modify the given edge program in place
+    # can set this to False, so that to_backend doesn't copy the edge program
+    # before passing it to preprocess.
+    preprocess_modifies_edge_program: bool = True
+
     @staticmethod
     # all backends need to implement this method
     @enforcedmethod
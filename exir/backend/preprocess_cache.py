@@ -0,0 +1,344 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+A persistent cache of backend preprocess results, so that re-lowering a program
+only runs BackendDetails.preprocess on the partitions that have changed.
+
+Usage:
+    from executorch.exir.backend.backend_api import preprocess_cache
+
+    cache = PreprocessCache("/tmp/executorch_preprocess_cache")
+    with preprocess_cache(cache):
+        lowered = to_backend(edge_program, partitioner)
+    print(cache.stats)
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import torch
+from executorch.exir.backend.backend_details import BackendDetails, PreprocessResult
+from executorch.exir.backend.compile_spec_schema import CompileSpec
+from executorch.exir.delegate import is_lowered_module
+from torch.export import ExportedProgram
+
+# Bump when the cache key or the format of the cached files changes
+_CACHE_FORMAT_VERSION = 2
+_CACHE_FILE_SUFFIX = ".preprocess"
+# Cached files start with the magic and the size of the JSON encoded debug
+# handle map, which is followed by the processed bytes
+_CACHE_FILE_MAGIC = b"ETPC" + _CACHE_FORMAT_VERSION.to_bytes(4, "little")
+_CACHE_FILE_HEADER_SIZE = len(_CACHE_FILE_MAGIC) + 8
+
+DebugHandleMap = Dict[Any, Tuple[int, ...]]
+
+
+@dataclass
+class PreprocessCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def _update(hasher: "hashlib._Hash", *values: Any) -> None:
+    for value in values:
+        data = value if isinstance(value, bytes) else repr(value).encode("utf-8")
+        # Prefix the length so that consecutive values can't run into each other
+        hasher.update(len(data).to_bytes(8, "little"))
+        hasher.update(data)
+
+
+def _update_with_tensor(hasher: "hashlib._Hash", tensor: torch.Tensor) -> None:
+    tensor = tensor.detach().cpu()
+    _update(hasher, str(tensor.dtype), tuple(tensor.shape))
+    if tensor.is_quantized:
+        # The quantization parameters are covered by the dequantized values
+        _update_with_tensor(hasher, tensor.dequantize())
+        tensor = tensor.int_repr()
+    data = tensor.contiguous().reshape(-1).view(torch.uint8).numpy()
+    hasher.update(len(data).to_bytes(8, "little"))
+    hasher.update(data)
+
+
+def _target_name(target: Any) -> str:
+    name = str(target)
+    # Plain Python functions are printed with their address, which changes
+    # between processes
+    if " at 0x" in name:
+        name = f"{target.__module__}.{target.__qualname__}"
+    return name
+
+
+def _val_repr(val: Any) -> Any:
+    if isinstance(val, torch.Tensor):
+        return (str(val.dtype), tuple(val.shape), tuple(val.stride()))
+    if isinstance(val, (list, tuple)):
+        return tuple(_val_repr(v) for v in val)
+    return val
+
+
+def get_debug_handle_offset(edge_program: ExportedProgram) -> int:
+    """
+    Returns the smallest debug handle of the nodes of edge_program, which the
+    debug handles of a partition are hashed and cached relative to, so that a
+    partition is still a hit when the nodes before it in the program change.
+    """
+    debug_handles = [
+        node.meta["debug_handle"]
+        for node in edge_program.graph_module.graph.nodes
+        if node.meta.get("debug_handle") is not None
+    ]
+    return min(debug_handles, default=0)
+
+
+def _update_with_graph_module(
+    hasher: "hashlib._Hash",
+    graph_module: torch.fx.GraphModule,
+    debug_handle_offset: int,
+) -> None:
+    # Nodes are named after their position in the graph, as their names depend
+    # on the rest of the program that the partition was taken from
+    node_index = {node: i for i, node in enumerate(graph_module.graph.nodes)}
+    for node in graph_module.graph.nodes:
+        args = torch.fx.node.map_arg((node.args, node.kwargs), node_index.get)
+        debug_handle = node.meta.get("debug_handle")
+        _update(
+            hasher,
+            node.op,
+            node_index[node],
+            _target_name(node.target),
+            args,
+            debug_handle - debug_handle_offset if debug_handle is not None else None,
+            _val_repr(node.meta.get("val")),
+        )
+        if node.op != "get_attr":
+            continue
+        attr = graph_module
+        for atom in node.target.split("."):
+            attr = getattr(attr, atom)
+        if isinstance(attr, torch.fx.GraphModule):
+            # Control flow submodules
+            _update_with_graph_module(hasher, attr, debug_handle_offset)
+        elif isinstance(attr, torch.Tensor):
+            _update_with_tensor(hasher, attr)
+        elif is_lowered_module(attr):
+            # Nested delegates
+            _update(hasher, attr.backend_id, attr.processed_bytes)
+
+
+def _backend_version(backend: Type[BackendDetails]) -> bytes:
+    """
+    Backends can declare a `version` class attribute, and bump it to invalidate
+    their cached results. Changes to the file defining the backend invalidate
+    them as well.
+    """
+    hasher = hashlib.sha256()
+    _update(
+        hasher,
+        backend.__module__,
+        backend.__qualname__,
+        getattr(backend, "version", None),
+    )
+    try:
+        source_file = inspect.getsourcefile(backend)
+    except TypeError:
+        source_file = None
+    if source_file is not None and os.path.isfile(source_file):
+        with open(source_file, "rb") as f:
+            _update(hasher, f.read())
+    return hasher.digest()
+
+
+def compute_preprocess_cache_key(
+    backend: Type[BackendDetails],
+    edge_program: ExportedProgram,
+    compile_specs: List[CompileSpec],
+) -> str:
+    """
+    Returns a hash of everything the result of backend.preprocess(edge_program,
+    compile_specs) depends on: the partition graph (including the debug
+    handles relative to get_debug_handle_offset(), which the debug handle map
+    refers to), its parameters and buffers, the compile specs and the version
+    of the backend.
+    """
+    hasher = hashlib.sha256()
+    _update(hasher, _CACHE_FORMAT_VERSION, _backend_version(backend))
+    _update_with_graph_module(
+        hasher, edge_program.graph_module, get_debug_handle_offset(edge_program)
+    )
+    signature = edge_program.graph_signature
+    _update(
+        hasher,
+        [(str(spec.kind), spec.target) for spec in signature.input_specs],
+        [(str(spec.kind), spec.target) for spec in signature.output_specs],
+    )
+    for name in sorted(edge_program.state_dict):
+        _update(hasher, name)
+        _update_with_tensor(hasher, edge_program.state_dict[name])
+    for compile_spec in compile_specs:
+        _update(hasher, compile_spec.key, bytes(compile_spec.value))
+    return hasher.hexdigest()
+
+
+def _shift_debug_handle_map(
+    debug_handle_map: Optional[DebugHandleMap], offset: int
+) -> Optional[DebugHandleMap]:
+    if debug_handle_map is None:
+        return None
+    return {
+        key: tuple(debug_handle + offset for debug_handle in debug_handles)
+        for key, debug_handles in debug_handle_map.items()
+    }
+
+
+def _encode_debug_handle_map(debug_handle_map: Optional[DebugHandleMap]) -> bytes:
+    # Stored as a list of items to keep the types of the keys
+    items = (
+        [[key, list(debug_handles)] for key, debug_handles in debug_handle_map.items()]
+        if debug_handle_map is not None
+        else None
+    )
+    return json.dumps(items).encode("utf-8")
+
+
+def _decode_debug_handle_map(data: bytes) -> Optional[DebugHandleMap]:
+    items = json.loads(data)
+    if items is None:
+        return None
+    if not isinstance(items, list):
+        raise ValueError("Invalid debug handle map")
+    debug_handle_map = {}
+    for item in items:
+        if (
+            not isinstance(item, list)
+            or len(item) != 2
+            or not isinstance(item[0], (int, str))
+            or not isinstance(item[1], list)
+            or not all(isinstance(handle, int) for handle in item[1])
+        ):
+            raise ValueError("Invalid debug handle map")
+        debug_handle_map[item[0]] = tuple(item[1])
+    return debug_handle_map
+
+
+class PreprocessCache:
+    """
+    Stores PreprocessResults as files in cache_dir, named by their cache keys.
+    When the files take more than max_size_bytes, the least recently used ones
+    are evicted.
+
+    The files hold the raw processed bytes and the debug handle map encoded as
+    JSON, so that reading files shared with other users can't run code. The
+    debug handles are stored relative to the debug_handle_offset given to put
+    and get, see get_debug_handle_offset.
+
+    Several processes can share a cache directory: files are replaced
+    atomically, and corrupted or concurrently evicted files are misses.
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 1 << 30) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.stats = PreprocessCacheStats()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _CACHE_FILE_SUFFIX)
+
+    def get(self, key: str, debug_handle_offset: int = 0) -> Optional[PreprocessResult]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            header = data[:_CACHE_FILE_HEADER_SIZE]
+            if len(header) != _CACHE_FILE_HEADER_SIZE or not header.startswith(
+                _CACHE_FILE_MAGIC
+            ):
+                raise ValueError("Invalid cache file header")
+            map_size = int.from_bytes(header[len(_CACHE_FILE_MAGIC) :], "little")
+            map_end = _CACHE_FILE_HEADER_SIZE + map_size
+            if map_end > len(data):
+                raise ValueError("Truncated cache file")
+            debug_handle_map = _decode_debug_handle_map(
+                data[_CACHE_FILE_HEADER_SIZE:map_end]
+            )
+            # Mark the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return PreprocessResult(
+            processed_bytes=data[map_end:],
+            debug_handle_map=_shift_debug_handle_map(
+                debug_handle_map, debug_handle_offset
+            ),
+        )
+
+    def put(
+        self, key: str, result: PreprocessResult, debug_handle_offset: int = 0
+    ) -> None:
+        encoded_map = _encode_debug_handle_map(
+            _shift_debug_handle_map(result.debug_handle_map, -debug_handle_offset)
+        )
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_CACHE_FILE_MAGIC)
+                f.write(len(encoded_map).to_bytes(8, "little"))
+                f.write(encoded_map)
+                f.write(result.processed_bytes)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self) -> List[Tuple[int, int, str]]:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(_CACHE_FILE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+                self.stats.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -75,6 +75,8 @@ class BackendWithCompilerDemo(BackendDetails):
         RuntimeError: The module cannot be processed by the backend.
     """
 
+    preprocess_modifies_edge_program = False
+
     @staticmethod
     def preprocess(
         edge_program: ExportedProgram,
@@ -0,0 +1,82 @@
+#!/usr/bin/env fbpython
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Measures how long to_backend() takes to lower a program with many partitions.
+
+Exports a deep stack of mm + add blocks separated by relus, which
+AddMulPartitionerDemo splits into one partition per block, then times lowering
+it to BackendWithCompilerDemo. A few hundred partitions is in the range of what
+XNNPACK creates for MobileBERT, and a few thousand for a Llama 2 sized model.
+
+Usage: benchmark_to_backend.py [--num-partitions N] [--features N] [--iterations N]
+"""
+
+import argparse
+import time
+
+import executorch.exir as exir
+import torch
+from executorch.exir.backend.backend_api import to_backend
+from executorch.exir.backend.test.op_partitioner_demo import AddMulPartitionerDemo
+from torch._export.exported_program import ExportedProgram
+
+
+class MatmulStack(torch.nn.Module):
+    def __init__(self, num_blocks: int, features: int) -> None:
+        super().__init__()
+        self.weights = torch.nn.ParameterList(
+            [
+                torch.nn.Parameter(torch.randn(features, features))
+                for _ in range(num_blocks)
+            ]
+        )
+        self.biases = torch.nn.ParameterList(
+            [torch.nn.Parameter(torch.randn(features)) for _ in range(num_blocks)]
+        )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        for weight, bias in zip(self.weights, self.biases):
+            x = torch.relu(torch.mm(x, weight) + bias)
+        return x
+
+
+def export_program(num_blocks: int, features: int) -> ExportedProgram:
+    model = MatmulStack(num_blocks, features)
+    inputs = (torch.randn(1, features),)
+    return (
+        exir.capture(model, inputs, exir.CaptureConfig(enable_aot=True, _unlift=False))
+        .to_edge(exir.EdgeCompileConfig(_check_ir_validity=False))
+        .exported_program
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-partitions", type=int, default=300)
+    parser.add_argument("--features", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    edge_program = export_program(args.num_partitions, args.features)
+    num_nodes = len(edge_program.graph.nodes)
+    best_time = float("inf")
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        # to_backend copies the given program, so it can be lowered again
+        to_backend(edge_program, AddMulPartitionerDemo)
+        best_time = min(best_time, time.perf_counter() - start)
+
+    print(
+        f"to_backend: {best_time:8.3f} s for {args.num_partitions} partitions "
+        + f"in a graph of {num_nodes} nodes"
+    )
+
+
+if __name__ == "__main__":
+    main()
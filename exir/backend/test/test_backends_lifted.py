@@ -6,10 +6,15 @@
 
 import unittest
 from typing import Dict, List
+from unittest.mock import patch
 
 import executorch.exir as exir
 import torch
-from executorch.exir.backend.backend_api import LoweredBackendModule, to_backend
+from executorch.exir.backend.backend_api import (
+    LoweredBackendModule,
+    parallel_preprocess,
+    to_backend,
+)
 from executorch.exir.backend.compile_spec_schema import CompileSpec
 from executorch.exir.backend.partitioner import (
     DelegationSpec,
@@ -499,6 +504,29 @@ class TestBackends(unittest.TestCase):
         ):
             _ = to_backend("FakeBackendWithCompilerDemo", edgeir_m.exported_program, [])
 
+    def test_backend_preprocess_without_copy(self):
+        class SinModule(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+
+            def forward(self, x):
+                return torch.sin(x)
+
+        edgeir_m = exir.capture(
+            SinModule(), (torch.ones(1),), get_testing_capture_config()
+        ).to_edge()
+
+        # BackendWithCompilerDemo doesn't modify the program, so it's given the
+        # program itself rather than a copy
+        self.assertFalse(BackendWithCompilerDemo.preprocess_modifies_edge_program)
+        with patch.object(
+            BackendWithCompilerDemo,
+            "preprocess",
+            side_effect=BackendWithCompilerDemo.preprocess,
+        ) as preprocess:
+            to_backend("BackendWithCompilerDemo", edgeir_m.exported_program, [])
+        self.assertIs(preprocess.call_args.args[0], edgeir_m.exported_program)
+
     @vary_segments
     def test_backend_with_compiler_delegate_and_operator_with_two_modules(
         self, extract_segments: bool
@@ -872,6 +900,34 @@ class TestBackends(unittest.TestCase):
             torch.allclose(model_output[0], ref_output, atol=1e-03, rtol=1e-03),
         )
 
+    def test_add_mul_partitioner_parallel_preprocess(self):
+        class Model(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+
+            def forward(self, a, x, b):
+                y = torch.mm(a, x)
+                z = y + b
+                a = z - a
+                y = torch.mm(a, x)
+                z = y + b
+                return z
+
+        m = Model()
+        inputs = (torch.randn(2, 2), torch.randn(2, 2), torch.randn(2, 2))
+
+        def lower() -> bytes:
+            ep = exir.capture(m, inputs, get_testing_capture_config()).to_edge()
+            ep.exported_program = to_backend(ep.exported_program, AddMulPartitionerDemo)
+            return ep.to_executorch().buffer
+
+        serial_buffer = lower()
+        with parallel_preprocess(max_workers=2):
+            parallel_buffer = lower()
+
+        # The partitions are put back in order, so the programs are identical
+        self.assertEqual(parallel_buffer, serial_buffer)
+
     @vary_segments
     def test_partitioner_with_attributes(self, extract_segments: bool):
         """
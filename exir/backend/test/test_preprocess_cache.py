@@ -0,0 +1,145 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+import unittest
+
+import executorch.exir as exir
+import torch
+from executorch.exir.backend.backend_api import preprocess_cache, to_backend
+from executorch.exir.backend.backend_details import PreprocessResult
+from executorch.exir.backend.preprocess_cache import PreprocessCache
+from executorch.exir.backend.test.op_partitioner_demo import AddMulPartitionerDemo
+from executorch.exir.lowered_backend_module import get_lowered_backend_modules
+
+
+class Model(torch.nn.Module):
+    def forward(self, a, x, b):
+        y = torch.mm(a, x)
+        z = y + b
+        a = z - a
+        y = torch.mm(a, x)
+        z = y + b
+        return z
+
+
+class ModelWithPrefix(Model):
+    def forward(self, a, x, b):
+        # Not delegated, only shifts the debug handles of the partitions
+        b = torch.sin(b)
+        return super().forward(a, x, b)
+
+
+class TestPreprocessCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def to_backend(self, model: torch.nn.Module) -> exir.ExirExportedProgram:
+        inputs = (torch.randn(2, 2), torch.randn(2, 2), torch.randn(2, 2))
+        ep = exir.capture(
+            model, inputs, exir.CaptureConfig(enable_aot=True, _unlift=False)
+        ).to_edge()
+        ep.exported_program = to_backend(ep.exported_program, AddMulPartitionerDemo)
+        return ep
+
+    def lower(self) -> bytes:
+        return self.to_backend(Model()).to_executorch().buffer
+
+    def debug_handles(self, ep: exir.ExirExportedProgram):
+        return [
+            sorted(lowered_module.meta["debug_handle_map"].values())
+            for lowered_module in get_lowered_backend_modules(
+                ep.exported_program.graph_module
+            )
+        ]
+
+    def test_relowering_hits_cache(self) -> None:
+        uncached_buffer = self.lower()
+
+        cache = PreprocessCache(self.tmp_dir.name)
+        with preprocess_cache(cache):
+            first_buffer = self.lower()
+        self.assertEqual(cache.stats.hits, 0)
+        self.assertEqual(cache.stats.misses, 2)
+
+        # A new cache on the same directory reuses the stored results
+        cache = PreprocessCache(self.tmp_dir.name)
+        with preprocess_cache(cache):
+            second_buffer = self.lower()
+        self.assertEqual(cache.stats.hits, 2)
+        self.assertEqual(cache.stats.misses, 0)
+
+        self.assertEqual(first_buffer, uncached_buffer)
+        self.assertEqual(second_buffer, uncached_buffer)
+
+    def test_hits_partitions_with_shifted_debug_handles(self) -> None:
+        cache = PreprocessCache(self.tmp_dir.name)
+        with preprocess_cache(cache):
+            self.to_backend(Model())
+        uncached = self.to_backend(ModelWithPrefix())
+        with preprocess_cache(cache):
+            cached = self.to_backend(ModelWithPrefix())
+        self.assertEqual(cache.stats.hits, 2)
+        self.assertEqual(cache.stats.misses, 2)
+        self.assertEqual(self.debug_handles(cached), self.debug_handles(uncached))
+
+    def test_debug_handles_are_stored_relative_to_offset(self) -> None:
+        cache = PreprocessCache(self.tmp_dir.name)
+        cache.put(
+            "a",
+            PreprocessResult(
+                processed_bytes=b"abc", debug_handle_map={0: (10, 11), "x": (12,)}
+            ),
+            debug_handle_offset=10,
+        )
+        self.assertEqual(
+            cache.get("a", debug_handle_offset=20),
+            PreprocessResult(
+                processed_bytes=b"abc", debug_handle_map={0: (20, 21), "x": (22,)}
+            ),
+        )
+
+    def test_evicts_least_recently_used(self) -> None:
+        result = PreprocessResult(processed_bytes=b"x" * 100)
+        cache = PreprocessCache(self.tmp_dir.name)
+        cache.put("a", result)
+        cache.put("b", result)
+        entry_size = cache.size_bytes() // 2
+
+        # Use "a" after "b" was stored
+        os.utime(os.path.join(self.tmp_dir.name, "b.preprocess"), ns=(0, 0))
+        self.assertEqual(cache.get("a"), result)
+
+        cache.max_size_bytes = 2 * entry_size
+        cache.put("c", result)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), result)
+        self.assertEqual(cache.get("c"), result)
+        self.assertEqual(cache.stats.hits, 3)
+        self.assertEqual(cache.stats.misses, 1)
+
+    def test_corrupted_entry_is_a_miss(self) -> None:
+        cache = PreprocessCache(self.tmp_dir.name)
+        cache.put("a", PreprocessResult(processed_bytes=b"abc"))
+        with open(os.path.join(self.tmp_dir.name, "a.preprocess"), "wb") as f:
+            f.write(b"not a cache file")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.misses, 1)
+
+    def test_invalid_debug_handle_map_is_a_miss(self) -> None:
+        cache = PreprocessCache(self.tmp_dir.name)
+        cache.put("a", PreprocessResult(processed_bytes=b"abc"))
+        path = os.path.join(self.tmp_dir.name, "a.preprocess")
+        with open(path, "rb") as f:
+            data = f.read()
+        # Valid JSON of the same size as the stored "null", but of the wrong shape
+        with open(path, "wb") as f:
+            f.write(data.replace(b"null", b"[{}]"))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.misses, 1)
@@ -5,12 +5,13 @@
 # LICENSE file in the root directory of this source tree.
 
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 from executorch.exir.dynamic_shape import DynamicMemoryPlanningMode
 from executorch.exir.pass_manager import PassType
 from executorch.exir.passes import MemoryPlanningPass, ToOutVarPass
 from executorch.exir.passes.sym_shape_eval_pass import HintBasedSymShapeEvalPass
+from executorch.exir.schema import BackendDelegate
 from executorch.exir.tracer import ExirDynamoConfig
 from torch.fx._compatibility import compatibility
 
@@ -52,6 +53,24 @@ class ExecutorchBackendConfig:
     # This makes it possible to free those blobs at runtime.
     extract_segments: bool = False
 
+    # When extracting segments, delegate data smaller than this many bytes
+    # stays inline in the flatbuffer. Every segment starts at a multiple of
+    # segment_alignment, so moving many small blobs into segments can add more
+    # padding than the data itself.
+    delegate_segment_min_size: int = 0
+
+    # When extracting segments, if provided, called with each BackendDelegate
+    # whose data is at least delegate_segment_min_size bytes. The data stays
+    # inline in the flatbuffer if this returns False.
+    delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]] = None
+
+    # Whether to move constant tensor data (Program.constant_buffer) into a
+    # segment, rather than encoding it in the flatbuffer data. Tensors in the
+    # segment are aligned to constant_tensor_alignment, and the segment to
+    # segment_alignment, so the runtime can mmap the weights, load them lazily
+    # and share their pages across processes.
+    extract_constant_segment: bool = False
+
     # When extracting segments, the starting offset of each segment will be
     # aligned to this value (in bytes). When using mmap() to load segments, this
     # should be a multiple of the OS page size.
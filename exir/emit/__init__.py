@@ -7,5 +7,6 @@
 # pyre-strict
 
 from executorch.exir.emit._emit_program import emit_program, EmitterOutput
+from executorch.exir.emit._emitter import MethodConstantsReport
 
-__all__ = ["emit_program", "EmitterOutput"]
+__all__ = ["emit_program", "EmitterOutput", "MethodConstantsReport"]
@@ -5,7 +5,7 @@
 # LICENSE file in the root directory of this source tree.
 
 # pyre-strict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Union
 
 import executorch.extension.pytree as ex_pytree
@@ -16,6 +16,7 @@ from executorch.exir.emit._emitter import (
     _EmitterState,
     _ProgramState,
     _TopLevelEmitter,
+    MethodConstantsReport,
 )
 from executorch.exir.error import ExportError, ExportErrorType
 from executorch.exir.schema import (
@@ -120,6 +121,17 @@ class EmitterOutput:
         str, Dict[int, Dict[str, Union[str, _DelegateDebugIdentifierMap]]]
     ]
 
+    # The number of bytes of delegate data that weren't stored again in
+    # backend_delegate_data because an identical blob was already in the program.
+    deduplicated_delegate_bytes: int = 0
+
+    # This dictionary maps the method name to the sizes of its constant tensors,
+    # split by whether they were stored for the method or shared with a
+    # previously emitted method.
+    method_to_constants_report: Dict[str, MethodConstantsReport] = field(
+        default_factory=dict
+    )
+
 
 def emit_program(
     methods: Union[ExportedProgram, Dict[str, ExportedProgram]],
@@ -158,6 +170,7 @@ def emit_program(
     plans = []
     debug_handle_map = {}
     method_to_delegate_debug_id_map = {}
+    method_to_constants_report = {}
     program_state = _ProgramState()
 
     # emit each entry point in order according to name.
@@ -193,6 +206,7 @@ def emit_program(
         method_to_delegate_debug_id_map[
             name
         ] = emitter.instr_id_to_delegate_debug_id_map
+        method_to_constants_report[name] = emitter_state.constants_report
 
     # emit any primitive getters
     if prim_getters is not None:
@@ -201,6 +215,8 @@ def emit_program(
     return EmitterOutput(
         debug_handle_map=debug_handle_map,
         method_to_delegate_debug_id_map=method_to_delegate_debug_id_map,
+        deduplicated_delegate_bytes=program_state.deduplicated_delegate_bytes,
+        method_to_constants_report=method_to_constants_report,
         program=Program(
             version=EXECUTORCH_SCHEMA_VERSION,
             execution_plan=plans,
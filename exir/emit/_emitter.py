@@ -29,6 +29,7 @@ their instructions.
 
 # pyre-strict
 import ctypes
+import hashlib
 import operator
 import typing
 from dataclasses import dataclass, field
@@ -93,6 +94,74 @@ from torch.utils import _pytree as pytree
 from typing_extensions import TypeAlias
 
 
+# Identifies the contents of a constant tensor: its scalar type, shape, dim order, storage size in
+# bytes, and a digest of its storage.
+_ConstantKey: TypeAlias = Tuple[
+    torch.dtype, Tuple[int, ...], Tuple[int, ...], int, bytes
+]
+
+# Identifies a parameter or buffer shared between methods without looking at its data: its fully
+# qualified name, the address and size of its storage, its scalar type, shape and dim order.
+_SharedConstantKey: TypeAlias = Tuple[
+    str, int, int, torch.dtype, Tuple[int, ...], Tuple[int, ...]
+]
+
+
+def _storage_view(storage: torch.UntypedStorage) -> memoryview:
+    """Returns a read-only view of the bytes of a CPU storage without copying them."""
+    array = (ctypes.c_char * storage.nbytes()).from_address(storage.data_ptr())
+    return memoryview(array).cast("B").toreadonly()
+
+
+def _storages_equal(
+    storage: torch.UntypedStorage,
+    other: torch.UntypedStorage,
+    chunk_size: int = 1 << 20,
+) -> bool:
+    """Compares the bytes of two CPU storages, copying at most chunk_size bytes of each at a
+    time.
+    """
+    if storage.nbytes() != other.nbytes():
+        return False
+    view, other_view = _storage_view(storage), _storage_view(other)
+    for start in range(0, len(view), chunk_size):
+        end = start + chunk_size
+        if view[start:end].tobytes() != other_view[start:end].tobytes():
+            return False
+    return True
+
+
+def _constant_key(spec: TensorSpec) -> Optional[_ConstantKey]:
+    """Returns the key identifying the contents of a constant tensor, or None if the tensor is
+    empty.
+    """
+    if spec.allocated_memory == 0:
+        return None
+    storage = typing.cast(torch.UntypedStorage, spec.storage)
+    digest = hashlib.sha256(_storage_view(storage)).digest()
+    return (
+        spec.scalar_type,
+        tuple(spec.shape),
+        tuple(spec.dim_order),
+        storage.nbytes(),
+        digest,
+    )
+
+
+@dataclass
+class MethodConstantsReport:
+    """Sizes of the constant tensors of a method, by how they are stored in the program."""
+
+    # Bytes of the constant buffers added to the program by this method.
+    stored_bytes: int = 0
+    # Bytes of the parameters and buffers that reuse the constant buffer of the same parameter or
+    # buffer (same fully qualified name and storage) in a previously emitted method.
+    shared_bytes: int = 0
+    # Bytes of the constants that reuse a constant buffer with identical contents from a previously
+    # emitted method.
+    deduplicated_bytes: int = 0
+
+
 @dataclass
 class _ProgramState:
     """State shared between all methods of a program and the graph module it represents.
@@ -110,9 +179,58 @@ class _ProgramState:
     cached_spec_list_length: int = 0
     # The 0 index is reserved to be pointed to by non-constant tensors, so add an empty placeholder.
     constant_buffer: List[Buffer] = field(default_factory=lambda: [Buffer(storage=b"")])
+    # Maps the key of each allocated constant to the index of the first buffer in constant_buffer
+    # with that key, so that duplicates are found without comparing against every buffer. Empty
+    # constants all share the key None.
+    constant_buffer_index: Dict[Optional[_ConstantKey], int] = field(
+        default_factory=dict
+    )
+    # If True, constants with matching keys are also compared byte by byte before sharing a buffer,
+    # guarding against digest collisions.
+    verify_constant_matches: bool = True
+    # Maps the parameters and buffers that have been emitted to the index of their buffer in
+    # constant_buffer, and holds on to their storage so that its address isn't reused while
+    # emitting. A parameter reached from several methods is shared through this index without
+    # hashing or comparing its data.
+    shared_constant_index: Dict[
+        _SharedConstantKey, Tuple[int, torch.UntypedStorage]
+    ] = field(default_factory=dict)
     # Delegate data stored directly in the flatbuffer. Pointed to by BackendDelegateDataReference,
     # and should be copied to Program.backend_delegate_data.
     backend_delegate_data: List[BackendDelegateInlineData] = field(default_factory=list)
+    # Maps the data of each entry in backend_delegate_data to its index, so that delegates with
+    # identical blobs share one entry across all methods of the program.
+    backend_delegate_data_index: Dict[bytes, int] = field(default_factory=dict)
+    # The total size of the delegate blobs that reused an existing entry of backend_delegate_data
+    # instead of being stored again.
+    deduplicated_delegate_bytes: int = 0
+
+
+def _get_shared_buffer_idx(
+    spec: TensorSpec, fqn: Optional[str], program_state: _ProgramState
+) -> Tuple[Optional[_SharedConstantKey], int]:
+    """Looks up a parameter or buffer that a previous method already emitted by its fully qualified
+    name and storage identity, without looking at its data.
+
+    Returns the key to record the constant under, or None if it can't be shared this way, and the
+    index of its buffer in the constant buffers list, or -1 if it hasn't been emitted before.
+    """
+    if fqn is None or spec.allocated_memory == 0:
+        return None, -1
+    storage = typing.cast(torch.UntypedStorage, spec.storage)
+    shared_key = (
+        fqn,
+        storage.data_ptr(),
+        storage.nbytes(),
+        spec.scalar_type,
+        tuple(spec.shape),
+        tuple(spec.dim_order),
+    )
+    shared = program_state.shared_constant_index.get(shared_key)
+    # As with the constant keys, only buffers of previously emitted methods are shared.
+    if shared is None or shared[0] - 1 >= program_state.cached_spec_list_length:
+        return shared_key, -1
+    return shared_key, shared[0]
 
 
 @dataclass
@@ -132,6 +250,9 @@ class _EmitterState:
     emit_stacktrace: bool
 
     spec2id_dict: Dict[TensorSpec, int] = field(default_factory=dict)
+    constants_report: MethodConstantsReport = field(
+        default_factory=MethodConstantsReport
+    )
 
     def spec2id(self, spec: TensorSpec) -> int:
         """Map a TensorSpec to value index in the values array."""
@@ -323,8 +444,14 @@ class _Emitter(torch.fx.Interpreter):
             ExportErrorType.NOT_SUPPORTED, f"Unknown list type: {val_type}"
         )
 
-    def _tensor_spec_to_evalue(self, spec: TensorSpec) -> EValue:
-        """Constructs an EValue from the given TensorSpec."""
+    def _tensor_spec_to_evalue(
+        self, spec: TensorSpec, fqn: Optional[str] = None
+    ) -> EValue:
+        """Constructs an EValue from the given TensorSpec.
+
+        fqn is the fully qualified name of the parameter or buffer that a constant spec comes from,
+        if any.
+        """
         if not spec.const:
             if spec.mem_id is not None:
                 # Tensor is an activation.
@@ -347,75 +474,70 @@ class _Emitter(torch.fx.Interpreter):
             # For non-constant tensors, constant_buffer = 0.
             return EValue(make_tensor_value(0, allocation_info, spec))
 
-        def _get_buffer_idx(spec: TensorSpec, program_state: _ProgramState) -> int:
+        def _get_buffer_idx(
+            spec: TensorSpec, key: Optional[_ConstantKey], program_state: _ProgramState
+        ) -> int:
             """Determines where in the program state the constant buffer corresponding to spec is
             located.
 
             Returns the index into the constant buffers list if this spec has been previously
-            allocated, -1 if unseen before. O(N^2) as for every tensor we have to compare it against
-            every tensor previously allocated. Could improve this to O(N) if we hashed the weights.
+            allocated, -1 if unseen before. Constants are looked up by key, so this is O(1) per
+            tensor apart from hashing its data.
             """
-            for i in range(0, program_state.cached_spec_list_length):
-                other_spec = program_state.allocated_specs[i]
+            buffer_idx = program_state.constant_buffer_index.get(key, -1)
+            # Only constants from previously emitted methods are shared; -1 because the first
+            # buffer location is reserved.
+            if (
+                buffer_idx == -1
+                or buffer_idx - 1 >= program_state.cached_spec_list_length
+            ):
+                return -1
+            if key is not None and program_state.verify_constant_matches:
+                other_spec = program_state.allocated_specs[buffer_idx - 1]
+                if not _storages_equal(
+                    typing.cast(torch.UntypedStorage, spec.storage),
+                    typing.cast(torch.UntypedStorage, other_spec.storage),
+                ):
+                    return -1
+            return buffer_idx
 
-                # Check for an empty buffer, special cased to avoid nullptr in buffer check.
-                if spec.allocated_memory == 0 and other_spec.allocated_memory == 0:
-                    return i + 1
+        program_state = self.program_state
+        constants_report = self.emitter_state.constants_report
+        shared_key, buffer_idx = _get_shared_buffer_idx(spec, fqn, program_state)
+        if buffer_idx != -1:
+            constants_report.shared_bytes += typing.cast(
+                torch.UntypedStorage, spec.storage
+            ).nbytes()
+            return EValue(make_tensor_value(buffer_idx, None, spec))
 
-                # compare meta data
-                if (
-                    spec.scalar_type == other_spec.scalar_type
-                    and spec.shape == other_spec.shape
-                    and spec.dim_order == other_spec.dim_order
-                    and typing.cast(torch.UntypedStorage, spec.storage).nbytes()
-                    == typing.cast(torch.UntypedStorage, other_spec.storage).nbytes()
-                ):
-                    spec_array_type = (
-                        ctypes.c_char
-                        * typing.cast(torch.UntypedStorage, spec.storage).nbytes()
-                    )
-                    other_spec_array_type = (
-                        ctypes.c_char
-                        * typing.cast(torch.UntypedStorage, other_spec.storage).nbytes()
-                    )
-                    # compare data
-                    if bytes(
-                        ctypes.cast(
-                            typing.cast(torch.UntypedStorage, spec.storage).data_ptr(),
-                            ctypes.POINTER(spec_array_type),
-                        ).contents
-                    ) == bytes(
-                        ctypes.cast(
-                            typing.cast(
-                                torch.UntypedStorage, other_spec.storage
-                            ).data_ptr(),
-                            ctypes.POINTER(other_spec_array_type),
-                        ).contents
-                    ):
-                        return i + 1  # +1 because the first buffer location is reserved
-            return -1
-
-        buffer_idx = _get_buffer_idx(spec, self.program_state)
+        key = _constant_key(spec)
+        buffer_idx = _get_buffer_idx(spec, key, program_state)
 
         # Haven't seen this constant before
         if buffer_idx == -1:
-            if spec.allocated_memory == 0:
+            if key is None:
                 buffer = Buffer(storage=b"")
             else:
-                array_type = (
-                    ctypes.c_char
-                    * typing.cast(torch.UntypedStorage, spec.storage).nbytes()
+                buffer = Buffer(
+                    storage=_storage_view(
+                        typing.cast(torch.UntypedStorage, spec.storage)
+                    ).tobytes()
                 )
-                spec_array = ctypes.cast(
-                    typing.cast(torch.UntypedStorage, spec.storage).data_ptr(),
-                    ctypes.POINTER(array_type),
-                ).contents
-                buffer = Buffer(storage=bytes(spec_array))
 
             # Update buffer_idx to point to the end of the list where we are adding the new buffer.
             buffer_idx = len(self.program_state.constant_buffer)
             self.program_state.allocated_specs.append(spec)
             self.program_state.constant_buffer.append(buffer)
+            self.program_state.constant_buffer_index.setdefault(key, buffer_idx)
+            constants_report.stored_bytes += len(buffer.storage)
+        elif key is not None:
+            constants_report.deduplicated_bytes += key[3]
+
+        if shared_key is not None:
+            program_state.shared_constant_index.setdefault(
+                shared_key,
+                (buffer_idx, typing.cast(torch.UntypedStorage, spec.storage)),
+            )
 
         # For constant tensors, allocation_info = None.
         return EValue(make_tensor_value(buffer_idx, None, spec))
@@ -949,12 +1071,18 @@ class _Emitter(torch.fx.Interpreter):
         delegate_index = self.emitter_state.delegate_cache.get(processed_bytes)
         delegate_ret = self._emit_spec(self.node.meta["spec"])
         if delegate_index is None:
-            # Allocate an entry for the data. TODO(T150113674): Reuse any duplicate entries if
-            # present.
-            data_index: int = len(self.program_state.backend_delegate_data)
-            self.program_state.backend_delegate_data.append(
-                BackendDelegateInlineData(data=processed_bytes)
-            )
+            # Reuse the entry for the data if another delegate of the program, possibly in another
+            # method, has the same blob. Otherwise allocate one.
+            program_state = self.program_state
+            data_index = program_state.backend_delegate_data_index.get(processed_bytes)
+            if data_index is None:
+                data_index = len(program_state.backend_delegate_data)
+                program_state.backend_delegate_data.append(
+                    BackendDelegateInlineData(data=processed_bytes)
+                )
+                program_state.backend_delegate_data_index[processed_bytes] = data_index
+            else:
+                program_state.deduplicated_delegate_bytes += len(processed_bytes)
 
             backend_delegate = BackendDelegate(
                 id=lowered_module.backend_id,
@@ -1335,6 +1463,7 @@ class _TopLevelEmitter(_Emitter):
         """
         spec = self.node.meta["spec"]
         const_tensor = False
+        fqn = None
         if isinstance(target, str) and (
             target in self.exported_program.graph_signature.inputs_to_parameters
             or target in self.exported_program.graph_signature.inputs_to_buffers
@@ -1350,7 +1479,7 @@ class _TopLevelEmitter(_Emitter):
             )
             const_tensor = True
         evalue = (
-            self._tensor_spec_to_evalue(spec)
+            self._tensor_spec_to_evalue(spec, fqn)
             if isinstance(spec, TensorSpec)
             else self._constant_to_evalue(spec, None)
         )
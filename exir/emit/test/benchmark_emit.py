@@ -0,0 +1,83 @@
+#!/usr/bin/env fbpython
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Measures how long emit_program() takes for a model with many parameters.
+
+Exports two methods that share every parameter of a deep stack of small linear
+layers, then times emitting them into a single program. Every constant of the
+second method is a duplicate of one in the first, so this exercises constant
+deduplication on the order of thousands of weights.
+
+Usage: benchmark_emit.py [--num-layers N] [--features N] [--iterations N]
+"""
+
+import argparse
+import time
+from typing import Dict
+
+import executorch.exir as exir
+import torch
+from executorch.exir.emit import emit_program
+from torch._export.exported_program import ExportedProgram
+
+
+class DeepLinear(torch.nn.Module):
+    def __init__(self, num_layers: int, features: int) -> None:
+        super().__init__()
+        self.layers = torch.nn.ModuleList(
+            [torch.nn.Linear(features, features) for _ in range(num_layers)]
+        )
+
+    def forward_relu(self, x: torch.Tensor) -> torch.Tensor:
+        for layer in self.layers:
+            x = torch.nn.functional.relu(layer(x))
+        return x
+
+    def forward_sigmoid(self, x: torch.Tensor) -> torch.Tensor:
+        for layer in self.layers:
+            x = torch.nn.functional.sigmoid(layer(x))
+        return x
+
+
+def export_methods(num_layers: int, features: int) -> Dict[str, ExportedProgram]:
+    model = DeepLinear(num_layers, features)
+    inputs = (torch.ones(1, features),)
+    return {
+        name: exir.capture(getattr(model, name), inputs, exir.CaptureConfig())
+        .to_edge(exir.EdgeCompileConfig(_check_ir_validity=False))
+        .to_executorch()
+        .dump_exported_program()
+        for name in ("forward_relu", "forward_sigmoid")
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-layers", type=int, default=1000)
+    parser.add_argument("--features", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    methods = export_methods(args.num_layers, args.features)
+    best_time = float("inf")
+    num_buffers = 0
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        program = emit_program(methods).program
+        best_time = min(best_time, time.perf_counter() - start)
+        num_buffers = len(program.constant_buffer)
+
+    print(
+        f"emit_program: {best_time:8.3f} s for {2 * args.num_layers} linear layers, "
+        + f"{num_buffers - 1} unique constant buffers"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -988,6 +988,30 @@ class TestEmit(unittest.TestCase):
             merged_program.execution_plan[1], program_sigmoid.program.execution_plan[0]
         )
 
+    def test_emit_weight_deduplication_distinct_weights(self) -> None:
+        class SimpleLinear(torch.nn.Module):
+            def __init__(self) -> None:
+                super().__init__()
+                self.linear = torch.nn.Linear(5, 5)
+
+            def forward(self, x: torch.Tensor) -> torch.Tensor:
+                return torch.nn.functional.relu(self.linear(x))
+
+        inputs = (torch.ones(10, 5),)
+        exir_input = {}
+        for name in ("forward_a", "forward_b"):
+            # Same metadata, different data: nothing should be shared.
+            exir_input[name] = (
+                exir.capture(SimpleLinear(), inputs, exir.CaptureConfig())
+                .to_edge(exir.EdgeCompileConfig(_check_ir_validity=False))
+                .to_executorch()
+                .dump_exported_program()
+            )
+        merged_program = emit_program(exir_input, False).program
+
+        # reserved spot, and a weight and bias for each method
+        self.assertEqual(len(merged_program.constant_buffer), 5)
+
     def test_emit_execution_plans_sorted(self) -> None:
         class Simple(torch.nn.Module):
             def __init__(self) -> None:
@@ -1280,6 +1304,61 @@ class TestEmit(unittest.TestCase):
         )
         exec_prog.buffer
 
+    def test_delegate_data_shared_between_methods(self) -> None:
+        class SharedBlobBackendDemo(BackendDetails):
+            @staticmethod
+            def preprocess(
+                edge_program,
+                compile_specs,
+            ) -> bytes:
+                return PreprocessResult(
+                    processed_bytes=bytes(str("shared"), encoding="utf8"),
+                    debug_handle_map=None,
+                )
+
+        class Encoder(nn.Module):
+            def forward(self, x):
+                return torch.sin(x)
+
+        inputs = (torch.ones(2, 2),)
+        edgeir_m = exir.capture(Encoder(), inputs, exir.CaptureConfig()).to_edge(
+            exir.EdgeCompileConfig(_check_ir_validity=False)
+        )
+        lowered_module = to_backend(
+            "SharedBlobBackendDemo", edgeir_m.exported_program, []
+        )
+
+        class CompositeModule(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.lowered_module = lowered_module
+
+            def prefill(self, x):
+                return self.lowered_module(x)
+
+            def decode(self, x):
+                return self.lowered_module(x) + x
+
+        composite_model = CompositeModule()
+        methods = {
+            name: exir.capture(
+                getattr(composite_model, name), inputs, exir.CaptureConfig()
+            )
+            .to_edge(exir.EdgeCompileConfig(_check_ir_validity=False))
+            .to_executorch()
+            .dump_exported_program()
+            for name in ("prefill", "decode")
+        }
+        emitter_output = emit_program(methods)
+        program = emitter_output.program
+
+        # Both methods point to a single copy of the blob
+        self.assertEqual(len(program.backend_delegate_data), 1)
+        for plan in program.execution_plan:
+            self.assertEqual(len(plan.delegates), 1)
+            self.assertEqual(plan.delegates[0].processed.index, 0)
+        self.assertEqual(emitter_output.deduplicated_delegate_bytes, len(b"shared"))
+
     def test_delegate_with_input_tuple(self) -> None:
         class BackendWithCompilerDemo(BackendDetails):
             @staticmethod
@@ -0,0 +1,211 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Summarizes how well a memory plan packs the tensors of a graph.
+
+For each memory buffer, a MemoryPlanReport records the bytes that are alive at
+every node, the largest of them (a lower bound on the buffer size that no plan
+can beat), the size that was actually planned, and the tensors alive at the
+peak, so that the layers driving the buffer size and the quality of different
+planning algorithms can be compared.
+"""
+
+import json
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import torch
+from executorch.exir import memory
+from executorch.exir.memory_planning import (
+    collect_specs_from_nodes,
+    get_node_tensor_specs,
+)
+from executorch.exir.tensor import TensorSpec
+
+
+@dataclass
+class TensorReport:
+    """A planned tensor that is alive at the peak of its buffer."""
+
+    # The name of the node that produces the tensor, preferring the op that
+    # writes it over the memory.alloc node that allocates it.
+    node_name: str
+    # The stack trace of that node in the original program, if known.
+    stack_trace: Optional[str]
+    size: int
+    mem_offset: int
+    lifetime: List[int]
+
+
+@dataclass
+class BufferReport:
+    """The memory plan of a single buffer, identified by its mem_id."""
+
+    mem_id: int
+    # The bytes of the tensors planned in this buffer that are alive at each
+    # node of the graph, by node index.
+    live_bytes: List[int]
+    # The node index at which live_bytes is highest.
+    peak_node_idx: int
+    # The highest value of live_bytes. No plan can use less memory.
+    lower_bound: int
+    # The end of the highest planned tensor in this buffer.
+    arena_size: int
+    # The part of arena_size, in percent, that is not needed at the peak.
+    fragmentation_percent: float
+    # The largest tensors alive at peak_node_idx, largest first.
+    top_tensors: List[TensorReport] = field(default_factory=list)
+
+
+@dataclass
+class MemoryPlanReport:
+    """The memory plan of each buffer of a graph, by mem_id."""
+
+    buffers: Dict[int, BufferReport]
+    # The planned size of each buffer including control flow submodules, as
+    # found in the graph module's meta["non_const_buffer_sizes"].
+    bufsizes: List[int] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_dataframe(self) -> Any:
+        """Returns a pandas DataFrame with one row per top tensor of each
+        buffer, next to the metrics of its buffer.
+        """
+        import pandas as pd
+
+        rows = []
+        for buffer in self.buffers.values():
+            buffer_columns = {
+                "mem_id": buffer.mem_id,
+                "lower_bound": buffer.lower_bound,
+                "arena_size": buffer.arena_size,
+                "fragmentation_percent": buffer.fragmentation_percent,
+                "peak_node_idx": buffer.peak_node_idx,
+            }
+            for tensor in buffer.top_tensors:
+                rows.append({**buffer_columns, **asdict(tensor)})
+            if not buffer.top_tensors:
+                rows.append(buffer_columns)
+        return pd.DataFrame(rows)
+
+
+def _get_producer_nodes(
+    nodes: Iterable[torch.fx.Node],
+) -> Dict[TensorSpec, torch.fx.Node]:
+    """Returns the node that produces each tensor."""
+    producers: Dict[TensorSpec, torch.fx.Node] = {}
+    for node in nodes:
+        for spec in get_node_tensor_specs(node):
+            if spec is None:
+                continue
+            producer = producers.get(spec)
+            if producer is None or (
+                producer.target == memory.alloc and node.op == "call_function"
+            ):
+                producers[spec] = node
+    return producers
+
+
+def build_memory_plan_report(
+    graph_module: torch.fx.GraphModule,
+    alloc_graph_input: bool = True,
+    alloc_graph_output: bool = True,
+    top_n: int = 10,
+) -> MemoryPlanReport:
+    """Builds a MemoryPlanReport of the tensors planned in graph_module.
+
+    Must run after memory planning. Only covers the tensors of graph_module
+    itself; the storage that control flow submodules use on top of them is
+    only included in `bufsizes`.
+
+    Args:
+        graph_module: The planned graph.
+        alloc_graph_input: Whether graph inputs were planned.
+        alloc_graph_output: Whether graph outputs were planned.
+        top_n: The number of tensors alive at the peak to list per buffer.
+    Returns:
+        The report.
+    """
+    nodes = graph_module.graph.nodes
+    specs = [
+        spec
+        for spec in collect_specs_from_nodes(
+            nodes,
+            do_assertion=False,
+            ignore_graph_input=not alloc_graph_input,
+            ignore_graph_output=not alloc_graph_output,
+        )
+        if spec.mem_id is not None and spec.mem_offset is not None
+    ]
+    producers = _get_producer_nodes(nodes)
+
+    specs_by_mem_id: Dict[int, List[TensorSpec]] = defaultdict(list)
+    for spec in specs:
+        specs_by_mem_id[spec.mem_id].append(spec)
+
+    buffers: Dict[int, BufferReport] = {}
+    for mem_id, mem_specs in sorted(specs_by_mem_id.items()):
+        # Accumulate the change in live bytes at each node.
+        live_bytes = [0] * (len(nodes) + 1)
+        for spec in mem_specs:
+            start, end = spec.lifetime
+            live_bytes[start] += spec.allocated_memory
+            live_bytes[end + 1] -= spec.allocated_memory
+        for node_idx in range(1, len(live_bytes)):
+            live_bytes[node_idx] += live_bytes[node_idx - 1]
+        live_bytes.pop()
+
+        lower_bound = max(live_bytes, default=0)
+        peak_node_idx = live_bytes.index(lower_bound) if live_bytes else 0
+        arena_size = max(spec.mem_offset + spec.allocated_memory for spec in mem_specs)
+        peak_specs = sorted(
+            (
+                spec
+                for spec in mem_specs
+                if spec.lifetime[0] <= peak_node_idx <= spec.lifetime[1]
+            ),
+            key=lambda spec: -spec.allocated_memory,
+        )
+        top_tensors = []
+        for spec in peak_specs[:top_n]:
+            producer = producers.get(spec)
+            top_tensors.append(
+                TensorReport(
+                    node_name=producer.name if producer is not None else "",
+                    stack_trace=(
+                        producer.meta.get("stack_trace")
+                        if producer is not None
+                        else None
+                    ),
+                    size=spec.allocated_memory,
+                    mem_offset=spec.mem_offset,
+                    lifetime=list(spec.lifetime),
+                )
+            )
+        buffers[mem_id] = BufferReport(
+            mem_id=mem_id,
+            live_bytes=live_bytes,
+            peak_node_idx=peak_node_idx,
+            lower_bound=lower_bound,
+            arena_size=arena_size,
+            fragmentation_percent=(
+                100.0 * (arena_size - lower_bound) / arena_size if arena_size else 0.0
+            ),
+            top_tensors=top_tensors,
+        )
+
+    return MemoryPlanReport(
+        buffers=buffers,
+        bufsizes=list(graph_module.meta.get("non_const_buffer_sizes", [])),
+    )
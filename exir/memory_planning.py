@@ -6,13 +6,15 @@
 
 # pyre-strict
 
+import bisect
+import heapq
 import itertools
 import logging
 import operator
 import typing
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Iterable, List, Set, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import torch
 from executorch.exir import memory
@@ -98,20 +100,9 @@ class Verifier:
             )
         return lhs_spec.mem_id == rhs_spec.mem_id and cls.has_overlap(*intervals)
 
-    def verify_storage_reuse(
-        self, allow_lifetime_and_storage_overlap: bool = False
-    ) -> int:
-        """
-        'allow_lifetime_and_storage_overlap' allows tensors to overlap in both
-        lifetime and storage. If is it False, and two tensors have both overlapping
-        lifetime and storage, throw an exception.
-        Returns:
-            Number of pairs of tenors that have overlapping storage.
-        """
-        num_reuse_pairs = 0
-
+    def _collect_planned_specs(self) -> List[TensorSpec]:
         # unique tensors specs
-        all_specs = list(
+        return list(
             collect_specs_from_nodes(
                 self.graph_module.graph.nodes,
                 ignore_const=True,
@@ -123,17 +114,111 @@ class Verifier:
             )
         )
 
+    @classmethod
+    def _verify_storage_reuse_pairwise(
+        cls,
+        all_specs: List[TensorSpec],
+        allow_lifetime_and_storage_overlap: bool,
+    ) -> int:
+        """
+        Reference implementation of verify_storage_reuse that compares every
+        pair of specs. Takes O(N^2) time.
+        """
+        num_reuse_pairs = 0
         for lhs_spec_idx, lhs_spec in enumerate(all_specs):
             for rhs_spec in all_specs[lhs_spec_idx + 1 :]:
-                if not self.storage_overlap(lhs_spec, rhs_spec):
+                if not cls.storage_overlap(lhs_spec, rhs_spec):
                     continue
-                if not allow_lifetime_and_storage_overlap and self.lifetime_overlap(
+                if not allow_lifetime_and_storage_overlap and cls.lifetime_overlap(
                     lhs_spec, rhs_spec
                 ):
                     raise InternalError(
                         f"Unexpected storage overlap: lhs {lhs_spec}, rhs {rhs_spec}"
                     )
-                num_reuse_pairs += Verifier.storage_overlap(lhs_spec, rhs_spec)
+                num_reuse_pairs += cls.storage_overlap(lhs_spec, rhs_spec)
+
+        return num_reuse_pairs
+
+    def verify_storage_reuse(
+        self, allow_lifetime_and_storage_overlap: bool = False
+    ) -> int:
+        """
+        'allow_lifetime_and_storage_overlap' allows tensors to overlap in both
+        lifetime and storage. If is it False, and two tensors have both overlapping
+        lifetime and storage, throw an exception.
+
+        Sweeps over the specs of each memory buffer in offset order, keeping
+        the specs whose storage covers the current offset active. Those must
+        have disjoint lifetimes, so they are kept sorted by lifetime and each
+        new spec is only checked against its neighbor. Takes O(N log N) time,
+        and reports the same pair count and first conflict as comparing every
+        pair of specs would.
+        Returns:
+            Number of pairs of tenors that have overlapping storage.
+        """
+        all_specs = self._collect_planned_specs()
+        if len(all_specs) < 2:
+            return 0
+
+        specs_by_mem_id: Dict[int, List[TensorSpec]] = defaultdict(list)
+        for spec in all_specs:
+            internal_assert(
+                spec.allocated_memory >= 0,
+                f"{spec} should have non-zero allocated memory",
+            )
+            internal_assert(
+                isinstance(spec.mem_offset, int) and spec.mem_offset >= 0,
+                f"{spec} should have specified memory offset",
+            )
+            # Tensors without storage can't overlap with anything.
+            if spec.allocated_memory > 0:
+                specs_by_mem_id[spec.mem_id].append(spec)
+
+        num_reuse_pairs = 0
+        for specs in specs_by_mem_id.values():
+            specs.sort(key=lambda spec: spec.mem_offset)
+            # (last storage byte, index into specs) of the active specs.
+            active_storage: List[Tuple[int, int]] = []
+            # (lifetime start, lifetime end, index into specs) of the active
+            # specs with non-empty lifetimes, sorted.
+            active_lifetimes: List[Tuple[int, int, int]] = []
+            for idx, spec in enumerate(specs):
+                while active_storage and active_storage[0][0] < spec.mem_offset:
+                    _, inactive_idx = heapq.heappop(active_storage)
+                    start, end = specs[inactive_idx].lifetime
+                    if not allow_lifetime_and_storage_overlap and start <= end:
+                        del active_lifetimes[
+                            bisect.bisect_left(
+                                active_lifetimes, (start, end, inactive_idx)
+                            )
+                        ]
+                num_reuse_pairs += len(active_storage)
+                heapq.heappush(
+                    active_storage,
+                    (spec.mem_offset + spec.allocated_memory - 1, idx),
+                )
+                if allow_lifetime_and_storage_overlap:
+                    continue
+
+                start, end = spec.lifetime
+                internal_assert(
+                    start is not None and end is not None,
+                    f"{spec} should have valid start and end",
+                )
+                if start > end:
+                    continue
+                # The active lifetime starting last before this one ends is
+                # the only one that can overlap it.
+                pos = bisect.bisect_left(active_lifetimes, (end + 1, -1, -1))
+                if pos > 0 and active_lifetimes[pos - 1][1] >= start:
+                    # Report the same conflict that comparing every pair of
+                    # specs in order would.
+                    self._verify_storage_reuse_pairwise(all_specs, False)
+                    other_spec = specs[active_lifetimes[pos - 1][2]]
+                    raise InternalError(
+                        f"Unexpected storage overlap: lhs {other_spec}, rhs {spec}"
+                    )
+                bisect.insort(active_lifetimes, (start, end, idx))
 
         return num_reuse_pairs
 
@@ -457,6 +542,40 @@ def get_node_tensor_specs(
         return specs
 
 
+def _materialize_shared_objects(
+    graph_module: torch.fx.GraphModule,
+    shared_objects: Dict[int, List[SharedObject]],
+    spec2obj: Dict[TensorSpec, SharedObject],
+) -> List[int]:
+    r"""
+    Lay out the shared objects of each memory buffer one after another, and
+    set the offset of each tensor to the offset of its shared object.
+
+    Returns the size of each memory buffer, indexed by mem_id.
+    """
+    if len(shared_objects) == 0:
+        # Cannot find any tensor in the graph that needs to be allocated.
+        # Return [0, 0] to be consistent with default behavior of naive.
+        return [0, 0]
+
+    total_sizes = [0] * (max(shared_objects.keys()) + 1)
+    for mem_id in shared_objects:
+        input_total_size = 0
+        if bufsizes := getattr(graph_module, "input_mem_buffer_sizes", None):
+            if len(bufsizes) > mem_id:
+                input_total_size = bufsizes[mem_id]
+        total_sizes[mem_id] = materialize_buffer(
+            shared_objects[mem_id], input_total_size
+        )
+
+    # Since we now know the number of shared objects we need and the size of
+    # each shared object, we can assign offset in the memory buffer for each
+    # shared object.
+    for spec, sobj in spec2obj.items():
+        spec.mem_offset = sobj.offset
+    return total_sizes
+
+
 @register_algo
 def greedy(
     graph_module: torch.fx.GraphModule,
@@ -483,28 +602,413 @@ def greedy(
         spec.realign(alignment)
         spec2obj[spec] = pick_shared_obj(shared_objects[spec.mem_id], spec)
 
-    if len(shared_objects) == 0:
-        # Cannot find any tensor in the graph that needs to be allocated.
-        # Return [0, 0] to be consistent with default behavior of naive.
-        total_sizes = [0, 0]
-    else:
-        total_sizes = [0] * (max(shared_objects.keys()) + 1)
-        for mem_id in shared_objects:
-            input_total_size = 0
-            if bufsizes := getattr(graph_module, "input_mem_buffer_sizes", None):
-                if len(bufsizes) > mem_id:
-                    input_total_size = bufsizes[mem_id]
-            total_sizes[mem_id] = materialize_buffer(
-                shared_objects[mem_id], input_total_size
+    total_sizes = _materialize_shared_objects(graph_module, shared_objects, spec2obj)
+
+    logging.debug(f"greedy algorithm returns bufsizes: {total_sizes}")
+    return total_sizes
+
+
+class _FreeSharedObjects:
+    r"""
+    The free shared objects of a memory buffer, bucketed by size. Each bucket
+    is a min-heap of indices into the list of shared objects, so the earliest
+    created object of a size comes first, and a segment tree over the buckets
+    finds the earliest created object in a range of sizes.
+
+    Shared objects only take the sizes of the tensors allocated from them, so
+    the sizes of all buckets are known up front.
+    """
+
+    # Value of the tree nodes without any free object below them.
+    _EMPTY: Tuple[float, int] = (float("inf"), -1)
+
+    def __init__(self, sizes: Iterable[int]) -> None:
+        self.sizes: List[int] = sorted(set(sizes))
+        self._buckets: List[List[int]] = [[] for _ in self.sizes]
+        self._num_leaves = 1
+        while self._num_leaves < len(self.sizes):
+            self._num_leaves *= 2
+        # (earliest created object, bucket) of each subtree, leaves last.
+        self._tree: List[Tuple[float, int]] = [self._EMPTY] * (2 * self._num_leaves)
+
+    def _update(self, bucket: int) -> None:
+        node = bucket + self._num_leaves
+        heap = self._buckets[bucket]
+        self._tree[node] = (heap[0], bucket) if heap else self._EMPTY
+        while node > 1:
+            node //= 2
+            self._tree[node] = min(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def bucket(self, size: int) -> int:
+        return bisect.bisect_left(self.sizes, size)
+
+    def add(self, size: int, obj_idx: int) -> None:
+        bucket = self.bucket(size)
+        heapq.heappush(self._buckets[bucket], obj_idx)
+        self._update(bucket)
+
+    def earliest(self, bucket: int) -> int:
+        return self._buckets[bucket][0]
+
+    def pop(self, bucket: int) -> int:
+        r"""
+        Remove the earliest created object of the bucket and return its index.
+        """
+        obj_idx = heapq.heappop(self._buckets[bucket])
+        self._update(bucket)
+        return obj_idx
+
+    def earliest_in_range(self, lo: int, hi: int) -> Optional[int]:
+        r"""
+        Return the bucket in [lo, hi) holding the earliest created object, or
+        None if these buckets are empty.
+        """
+        best = self._EMPTY
+        lo += self._num_leaves
+        hi += self._num_leaves
+        while lo < hi:
+            if lo & 1:
+                best = min(best, self._tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = min(best, self._tree[hi])
+            lo //= 2
+            hi //= 2
+        return None if best == self._EMPTY else best[1]
+
+    def first_at_or_after(self, bucket: int) -> Optional[int]:
+        r"""
+        Return the first non-empty bucket at or after `bucket`, if any.
+        """
+        tree = self._tree
+        if bucket >= len(self.sizes):
+            return None
+        node = bucket + self._num_leaves
+        while tree[node] == self._EMPTY:
+            # Move to the next subtree to the right.
+            while node & 1:
+                node //= 2
+            if node == 0:
+                return None
+            node += 1
+        while node < self._num_leaves:
+            node = 2 * node if tree[2 * node] != self._EMPTY else 2 * node + 1
+        return node - self._num_leaves
+
+    def last_before(self, bucket: int) -> Optional[int]:
+        r"""
+        Return the last non-empty bucket before `bucket`, if any.
+        """
+        tree = self._tree
+        if bucket <= 0:
+            return None
+        node = bucket - 1 + self._num_leaves
+        while tree[node] == self._EMPTY:
+            # Move to the next subtree to the left.
+            while node & 1 == 0:
+                node //= 2
+            if node == 1:
+                return None
+            node -= 1
+        while node < self._num_leaves:
+            node = 2 * node + 1 if tree[2 * node + 1] != self._EMPTY else 2 * node
+        return node - self._num_leaves
+
+
+class SharedObjectPool:
+    r"""
+    The shared objects of a single memory buffer, indexed so that the shared
+    object with the closest size to a tensor can be found without scanning
+    all of them.
+
+    Shared objects still in use are kept in a min-heap keyed by
+    last_used_index, and move to the free objects bucketed by size once the
+    tensors being allocated start after that index. Tensors must be allocated
+    in order of their lifetime start, and be no larger than the largest of
+    `sizes`.
+    """
+
+    def __init__(self, sizes: Iterable[int]) -> None:
+        self.shared_objects: List[SharedObject] = []
+        # (last_used_index, index into shared_objects) of the busy objects.
+        self._busy: List[Tuple[int, int]] = []
+        self._free = _FreeSharedObjects(sizes)
+
+    def _release_until(self, node_idx: int) -> None:
+        while self._busy and self._busy[0][0] < node_idx:
+            _, obj_idx = heapq.heappop(self._busy)
+            self._free.add(self.shared_objects[obj_idx].size, obj_idx)
+
+    def _claim(self, bucket: int, spec: TensorSpec) -> SharedObject:
+        obj_idx = self._free.pop(bucket)
+        sobj = self.shared_objects[obj_idx]
+        sobj.last_used_index = spec.lifetime[1]
+        sobj.size = max(sobj.size, spec.allocated_memory)
+        heapq.heappush(self._busy, (sobj.last_used_index, obj_idx))
+        return sobj
+
+    def _create(self, spec: TensorSpec) -> SharedObject:
+        obj_idx = len(self.shared_objects)
+        self.shared_objects.append(
+            SharedObject(-1, spec.allocated_memory, spec.lifetime[1])
+        )
+        heapq.heappush(self._busy, (spec.lifetime[1], obj_idx))
+        return self.shared_objects[obj_idx]
+
+    def pick(self, spec: TensorSpec) -> SharedObject:
+        r"""
+        Pick the available shared object with closest size to the tensor,
+        preferring the earliest created one on ties, or create a new one if
+        none are available.
+        """
+        size = spec.allocated_memory
+        self._release_until(spec.lifetime[0])
+        free = self._free
+        bucket = free.bucket(size)
+        # The smallest objects at least as large as the tensor, and the
+        # largest smaller ones.
+        candidates = [
+            b
+            for b in (free.first_at_or_after(bucket), free.last_before(bucket))
+            if b is not None
+        ]
+        if not candidates:
+            return self._create(spec)
+        return self._claim(
+            min(
+                candidates, key=lambda b: (abs(free.sizes[b] - size), free.earliest(b))
+            ),
+            spec,
+        )
+
+    def pick_like_greedy(self, spec: TensorSpec) -> SharedObject:
+        r"""
+        Pick the same shared object as pick_shared_obj, with the same side
+        effects, given the shared objects in the same state.
+
+        pick_shared_obj claims every available object that is closer to the
+        size of the tensor than the last one it claimed, after that one grew
+        to fit the tensor. Each of them is the earliest created available
+        object within that distance, which is found without scanning the
+        others.
+        """
+        size = spec.allocated_memory
+        self._release_until(spec.lifetime[0])
+        free = self._free
+        bucket = free.earliest_in_range(0, len(free.sizes))
+        if bucket is None:
+            return self._create(spec)
+        while True:
+            sobj = self._claim(bucket, spec)
+            # Claimed objects grow to fit the tensor.
+            dist = sobj.size - size
+            if dist == 0:
+                return sobj
+            bucket = free.earliest_in_range(
+                bisect.bisect_right(free.sizes, size - dist),
+                bisect.bisect_left(free.sizes, size + dist),
             )
+            if bucket is None:
+                return sobj
 
-        # Since we now know the number of shared objects we need and the size of
-        # each shared object, we can assign offset in the memory buffer for each
-        # shared object.
-        for spec, sobj in spec2obj.items():
-            spec.mem_offset = sobj.offset
 
-    logging.debug(f"greedy algorithm returns bufsizes: {total_sizes}")
+def _plan_shared_objects(
+    specs: List[TensorSpec], like_greedy: bool
+) -> Tuple[List[SharedObject], List[SharedObject]]:
+    r"""
+    Pick a shared object for each of `specs`, which share a memory buffer, from
+    a SharedObjectPool. Returns the shared objects, and the one picked for each
+    tensor.
+    """
+    pool = SharedObjectPool(spec.allocated_memory for spec in specs)
+    pick = pool.pick_like_greedy if like_greedy else pool.pick
+    return pool.shared_objects, [pick(spec) for spec in specs]
+
+
+@register_algo
+def greedy_heap(
+    graph_module: torch.fx.GraphModule,
+    alignment: int,
+    alloc_graph_input: bool = True,
+    alloc_graph_output: bool = True,
+) -> List[int]:
+    r"""
+    Like greedy, give each tensor the available shared object with the
+    closest size, but look it up in a SharedObjectPool instead of scanning
+    every shared object. Tensors are allocated in order of lifetime start.
+
+    Each buffer is also planned with the same choices as greedy, which are
+    found from the pool as well, and the smaller of the two plans is kept, so
+    the buffers are never larger than greedy's. Planning takes O(N log N)
+    time for N tensors, plus O(log N) for each object that greedy claims
+    without using it, instead of O(N * M) for M shared objects.
+    """
+    spec2obj: Dict[TensorSpec, SharedObject] = {}
+    shared_objects: Dict[int, List[SharedObject]] = {}
+    do_assertion = not getattr(graph_module, "encounter_to_out_var_failure", False)
+    specs_by_mem_id: Dict[int, List[TensorSpec]] = defaultdict(list)
+    for spec in collect_specs_from_nodes(
+        graph_module.graph.nodes,
+        do_assertion=do_assertion,
+        ignore_graph_input=not alloc_graph_input,
+        ignore_graph_output=not alloc_graph_output,
+    ):
+        if spec.mem_id is None:
+            spec.mem_id = 1
+        spec.realign(alignment)
+        specs_by_mem_id[spec.mem_id].append(spec)
+
+    for mem_id, specs in specs_by_mem_id.items():
+        # sorted() is stable, so tensors starting at the same node keep the
+        # order greedy sees them in.
+        sorted_specs = sorted(specs, key=lambda spec: spec.lifetime[0])
+        objs, picked = _plan_shared_objects(sorted_specs, like_greedy=False)
+        if all(a.lifetime[0] <= b.lifetime[0] for a, b in zip(specs, specs[1:])):
+            greedy_objs, greedy_picked = _plan_shared_objects(specs, like_greedy=True)
+        else:
+            # The pool can only replay greedy on tensors in order of lifetime
+            # start.
+            greedy_objs = []
+            greedy_picked = [pick_shared_obj(greedy_objs, spec) for spec in specs]
+        if sum(sobj.size for sobj in greedy_objs) < sum(sobj.size for sobj in objs):
+            shared_objects[mem_id] = greedy_objs
+            spec2obj.update(zip(specs, greedy_picked))
+        else:
+            shared_objects[mem_id] = objs
+            spec2obj.update(zip(sorted_specs, picked))
+
+    total_sizes = _materialize_shared_objects(graph_module, shared_objects, spec2obj)
+
+    logging.debug(f"greedy_heap algorithm returns bufsizes: {total_sizes}")
+    return total_sizes
+
+
+def get_max_live_bytes(specs: Iterable[TensorSpec]) -> Dict[int, int]:
+    r"""
+    Return, for each mem_id, the largest total allocated_memory of the tensors
+    that are alive at the same node. No plan can fit those tensors in a
+    smaller buffer, so this is a lower bound on the buffer size.
+    """
+    # (node index, change in live bytes) for each mem_id. A tensor stops being
+    # live right after the last node in its lifetime.
+    events: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for spec in specs:
+        size = spec.allocated_memory
+        events[spec.mem_id].append((spec.lifetime[0], size))
+        events[spec.mem_id].append((spec.lifetime[1] + 1, -size))
+
+    max_live_bytes = {}
+    for mem_id, mem_events in events.items():
+        # Frees sort before allocations at the same node.
+        mem_events.sort()
+        live = peak = 0
+        for _, delta in mem_events:
+            live += delta
+            peak = max(peak, live)
+        max_live_bytes[mem_id] = peak
+    return max_live_bytes
+
+
+# Placed tensors are bucketed by blocks of this many nodes that their lifetimes
+# touch, so that finding the tensors alive at the same time as a new one does
+# not scan every placed tensor.
+_LIFETIME_BLOCK_SIZE = 64
+
+
+def _pick_best_fit_offset(
+    overlapping: List[Tuple[int, int]], size: int, base_offset: int
+) -> int:
+    r"""
+    Return the lowest offset of the smallest gap, at or after base_offset,
+    that can hold `size` bytes between the (offset, size) ranges in
+    `overlapping`, which must be sorted by offset. Return the end of the last
+    range if no gap is large enough.
+    """
+    best_offset = None
+    best_gap = 0
+    prev_end = base_offset
+    for offset, placed_size in overlapping:
+        gap = offset - prev_end
+        if gap >= size and (best_offset is None or gap < best_gap):
+            best_offset, best_gap = prev_end, gap
+        prev_end = max(prev_end, offset + placed_size)
+    return prev_end if best_offset is None else best_offset
+
+
+@register_algo
+def greedy_by_size(
+    graph_module: torch.fx.GraphModule,
+    alignment: int,
+    alloc_graph_input: bool = True,
+    alloc_graph_output: bool = True,
+) -> List[int]:
+    r"""
+    Place tensors at arbitrary offsets rather than in whole shared objects, so
+    that a small tensor can use a gap inside storage freed by larger ones.
+
+    Treats each buffer as a lifetime x offset packing problem: tensors are
+    placed from largest to smallest, each into the smallest gap between the
+    already placed tensors whose lifetimes overlap its own (best fit), or past
+    all of them if no gap is large enough.
+    """
+    do_assertion = not getattr(graph_module, "encounter_to_out_var_failure", False)
+    specs = list(
+        collect_specs_from_nodes(
+            graph_module.graph.nodes,
+            do_assertion=do_assertion,
+            ignore_graph_input=not alloc_graph_input,
+            ignore_graph_output=not alloc_graph_output,
+        )
+    )
+    specs_by_mem_id: Dict[int, List[TensorSpec]] = defaultdict(list)
+    for spec in specs:
+        if spec.mem_id is None:
+            spec.mem_id = 1
+        spec.realign(alignment)
+        specs_by_mem_id[spec.mem_id].append(spec)
+
+    input_bufsizes = getattr(graph_module, "input_mem_buffer_sizes", None) or []
+    num_buffers = max([2, len(input_bufsizes)] + [m + 1 for m in specs_by_mem_id])
+    total_sizes = list(input_bufsizes) + [0] * (num_buffers - len(input_bufsizes))
+    for mem_id, mem_specs in specs_by_mem_id.items():
+        base_offset = total_sizes[mem_id]
+        # (offset, size, lifetime start, lifetime end) of the placed tensors.
+        blocks: Dict[int, List[Tuple[int, int, int, int]]] = defaultdict(list)
+        for spec in sorted(
+            mem_specs, key=lambda spec: (-spec.allocated_memory, spec.lifetime[0])
+        ):
+            size = spec.allocated_memory
+            start, end = spec.lifetime
+            block_range = range(
+                start // _LIFETIME_BLOCK_SIZE, end // _LIFETIME_BLOCK_SIZE + 1
+            )
+            overlapping = sorted(
+                {
+                    (offset, placed_size)
+                    for block in block_range
+                    for offset, placed_size, placed_start, placed_end in blocks.get(
+                        block, ()
+                    )
+                    if placed_start <= end and start <= placed_end
+                }
+            )
+            spec.mem_offset = _pick_best_fit_offset(overlapping, size, base_offset)
+            for block in block_range:
+                blocks[block].append((spec.mem_offset, size, start, end))
+            total_sizes[mem_id] = max(total_sizes[mem_id], spec.mem_offset + size)
+
+    # Computing the lower bound takes another sweep over the specs.
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for mem_id, lower_bound in get_max_live_bytes(specs).items():
+            arena_size = total_sizes[mem_id] - (
+                input_bufsizes[mem_id] if mem_id < len(input_bufsizes) else 0
+            )
+            logging.debug(
+                f"greedy_by_size: mem_id {mem_id} uses {arena_size} bytes; "
+                + f"the lower bound (max live bytes) is {lower_bound} bytes"
+            )
+    logging.debug(f"greedy_by_size algorithm returns bufsizes: {total_sizes}")
     return total_sizes
 
 
@@ -555,6 +1059,185 @@ def get_algo(algo_name: str) -> Callable[..., List[int]]:
     return REGISTERED_ALGOS[algo_name]
 
 
+@dataclass
+class MemoryArena:
+    r"""
+    A memory buffer that tensors can be planned into, like a small fast SRAM
+    or a large DRAM. Its planned size is non_const_buffer_sizes[mem_id].
+    """
+
+    mem_id: int
+    # The largest size in bytes that the buffer may be planned to, or None if
+    # it is unbounded.
+    capacity: Optional[int] = None
+
+
+def _get_tensor_accesses(
+    graph_module: torch.fx.GraphModule,
+) -> Tuple[Dict[TensorSpec, List[int]], Dict[TensorSpec, int]]:
+    r"""
+    Return the lifetime of each tensor in graph_module, like
+    update_all_tensors_lifetime() computes it but without updating the specs,
+    and the number of nodes that refer to it.
+    """
+    lifetimes: Dict[TensorSpec, List[int]] = {}
+    num_accesses: Dict[TensorSpec, int] = defaultdict(int)
+    for node_idx, node in enumerate(graph_module.graph.nodes):
+        for spec in collect_specs_from_nodes(
+            filter_nodes(itertools.chain([node], node.args, node.kwargs.values())),
+            ignore_const=False,
+            ignore_out_var_node=False,
+            do_assertion=False,
+            ignore_dynamic_unbound_tensor=False,
+        ):
+            if spec in lifetimes:
+                lifetimes[spec][1] = node_idx
+            else:
+                lifetimes[spec] = [node_idx, node_idx]
+            num_accesses[spec] += 1
+    return lifetimes, num_accesses
+
+
+def _smallest_first(spec: TensorSpec, num_accesses: int) -> Tuple[float, ...]:
+    return (spec.allocated_memory,)
+
+
+def _hottest_first(spec: TensorSpec, num_accesses: int) -> Tuple[float, ...]:
+    return (-num_accesses / max(spec.allocated_memory, 1), spec.allocated_memory)
+
+
+# Maps each placement policy to the sort key of the order in which tensors are
+# offered the arenas, given the tensor and the number of nodes that refer to it.
+PLACEMENT_POLICIES: Dict[str, Callable[[TensorSpec, int], Tuple[float, ...]]] = {
+    # Fit as many tensors as possible into the first arenas.
+    "smallest_first": _smallest_first,
+    # Prefer tensors that are read or written the most per byte.
+    "hottest_first": _hottest_first,
+}
+
+
+def assign_mem_ids(
+    graph_module: torch.fx.GraphModule,
+    arenas: List[MemoryArena],
+    alignment: int,
+    placement_policy: str = "smallest_first",
+    alloc_graph_input: bool = True,
+    alloc_graph_output: bool = True,
+) -> None:
+    r"""
+    Set the mem_id of each tensor that will be planned in graph_module and its
+    submodules, before a memory planning algorithm gives it an offset.
+
+    Tensors whose node has a `node.meta["mem_id"]` hint go into that buffer.
+    The others are offered the arenas in order, in the order given by
+    placement_policy, and go into the first one in which the bytes alive at
+    every node of their lifetime still fit the capacity, or into the last one
+    if none has room left. Tensors that already have a mem_id keep it.
+
+    The live bytes are a lower bound on the planned size, so an algorithm may
+    still exceed a capacity because of fragmentation, or because submodules
+    are planned above the storage of their parent graph. Use
+    check_arena_capacities() on the planned bufsizes to detect that.
+    """
+    if placement_policy not in PLACEMENT_POLICIES:
+        raise ExportError(
+            ExportErrorType.NOT_SUPPORTED,
+            f"Memory placement policy '{placement_policy}' not found",
+        )
+    if not arenas:
+        raise ExportError(
+            ExportErrorType.INVALID_INPUT_TYPE, "At least one memory arena is needed"
+        )
+    sort_key = PLACEMENT_POLICIES[placement_policy]
+
+    for submodule in graph_module.modules():
+        if not isinstance(submodule, torch.fx.GraphModule):
+            continue
+        # Submodules are planned without their inputs, see apply_algo().
+        is_root = submodule is graph_module
+        specs = list(
+            collect_specs_from_nodes(
+                submodule.graph.nodes,
+                do_assertion=False,
+                ignore_graph_input=(not alloc_graph_input) if is_root else True,
+                ignore_graph_output=is_root and not alloc_graph_output,
+            )
+        )
+        _assign_graph_mem_ids(submodule, specs, arenas, alignment, sort_key)
+
+
+def _add_live_bytes(
+    live_bytes: Dict[int, List[int]],
+    lifetimes: Dict[TensorSpec, List[int]],
+    spec: TensorSpec,
+) -> None:
+    r"""
+    Add the storage of spec to the bytes alive in its buffer at each node of
+    its lifetime.
+    """
+    start, end = lifetimes[spec]
+    live = live_bytes[spec.mem_id]
+    for node_idx in range(start, end + 1):
+        live[node_idx] += spec.allocated_memory
+
+
+def _assign_graph_mem_ids(
+    graph_module: torch.fx.GraphModule,
+    specs: List[TensorSpec],
+    arenas: List[MemoryArena],
+    alignment: int,
+    sort_key: Callable[[TensorSpec, int], Tuple[float, ...]],
+) -> None:
+    r"""
+    Set the mem_id of the specs of a single graph that don't have one yet,
+    counting the ones that already do against the capacities of their arenas.
+    See assign_mem_ids().
+    """
+    for node in graph_module.graph.nodes:
+        if (mem_id := node.meta.get("mem_id")) is not None:
+            for spec in get_node_tensor_specs(node):
+                if spec is not None and spec.mem_id is None:
+                    spec.mem_id = mem_id
+
+    lifetimes, num_accesses = _get_tensor_accesses(graph_module)
+    num_nodes = len(graph_module.graph.nodes)
+    # Bytes alive at each node in each buffer, counting tensors that are
+    # assigned to it in this graph so far.
+    live_bytes: Dict[int, List[int]] = defaultdict(lambda: [0] * num_nodes)
+    for spec in specs:
+        spec.realign(alignment)
+        if spec.mem_id is not None:
+            _add_live_bytes(live_bytes, lifetimes, spec)
+    for spec in sorted(
+        (spec for spec in specs if spec.mem_id is None),
+        key=lambda spec: sort_key(spec, num_accesses[spec]),
+    ):
+        start, end = lifetimes[spec]
+        spec.mem_id = arenas[-1].mem_id
+        for arena in arenas:
+            if arena.capacity is None or (
+                max(live_bytes[arena.mem_id][start : end + 1]) + spec.allocated_memory
+                <= arena.capacity
+            ):
+                spec.mem_id = arena.mem_id
+                break
+        _add_live_bytes(live_bytes, lifetimes, spec)
+
+
+def check_arena_capacities(bufsizes: List[int], arenas: List[MemoryArena]) -> None:
+    r"""
+    Raise an ExportError if a planned buffer is larger than its arena.
+    """
+    for arena in arenas:
+        size = bufsizes[arena.mem_id] if arena.mem_id < len(bufsizes) else 0
+        if arena.capacity is not None and size > arena.capacity:
+            raise ExportError(
+                ExportErrorType.VIOLATION_OF_SPEC,
+                f"Memory planning needs {size} bytes in mem_id {arena.mem_id}, "
+                + f"which has a capacity of {arena.capacity} bytes",
+            )
+
+
 def get_cond_nodes(graph_module: torch.fx.GraphModule) -> Iterable[Node]:
     for nd in graph_module.graph.nodes:
         if nd.target is torch.ops.higher_order.cond:
@@ -634,6 +1317,56 @@ def insert_calls_to_free(
     graph_module.recompile()
 
 
+def _max_bufsizes(lhs: List[int], rhs: List[int]) -> List[int]:
+    r"""
+    Return the elementwise maximum of two lists of buffer sizes.
+    """
+    return [max(sizes) for sizes in itertools.zip_longest(lhs, rhs, fillvalue=0)]
+
+
+def get_live_bufsizes(
+    specs: Iterable[TensorSpec],
+    node_idx: int,
+    input_bufsizes: List[int],
+    end_idx: Optional[int] = None,
+) -> List[int]:
+    r"""
+    Return, for each mem_id, the end of the highest planned storage among the
+    tensors alive at any node from node_idx to end_idx (only node_idx by
+    default), and at least input_bufsizes. Storage above that is free over
+    those nodes, even if it is used before or after.
+    """
+    end_idx = node_idx if end_idx is None else end_idx
+    live_bufsizes = list(input_bufsizes)
+    for spec in specs:
+        if spec.mem_id is None or spec.mem_offset is None:
+            continue
+        if not (spec.lifetime[0] <= end_idx and node_idx <= spec.lifetime[1]):
+            continue
+        if spec.mem_id >= len(live_bufsizes):
+            live_bufsizes.extend([0] * (spec.mem_id - len(live_bufsizes) + 1))
+        live_bufsizes[spec.mem_id] = max(
+            live_bufsizes[spec.mem_id], spec.mem_offset + spec.allocated_memory
+        )
+    return live_bufsizes
+
+
+def _get_last_use_of_outputs(node: torch.fx.Node, node_idx: int) -> int:
+    r"""
+    Return the index of the last node that uses an output of node, or node_idx
+    if none does. getitem nodes share the TensorSpecs of node, so their users
+    are included.
+    """
+    return max(
+        (
+            spec.lifetime[1]
+            for spec in tree_flatten(node.meta.get("spec"))[0]
+            if isinstance(spec, TensorSpec) and spec.lifetime[1] is not None
+        ),
+        default=node_idx,
+    )
+
+
 def apply_algo(
     algo: Callable[[torch.fx.GraphModule, int, bool, bool], List[int]],
     graph_module: torch.fx.GraphModule,
@@ -644,44 +1377,111 @@ def apply_algo(
     """
     Recursively apply algo to graph_module and its submodules for control flow.
 
-    Quite naively right now since it does not take the following optimizations
-    into considerating:
-    1. for conditional structure, true branch and false true does not overlap
-       in lifetime and can share tensor storage
-    2. tensors inside a submodule (e.g. true branch) has opportunities to share
-       storage with tensors in the outer module.
-    TODO: make these optimizations once we have some baseline working.
+    The outputs of the submodules of a control flow node are moved into the
+    node's results at runtime rather than copied, so their storage is in use
+    from the node until the last use of its results. Each submodule is planned
+    on top of only the storage of the tensors, in this graph or in enclosing
+    ones, and of the submodules of other control flow nodes, that are alive
+    over that range, so it reuses storage of tensors that are dead by then or
+    not yet created:
+    1. the true and false branches of a cond never run together, so both are
+       planned from the same base and share storage.
+    2. the cond_fn and body_fn of a while loop, and the body of a map, reuse
+       storage of outer tensors that are not alive at the loop. cond_fn and
+       body_fn alternate and pass values to each other, so body_fn is still
+       planned above cond_fn.
     """
+    input_bufsizes = list(getattr(graph_module, "input_mem_buffer_sizes", None) or [])
     specs = update_all_tensors_lifetime(graph_module)
     bufsizes: List[int] = algo(
         graph_module, alignment, alloc_graph_input, alloc_graph_output
     )
+
+    # Find what is in use from each control flow node to the last use of its
+    # results before planning any submodule, which may update specs that it
+    # shares with this graph. The lifetimes refer to the node indices before
+    # insert_calls_to_free() adds nodes to the graph.
+    # (node, first node index, last node index, base bufsizes)
+    control_flow_nodes: List[Tuple[torch.fx.Node, int, int, List[int]]] = []
+    for node_idx, node in enumerate(graph_module.graph.nodes):
+        if node.target in (torch.ops.higher_order.cond, exir_while, map_impl):
+            end_idx = _get_last_use_of_outputs(node, node_idx)
+            control_flow_nodes.append(
+                (
+                    node,
+                    node_idx,
+                    end_idx,
+                    get_live_bufsizes(specs, node_idx, input_bufsizes, end_idx),
+                )
+            )
     insert_calls_to_free(graph_module, specs)
 
-    def handle_submodule(submodule_nd: torch.fx.Node) -> None:
-        nonlocal bufsizes
+    # What planning each submodule above all of the previous ones would need,
+    # to report how much sharing storage saves.
+    stacked_bufsizes = list(bufsizes)
+
+    def handle_submodule(
+        submodule_nd: torch.fx.Node, base_bufsizes: List[int]
+    ) -> List[int]:
+        nonlocal bufsizes, stacked_bufsizes
         assert submodule_nd.op == "get_attr"
         submodule = getattr(graph_module, submodule_nd.target)
         # memory planning for submodule need to be aware of the amount of
-        # buffer already allocated.
-        submodule.input_mem_buffer_sizes = bufsizes
-        bufsizes = apply_algo(
+        # buffer already in use.
+        submodule.input_mem_buffer_sizes = list(base_bufsizes)
+        submodule_bufsizes = apply_algo(
             algo, submodule, alignment, alloc_graph_input=False, alloc_graph_output=True
         )
-        submodule.meta.update({"non_const_buffer_sizes": bufsizes})
-
-    for cond_node in get_cond_nodes(graph_module):
-        handle_submodule(typing.cast(torch.fx.Node, cond_node.args[1]))
-        handle_submodule(typing.cast(torch.fx.Node, cond_node.args[2]))
-
-    for while_node in get_while_nodes(graph_module):
-        handle_submodule(typing.cast(torch.fx.Node, while_node.args[0]))
-        handle_submodule(typing.cast(torch.fx.Node, while_node.args[1]))
-    # TODO: Add test coverage for map operator once dynamo tracing is
-    # fully supported for this. T142287208
-    for map_node in get_map_nodes(graph_module):
-        handle_submodule(typing.cast(torch.fx.Node, map_node.args[0]))
+        submodule.meta.update({"non_const_buffer_sizes": submodule_bufsizes})
+        bufsizes = _max_bufsizes(bufsizes, submodule_bufsizes)
+        stacked_bufsizes = [
+            size + max(0, sub_size - base_size)
+            for size, sub_size, base_size in itertools.zip_longest(
+                stacked_bufsizes, submodule_bufsizes, base_bufsizes, fillvalue=0
+            )
+        ]
+        return submodule_bufsizes
+
+    # (first node index, last node index, bufsizes) of the submodules planned
+    # so far, whose storage is in use over those nodes.
+    planned: List[Tuple[int, int, List[int]]] = []
+    for node, start, end, base_bufsizes in control_flow_nodes:
+        for other_start, other_end, other_bufsizes in planned:
+            if other_start <= end and start <= other_end:
+                base_bufsizes = _max_bufsizes(base_bufsizes, other_bufsizes)
+        if node.target is torch.ops.higher_order.cond:
+            submodule_bufsizes = base_bufsizes
+            for branch in node.args[1:3]:
+                submodule_bufsizes = _max_bufsizes(
+                    submodule_bufsizes,
+                    handle_submodule(typing.cast(torch.fx.Node, branch), base_bufsizes),
+                )
+        elif node.target is exir_while:
+            cond_fn_bufsizes = handle_submodule(
+                typing.cast(torch.fx.Node, node.args[0]), base_bufsizes
+            )
+            submodule_bufsizes = handle_submodule(
+                typing.cast(torch.fx.Node, node.args[1]),
+                _max_bufsizes(base_bufsizes, cond_fn_bufsizes),
+            )
+        else:
+            # TODO: Add test coverage for map operator once dynamo tracing is
+            # fully supported for this. T142287208
+            submodule_bufsizes = handle_submodule(
+                typing.cast(torch.fx.Node, node.args[0]), base_bufsizes
+            )
+        planned.append((start, end, submodule_bufsizes))
 
+    if any(
+        stacked > size
+        for stacked, size in itertools.zip_longest(
+            stacked_bufsizes, bufsizes, fillvalue=0
+        )
+    ):
+        logging.debug(
+            "Sharing storage with control flow submodules reduced bufsizes "
+            + f"from {stacked_bufsizes} to {bufsizes}"
+        )
     graph_module.meta.update({"non_const_buffer_sizes": bufsizes})
 
     return bufsizes
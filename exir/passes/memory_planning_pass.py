@@ -6,15 +6,23 @@
 
 import logging
 import warnings
+from typing import List, Optional
 
 import torch
 from executorch.exir.error import internal_assert
 from executorch.exir.memory import alloc
+from executorch.exir.memory_plan_report import (
+    build_memory_plan_report,
+    MemoryPlanReport,
+)
 from executorch.exir.memory_planning import (
     _is_out_var_node,
     apply_algo,
+    assign_mem_ids,
+    check_arena_capacities,
     get_algo,
     get_node_tensor_specs,
+    MemoryArena,
     Verifier,
 )
 from executorch.exir.operator.convert import get_out_args_from_opoverload
@@ -30,18 +38,35 @@ class MemoryPlanningPass(PassBase):
         alloc_graph_input: bool = True,
         alloc_graph_output: bool = True,
         alignment: int = ALIGNMENT,
+        mem_arenas: Optional[List[MemoryArena]] = None,
+        placement_policy: str = "smallest_first",
+        generate_report: bool = False,
     ) -> None:
         r"""
         alloc_graph_input/alloc_graph_output will have 4 different combinations
         to control if the memory planning algorithm need allocate memory for
         the graph input/output. The default behavior is the algorithm will allocate
         memory for both graph input and output.
+
+        mem_arenas lists the memory buffers to plan tensors into, fastest
+        first. If it is set, tensors are spread across them by
+        placement_policy (see PLACEMENT_POLICIES) and `node.meta["mem_id"]`
+        hints before planning, and planning fails if a buffer ends up larger
+        than its capacity. Otherwise all tensors are planned into mem_id 1.
+
+        If generate_report is set, a MemoryPlanReport of each planned graph is
+        stored in its meta["memory_plan_report"], and the last one in
+        self.report.
         """
         self.memory_planning_algo = memory_planning_algo
         self.allow_lifetime_and_storage_overlap = allow_lifetime_and_storage_overlap
         self.alloc_graph_input = alloc_graph_input
         self.alloc_graph_output = alloc_graph_output
         self.alignment = alignment
+        self.mem_arenas = mem_arenas
+        self.placement_policy = placement_policy
+        self.generate_report = generate_report
+        self.report: Optional[MemoryPlanReport] = None
 
     def _set_alloc_node_spec(self, graph_module: torch.fx.GraphModule) -> None:
         """
@@ -88,19 +113,30 @@ class MemoryPlanningPass(PassBase):
         """
         self._set_alloc_node_spec(graph_module)
         algo = get_algo(self.memory_planning_algo)
+        if self.mem_arenas is not None:
+            assign_mem_ids(
+                graph_module,
+                self.mem_arenas,
+                self.alignment,
+                self.placement_policy,
+                self.alloc_graph_input,
+                self.alloc_graph_output,
+            )
 
         # TODO(shunting) if people have concern of adding a field to GraphModule
         # directly, we should define a GraphModule subclass that we can add our
         # customized fields. Using the graph_module object to convey information across
         # passes/stages is quite natural and avoid yet another 'context' data structure
         # to do the job.
-        _ = apply_algo(
+        bufsizes = apply_algo(
             algo,
             graph_module,
             self.alignment,
             self.alloc_graph_input,
             self.alloc_graph_output,
         )
+        if self.mem_arenas is not None:
+            check_arena_capacities(bufsizes, self.mem_arenas)
 
         # TODO: make the verifier do the work recursively to handle
         # control flow
@@ -114,4 +150,16 @@ class MemoryPlanningPass(PassBase):
             f"The {self.memory_planning_algo} algorithm reuses storage for {num_reuse_pairs} pair of tensors"
         )
         verifier.verify_graph_input_output()
+
+        if self.generate_report:
+            self.report = build_memory_plan_report(
+                graph_module, self.alloc_graph_input, self.alloc_graph_output
+            )
+            graph_module.meta["memory_plan_report"] = self.report
+            for buffer in self.report.buffers.values():
+                logging.info(
+                    f"mem_id {buffer.mem_id}: {buffer.arena_size} bytes planned, "
+                    + f"lower bound {buffer.lower_bound} bytes, "
+                    + f"{buffer.fragmentation_percent:.1f}% fragmentation"
+                )
         return PassResult(graph_module, True)
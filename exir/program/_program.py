@@ -6,15 +6,32 @@
 
 import copy
 import logging
-from typing import Any, Dict, List, Optional, Sequence, Set, Type, Union
+import os
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    Union,
+)
 
 import torch
 import torch._export
-from executorch.exir._serialize import _serialize_pte_binary
+from executorch.exir._serialize import (
+    _delegate_segment_report,
+    _SegmentExtractionReport,
+    _serialize_pte_binary,
+    _write_pte_binary,
+)
 from executorch.exir.backend.backend_api import to_backend
 from executorch.exir.backend.partitioner import TPartitioner
 from executorch.exir.capture._config import EdgeCompileConfig, ExecutorchBackendConfig
-from executorch.exir.emit import emit_program, EmitterOutput
+from executorch.exir.emit import emit_program, EmitterOutput, MethodConstantsReport
 from executorch.exir.emit._emitter import _DelegateDebugIdentifierMap
 from executorch.exir.error import ExportError
 from executorch.exir.pass_manager import PassType
@@ -26,7 +43,7 @@ from executorch.exir.passes import (
 from executorch.exir.passes.remove_assert_async_pass import RemoveAssertAsyncPass
 from executorch.exir.passes.spec_prop_pass import SpecPropPass
 from executorch.exir.print_program import pretty_print, print_program
-from executorch.exir.schema import Program
+from executorch.exir.schema import BackendDelegate, Program
 from executorch.exir.tracer import _default_decomposition_table
 from executorch.exir.verification.verifier import (
     EXIRATenDialectVerifier,
@@ -183,9 +200,12 @@ class ExirExportedProgram:
             new_prog,
             emit_stacktrace=config.emit_stacktrace,
             extract_segments=config.extract_segments,
+            extract_constant_segment=config.extract_constant_segment,
             segment_alignment=config.segment_alignment,
             constant_tensor_alignment=config.constant_tensor_alignment,
             delegate_alignment=config.delegate_alignment,
+            delegate_segment_min_size=config.delegate_segment_min_size,
+            delegate_segment_predicate=config.delegate_segment_predicate,
         )
         executorch_prog.graph_module.meta.update(
             new_prog.exported_program.graph_module.meta
@@ -216,6 +236,9 @@ class ExecutorchProgram:
         segment_alignment: int,
         constant_tensor_alignment: Optional[int] = None,
         delegate_alignment: Optional[int] = None,
+        extract_constant_segment: bool = False,
+        delegate_segment_min_size: int = 0,
+        delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]] = None,
     ) -> None:
         if not exir_exported_program.after_to_edge_passes:
             raise RuntimeError(
@@ -226,9 +249,14 @@ class ExecutorchProgram:
         self._emitter_output: Optional[EmitterOutput] = None
         self._emit_stacktrace: bool = emit_stacktrace
         self._extract_segments: bool = extract_segments
+        self._extract_constant_segment: bool = extract_constant_segment
         self._segment_alignment: int = segment_alignment
         self._constant_tensor_alignment: Optional[int] = constant_tensor_alignment
         self._delegate_alignment: Optional[int] = delegate_alignment
+        self._delegate_segment_min_size: int = delegate_segment_min_size
+        self._delegate_segment_predicate: Optional[
+            Callable[[BackendDelegate], bool]
+        ] = delegate_segment_predicate
 
     @property
     def buffer(self) -> bytes:
@@ -236,9 +264,12 @@ class ExecutorchProgram:
             self._buffer = _serialize_pte_binary(
                 program=self.program,
                 extract_segments=self._extract_segments,
+                extract_constant_segment=self._extract_constant_segment,
                 segment_alignment=self._segment_alignment,
                 constant_tensor_alignment=self._constant_tensor_alignment,
                 delegate_alignment=self._delegate_alignment,
+                delegate_segment_min_size=self._delegate_segment_min_size,
+                delegate_segment_predicate=self._delegate_segment_predicate,
             )
         return self._buffer
 
@@ -489,6 +520,9 @@ class MultiMethodExecutorchProgram:
         constant_tensor_alignment: Optional[int] = None,
         delegate_alignment: Optional[int] = None,
         prim_getters: Optional[Dict[str, Any]] = None,
+        extract_constant_segment: bool = False,
+        delegate_segment_min_size: int = 0,
+        delegate_segment_predicate: Optional[Callable[[BackendDelegate], bool]] = None,
     ) -> None:
         self._buffer: Optional[bytes] = None
         temp: Dict[str, ExportedProgram] = {}
@@ -501,9 +535,14 @@ class MultiMethodExecutorchProgram:
         )
         self._executorch_dialect_ir_program = executorch_dialect_program
         self._extract_segments: bool = extract_segments
+        self._extract_constant_segment: bool = extract_constant_segment
         self._segment_alignment: int = segment_alignment
         self._constant_tensor_alignment: Optional[int] = constant_tensor_alignment
         self._delegate_alignment: Optional[int] = delegate_alignment
+        self._delegate_segment_min_size: int = delegate_segment_min_size
+        self._delegate_segment_predicate: Optional[
+            Callable[[BackendDelegate], bool]
+        ] = delegate_segment_predicate
         self._prim_getter_cache = prim_getters
 
     @property
@@ -512,9 +551,12 @@ class MultiMethodExecutorchProgram:
             self._buffer = _serialize_pte_binary(
                 program=self._emitter_output.program,
                 extract_segments=self._extract_segments,
+                extract_constant_segment=self._extract_constant_segment,
                 segment_alignment=self._segment_alignment,
                 constant_tensor_alignment=self._constant_tensor_alignment,
                 delegate_alignment=self._delegate_alignment,
+                delegate_segment_min_size=self._delegate_segment_min_size,
+                delegate_segment_predicate=self._delegate_segment_predicate,
             )
         return self._buffer
 
@@ -553,9 +595,12 @@ def multi_method_program_to_executorch(
         executorch_dialect_program=edge_dialect_program.transform(*passes),
         emit_stacktrace=config.emit_stacktrace,
         extract_segments=config.extract_segments,
+        extract_constant_segment=config.extract_constant_segment,
         segment_alignment=config.segment_alignment,
         constant_tensor_alignment=config.constant_tensor_alignment,
         delegate_alignment=config.delegate_alignment,
+        delegate_segment_min_size=config.delegate_segment_min_size,
+        delegate_segment_predicate=config.delegate_segment_predicate,
         prim_getters=edge_dialect_program.prim_getters(),
     )
 
@@ -793,8 +838,9 @@ class ExecutorchProgramManager:
     lowering to ExecuTorch.
 
     When the ExecutorchProgramManager is constructed the ExportedPrograms in execution dialect
-    are used to form the executorch binary (in a process called emission) and then serialized
-    to a buffer.
+    are used to form the executorch binary (in a process called emission). The binary is
+    serialized when it is written with :func:'write_to' or when :func:'buffer' is first
+    accessed.
 
     Manages the final link in the lowering chain of ATen -> Edge -> ExecuTorch.
     """
@@ -837,14 +883,9 @@ class ExecutorchProgramManager:
             self._config_methods,
         )
 
-        # Serialize emitter output to a buffer
-        self._buffer: bytes = _serialize_pte_binary(
-            program=self._emitter_output.program,
-            extract_segments=backend_config.extract_segments,
-            segment_alignment=backend_config.segment_alignment,
-            constant_tensor_alignment=backend_config.constant_tensor_alignment,
-            delegate_alignment=backend_config.delegate_alignment,
-        )
+        # Serialized lazily by the buffer property.
+        self._backend_config: ExecutorchBackendConfig = backend_config
+        self._buffer: Optional[bytes] = None
 
     @property
     def methods(self) -> Set[str]:
@@ -901,5 +942,78 @@ class ExecutorchProgramManager:
     def buffer(self) -> bytes:
         """
         Returns a buffer containing the serialized ExecuTorch binary.
+
+        The buffer is created on first access and cached. To save the binary to a file, prefer
+        :func:'write_to', which does not hold a copy of the whole binary in memory.
         """
+        if self._buffer is None:
+            self._buffer = _serialize_pte_binary(
+                program=self._emitter_output.program,
+                extract_segments=self._backend_config.extract_segments,
+                extract_constant_segment=self._backend_config.extract_constant_segment,
+                segment_alignment=self._backend_config.segment_alignment,
+                constant_tensor_alignment=self._backend_config.constant_tensor_alignment,
+                delegate_alignment=self._backend_config.delegate_alignment,
+                delegate_segment_min_size=self._backend_config.delegate_segment_min_size,
+                delegate_segment_predicate=self._backend_config.delegate_segment_predicate,
+            )
         return self._buffer
+
+    def delegate_segment_report(self) -> _SegmentExtractionReport:
+        """
+        Returns a report of which delegate data is moved into segments under the current
+        ExecutorchBackendConfig, and an estimate of how many bytes of segment padding are
+        saved by keeping the rest inline according to `delegate_segment_min_size` and
+        `delegate_segment_predicate`. If `extract_segments` is False, the report has all
+        delegate data inline.
+        """
+        return _delegate_segment_report(
+            self._emitter_output.program,
+            segment_alignment=self._backend_config.segment_alignment,
+            delegate_segment_min_size=self._backend_config.delegate_segment_min_size,
+            delegate_segment_predicate=self._backend_config.delegate_segment_predicate,
+            extract_segments=self._backend_config.extract_segments,
+        )
+
+    def constants_report(self) -> Dict[str, MethodConstantsReport]:
+        """
+        Returns, for each method, the bytes of constant tensors stored in the program for
+        it, and the bytes of those it shares with previously emitted methods: parameters
+        and buffers with the same fully qualified name and storage, and constants with
+        identical contents.
+        """
+        return self._emitter_output.method_to_constants_report
+
+    def write_to(self, path_or_file: Union[str, "os.PathLike[str]", BinaryIO]) -> int:
+        """
+        Writes the serialized ExecuTorch binary to a file.
+
+        The header, flatbuffer data and segments are written one after another, so the
+        complete binary is never assembled in memory.
+
+        Args:
+            path_or_file: The path of the .pte file to create or overwrite, or a binary
+                file-like object to write to.
+
+        Returns:
+            The number of bytes written.
+        """
+        if self._buffer is not None:
+            # Already serialized; don't do it again.
+            if isinstance(path_or_file, (str, os.PathLike)):
+                with open(path_or_file, "wb") as fp:
+                    fp.write(self._buffer)
+            else:
+                path_or_file.write(self._buffer)
+            return len(self._buffer)
+        return _write_pte_binary(
+            self._emitter_output.program,
+            path_or_file,
+            extract_segments=self._backend_config.extract_segments,
+            extract_constant_segment=self._backend_config.extract_constant_segment,
+            segment_alignment=self._backend_config.segment_alignment,
+            constant_tensor_alignment=self._backend_config.constant_tensor_alignment,
+            delegate_alignment=self._backend_config.delegate_alignment,
+            delegate_segment_min_size=self._backend_config.delegate_segment_min_size,
+            delegate_segment_predicate=self._backend_config.delegate_segment_predicate,
+        )
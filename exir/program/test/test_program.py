@@ -6,6 +6,9 @@
 
 # pye-strict
 
+import io
+import os
+import tempfile
 import unittest
 from typing import Any, Dict
 
@@ -124,6 +127,68 @@ class TestProgramManagers(unittest.TestCase):
             3,
         )
 
+    def test_executorch_manager_write_to(self):
+        executorch_manager: ExecutorchProgramManager = (
+            to_edge(get_exported_programs(), get_config_methods())
+            .to_backend(AddMulPartitionerDemo)
+            .to_executorch(ExecutorchBackendConfig(extract_segments=True))
+        )
+
+        # Streamed before the buffer is created
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "program.pte")
+            num_bytes = executorch_manager.write_to(path)
+            with open(path, "rb") as f:
+                data = f.read()
+        self.assertIsNone(executorch_manager._buffer)
+        self.assertEqual(num_bytes, len(data))
+        self.assertEqual(data, executorch_manager.buffer)
+
+        # Written from the cached buffer
+        f = io.BytesIO()
+        num_bytes = executorch_manager.write_to(f)
+        self.assertEqual(f.getvalue(), executorch_manager.buffer)
+        self.assertEqual(num_bytes, len(executorch_manager.buffer))
+
+    def test_executorch_manager_shares_weights_between_methods(self):
+        class Weights(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.weight = torch.nn.Parameter(torch.randn(4, 4))
+                self.bias = torch.nn.Parameter(torch.randn(4))
+
+            def forward(self, x):
+                return torch.mm(x, self.weight) + self.bias
+
+        class Method(torch.nn.Module):
+            def __init__(self, weights, activation):
+                super().__init__()
+                self.weights = weights
+                self.activation = activation
+
+            def forward(self, x):
+                return self.activation(self.weights(x))
+
+        weights = Weights()
+        inputs = (torch.randn(2, 4),)
+        executorch_manager = to_edge(
+            {
+                "decode": export(Method(weights, torch.relu), inputs),
+                "prefill": export(Method(weights, torch.sigmoid), inputs),
+            }
+        ).to_executorch()
+
+        # The methods are emitted in order of their names, and the second one
+        # reuses the buffers of the parameters it shares with the first one.
+        weight_bytes = (4 * 4 + 4) * 4
+        report = executorch_manager.constants_report()
+        self.assertEqual(report["decode"].stored_bytes, weight_bytes)
+        self.assertEqual(report["prefill"].stored_bytes, 0)
+        self.assertEqual(report["prefill"].shared_bytes, weight_bytes)
+        self.assertEqual(report["prefill"].deduplicated_bytes, 0)
+        # The reserved buffer, the weight and the bias
+        self.assertEqual(len(executorch_manager.executorch_program.constant_buffer), 3)
+
     def test_edge_manager_transform(self):
         edge_manager: EdgeProgramManager = to_edge(
             get_exported_programs(), get_config_methods()
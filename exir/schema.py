@@ -244,6 +244,12 @@ class DataSegment:
     size: int
 
 
+@dataclass
+class SubsegmentOffsets:
+    segment_index: int
+    offsets: List[int]
+
+
 @dataclass
 class Program:
     version: int
@@ -251,3 +257,5 @@ class Program:
     constant_buffer: List[Buffer]
     backend_delegate_data: List[BackendDelegateInlineData]
     segments: List[DataSegment]
+    # Set when constant data is stored in a segment instead of constant_buffer.
+    constant_segment: Optional[SubsegmentOffsets] = None
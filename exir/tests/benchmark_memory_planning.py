@@ -0,0 +1,153 @@
+#!/usr/bin/env fbpython
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Measures how memory planning algorithms scale with the number of tensors.
+
+Builds synthetic graphs of memory.alloc nodes whose tensors have random sizes
+and lifetimes, runs each algorithm on them, and prints the planning time and
+the resulting buffer size next to the lower bound: the largest number of bytes
+alive at any one node. Then times Verifier.verify_storage_reuse() on the plans
+against comparing every pair of tensors, which is only run up to
+--max-pairwise-tensors and otherwise extrapolated quadratically.
+
+Usage: benchmark_memory_planning.py [--num-tensors N [N ...]]
+    [--algos ALGO [ALGO ...]] [--max-lifetime N] [--seed N]
+    [--verify-algo ALGO] [--max-pairwise-tensors N]
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+import torch
+from executorch.exir import memory
+from executorch.exir.memory_planning import get_algo, get_max_live_bytes, Verifier
+from executorch.exir.tensor import TensorSpec
+
+
+def make_synthetic_graph(
+    num_tensors: int, max_lifetime: int, seed: int = 0
+) -> Tuple[torch.fx.GraphModule, List[TensorSpec], List[List[int]]]:
+    """Returns a graph with one memory.alloc node per tensor, its specs, and
+    their lifetimes.
+
+    Tensor `i` is allocated at node `i` and lives for up to `max_lifetime`
+    further nodes. Sizes span several orders of magnitude, like activations of
+    differently sized layers do.
+    """
+    rng = random.Random(seed)
+    graph = torch.fx.Graph()
+    specs: List[TensorSpec] = []
+    lifetimes: List[List[int]] = []
+    for i in range(num_tensors):
+        numel = rng.choice([16, 64, 256, 1024, 4096]) * rng.randint(1, 8)
+        node = graph.call_function(memory.alloc, (((numel,), torch.float32),))
+        spec = TensorSpec(torch.float32, torch.Size([numel]))
+        node.meta["spec"] = spec
+        specs.append(spec)
+        lifetimes.append([i, min(i + rng.randint(0, max_lifetime), num_tensors - 1)])
+    graph.output(None)
+    return torch.fx.GraphModule(torch.nn.Module(), graph), specs, lifetimes
+
+
+def reset_specs(specs: List[TensorSpec], lifetimes: List[List[int]]) -> None:
+    """Clears the results of a previous planning run."""
+    for spec, lifetime in zip(specs, lifetimes):
+        spec.init_mem_planning_fields()
+        spec.lifetime = list(lifetime)
+
+
+def benchmark_verifier(
+    graph_module: torch.fx.GraphModule,
+    specs: List[TensorSpec],
+    max_pairwise_tensors: int,
+    pairwise_reference: Optional[Tuple[int, float]],
+) -> Optional[Tuple[int, float]]:
+    """Prints the time taken to verify the plan in `graph_module` with the
+    sweep and the pairwise implementations.
+
+    Returns (number of tensors, seconds) of the largest pairwise run so far,
+    which is used to estimate the pairwise time of larger graphs.
+    """
+    num_tensors = len(specs)
+    start = time.perf_counter()
+    num_reuse_pairs = Verifier(graph_module, True, True).verify_storage_reuse()
+    sweep_time = time.perf_counter() - start
+
+    if num_tensors <= max_pairwise_tensors:
+        start = time.perf_counter()
+        pairwise_pairs = Verifier._verify_storage_reuse_pairwise(specs, False)
+        pairwise_time = time.perf_counter() - start
+        if pairwise_pairs != num_reuse_pairs:
+            raise AssertionError(
+                f"Sweep found {num_reuse_pairs} reuse pairs, pairwise {pairwise_pairs}"
+            )
+        pairwise = f"{pairwise_time:8.3f} s"
+        pairwise_reference = (num_tensors, pairwise_time)
+    elif pairwise_reference is not None:
+        ref_tensors, ref_time = pairwise_reference
+        estimate = ref_time * (num_tensors / ref_tensors) ** 2
+        pairwise = f"~{estimate:7.0f} s (estimated)"
+    else:
+        pairwise = "skipped"
+    print(
+        f"{num_tensors:>7} tensors, verify_storage_reuse: {sweep_time:8.3f} s, "
+        + f"pairwise: {pairwise}, {num_reuse_pairs} reuse pairs"
+    )
+    return pairwise_reference
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num-tensors", type=int, nargs="+", default=[10000, 50000, 100000]
+    )
+    parser.add_argument(
+        "--algos", nargs="+", default=["greedy", "greedy_heap", "greedy_by_size"]
+    )
+    parser.add_argument("--max-lifetime", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify-algo", default="greedy_by_size")
+    parser.add_argument("--max-pairwise-tensors", type=int, default=10000)
+    args = parser.parse_args()
+
+    pairwise_reference = None
+    for num_tensors in args.num_tensors:
+        graph_module, specs, lifetimes = make_synthetic_graph(
+            num_tensors, args.max_lifetime, args.seed
+        )
+        reset_specs(specs, lifetimes)
+        for spec in specs:
+            spec.mem_id = 1
+        lower_bound = get_max_live_bytes(specs)[1]
+        print(
+            f"{num_tensors:>7} tensors: max live bytes (lower bound) "
+            + f"{lower_bound / (1 << 20):8.2f} MiB"
+        )
+        for algo in args.algos:
+            reset_specs(specs, lifetimes)
+            start = time.perf_counter()
+            bufsizes = get_algo(algo)(graph_module, 16)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{num_tensors:>7} tensors, {algo:>14}: {elapsed:8.3f} s, "
+                + f"buffer size {bufsizes[1] / (1 << 20):8.2f} MiB "
+                + f"({bufsizes[1] / lower_bound:.3f}x lower bound)"
+            )
+
+        reset_specs(specs, lifetimes)
+        get_algo(args.verify_algo)(graph_module, 16)
+        pairwise_reference = benchmark_verifier(
+            graph_module, specs, args.max_pairwise_tensors, pairwise_reference
+        )
+
+
+if __name__ == "__main__":
+    main()
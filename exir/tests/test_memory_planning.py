@@ -6,9 +6,12 @@
 
 # pyre-strict
 
+import copy
 import itertools
+import json
+import random
 import unittest
-from typing import Callable, List, Optional, Tuple, Type
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
 
 import executorch.exir as exir
 import executorch.exir.schema as schema
@@ -18,8 +21,22 @@ import torch.utils._pytree as pytree
 from executorch.backends.fb.qnnpack.partition.qnnpack_partitioner import (
     QnnpackPartitioner,
 )
+from executorch.exir import memory
 from executorch.exir.backend.backend_api import to_backend, validation_disabled
-from executorch.exir.memory_planning import filter_nodes, Verifier
+from executorch.exir.error import ExportError, InternalError
+from executorch.exir.memory_plan_report import build_memory_plan_report
+from executorch.exir.memory_planning import (
+    apply_algo,
+    assign_mem_ids,
+    check_arena_capacities,
+    filter_nodes,
+    get_algo,
+    get_max_live_bytes,
+    get_node_tensor_specs,
+    get_return_specs,
+    MemoryArena,
+    Verifier,
+)
 from executorch.exir.pass_base import PassResult
 from executorch.exir.pass_manager import PassManager
 from executorch.exir.passes import (  # noqa
@@ -31,6 +48,7 @@ from executorch.exir.passes import (  # noqa
     ToOutVarPass,
 )
 from executorch.exir.print_program import print_program
+from executorch.exir.tensor import TensorSpec
 from executorch.exir.tests.asr_joiner import ASRJoiner
 from parameterized import parameterized
 
@@ -221,6 +239,8 @@ def maketest(
                 ("naive", False),
                 # greedy algorithm should reuse tensor storages in the testing model
                 ("greedy", True),
+                ("greedy_heap", True),
+                ("greedy_by_size", True),
             ]
 
         for algo, expect_reuse in criteria:
@@ -352,6 +372,8 @@ class TestMemoryPlanning(unittest.TestCase):
         criteria=[
             ("naive", False),
             ("greedy", True),
+            ("greedy_heap", True),
+            ("greedy_by_size", True),
         ],
     )
 
@@ -362,6 +384,8 @@ class TestMemoryPlanning(unittest.TestCase):
         criteria=[
             ("naive", False),
             ("greedy", True),
+            ("greedy_heap", True),
+            ("greedy_by_size", True),
         ],
         extra_check=ModuleListArg.extra_check,
     )
@@ -417,6 +441,315 @@ class TestMisc(unittest.TestCase):
         for act, exp in zip(actual_list, expected_list):
             self.assertEqual(id(act), id(exp))
 
+    def make_random_allocs(
+        self,
+        seed: int = 0,
+        num_tensors: int = 500,
+        num_nodes: Optional[int] = None,
+        sizes: Sequence[int] = (1, 4, 16, 64, 256),
+        max_lifetime: int = 20,
+    ) -> Tuple[GraphModule, List[TensorSpec], List[List[int]]]:
+        r"""
+        Return a graph of tensors of random sizes, each allocated by its own
+        node and living for a random number of nodes, with their specs and
+        lifetimes.
+
+        If num_nodes is given, the lifetimes start at random nodes out of
+        num_nodes, so several tensors can start at the same node. Otherwise
+        tensor `i` starts at node `i`.
+        """
+        rng = random.Random(seed)
+        graph = Graph()
+        specs = []
+        lifetimes = []
+        starts = (
+            sorted(rng.randrange(num_nodes) for _ in range(num_tensors))
+            if num_nodes is not None
+            else range(num_tensors)
+        )
+        last_node = (num_nodes or num_tensors) - 1
+        for start in starts:
+            numel = rng.choice(sizes) * rng.randint(1, 8)
+            node = graph.call_function(memory.alloc, (((numel,), torch.float32),))
+            node.meta["spec"] = TensorSpec(torch.float32, torch.Size([numel]))
+            specs.append(node.meta["spec"])
+            lifetimes.append(
+                [start, min(start + rng.randint(0, max_lifetime), last_node)]
+            )
+        graph.output(None)
+        return GraphModule(torch.nn.Module(), graph), specs, lifetimes
+
+    def plan_random_allocs(
+        self, algos: List[str], **kwargs: Any
+    ) -> Dict[str, List[int]]:
+        r"""
+        Plan the tensors from make_random_allocs(**kwargs) with each of
+        `algos`. Returns the buffer sizes from each algorithm, and the max live
+        bytes under the "lower_bound" key.
+        """
+        graph_module, specs, lifetimes = self.make_random_allocs(**kwargs)
+        bufsizes = {}
+        for algo in algos:
+            for spec, lifetime in zip(specs, lifetimes):
+                spec.init_mem_planning_fields()
+                spec.lifetime = list(lifetime)
+            bufsizes[algo] = get_algo(algo)(graph_module, 16)
+            # Throws if two tensors overlap in both lifetime and storage.
+            self.assertGreater(
+                Verifier(graph_module, True, True).verify_storage_reuse(), 0
+            )
+        bufsizes["lower_bound"] = [0, get_max_live_bytes(specs)[1]]
+        return bufsizes
+
+    def test_greedy_heap_not_larger_than_greedy(self) -> None:
+        for seed in range(200):
+            with self.subTest(seed=seed):
+                bufsizes = self.plan_random_allocs(
+                    ["greedy", "greedy_heap"],
+                    seed=seed,
+                    num_tensors=200,
+                    num_nodes=(20, 100)[seed % 2],
+                    sizes=((1, 4, 16, 64, 256), (16, 64, 256, 1024, 4096))[
+                        seed // 6 % 2
+                    ],
+                    max_lifetime=(2, 10, 50)[seed // 2 % 3],
+                )
+                self.assertLessEqual(bufsizes["greedy_heap"][1], bufsizes["greedy"][1])
+
+    def test_greedy_by_size_near_lower_bound(self) -> None:
+        bufsizes = self.plan_random_allocs(["greedy_heap", "greedy_by_size"])
+        lower_bound = bufsizes["lower_bound"][1]
+        self.assertGreaterEqual(bufsizes["greedy_by_size"][1], lower_bound)
+        # Packing at arbitrary offsets should get within 10% of the bound, and
+        # beat packing whole shared objects.
+        self.assertLessEqual(bufsizes["greedy_by_size"][1], lower_bound * 1.1)
+        self.assertLess(bufsizes["greedy_by_size"][1], bufsizes["greedy_heap"][1])
+
+    def test_verifier_matches_pairwise(self) -> None:
+        graph_module, specs, lifetimes = self.make_random_allocs()
+        for spec, lifetime in zip(specs, lifetimes):
+            spec.lifetime = lifetime
+        get_algo("greedy_by_size")(graph_module, 16)
+        verifier = Verifier(graph_module, True, True)
+        for allow_overlap in (False, True):
+            self.assertEqual(
+                verifier.verify_storage_reuse(allow_overlap),
+                Verifier._verify_storage_reuse_pairwise(specs, allow_overlap),
+            )
+
+        # Make two tensors that are alive at the same time share storage.
+        specs[200].mem_offset = specs[201].mem_offset
+        with self.assertRaises(InternalError) as pairwise_error:
+            Verifier._verify_storage_reuse_pairwise(specs, False)
+        with self.assertRaises(InternalError) as sweep_error:
+            verifier.verify_storage_reuse()
+        self.assertEqual(str(sweep_error.exception), str(pairwise_error.exception))
+        self.assertGreater(verifier.verify_storage_reuse(True), 0)
+
+    def verify_with_submodule(
+        self, graph_module: GraphModule, node: Node, submodule: GraphModule
+    ) -> int:
+        r"""
+        Run the Verifier over the planned tensors of graph_module and of one
+        submodule of its control flow node `node` together. Like at runtime,
+        the tensors of the submodule are alive while `node` runs, and its
+        outputs, which are moved into the results of `node`, until the last
+        use of those results.
+        """
+        node_idx = list(graph_module.graph.nodes).index(node)
+        end_idx = max(spec.lifetime[1] for spec in get_node_tensor_specs(node))
+        return_specs = get_return_specs(submodule)
+        graph = Graph()
+        for spec in Verifier(graph_module, True, True)._collect_planned_specs():
+            graph.call_function(memory.alloc, ()).meta["spec"] = spec
+        for spec in Verifier(submodule, False, True)._collect_planned_specs():
+            lifetime = [node_idx, end_idx if spec in return_specs else node_idx]
+            spec = copy.copy(spec)
+            spec.lifetime = lifetime
+            graph.call_function(memory.alloc, ()).meta["spec"] = spec
+        graph.output(None)
+        return Verifier(
+            GraphModule(torch.nn.Module(), graph), True, True
+        ).verify_storage_reuse()
+
+    def make_cond_graph(self) -> Tuple[GraphModule, Node, Node, Node]:
+        r"""
+        Return a graph that runs a cond on a 64 byte input `x` and writes the
+        result to a 64 byte tensor `during`, which is then written to a 1024
+        byte tensor `after`. Both branches write a 256 byte output. Also
+        returns the cond, `during` and `after` nodes.
+        """
+
+        def alloc(graph: Graph, numel: int) -> Node:
+            node = graph.call_function(memory.alloc, (((numel,), torch.float32),))
+            node.meta["spec"] = TensorSpec(torch.float32, torch.Size([numel]))
+            return node
+
+        def add(graph: Graph, x: Node, out: Node) -> Node:
+            node = graph.call_function(torch.ops.aten.add.out, (x, x), {"out": out})
+            node.meta["spec"] = out.meta["spec"]
+            return node
+
+        def make_branch() -> GraphModule:
+            graph = Graph()
+            y = graph.placeholder("y")
+            y.meta["spec"] = TensorSpec(torch.float32, torch.Size([16]))
+            out = add(graph, y, alloc(graph, 64))
+            graph.output(out).meta["spec"] = out.meta["spec"]
+            return GraphModule(torch.nn.Module(), graph)
+
+        root = torch.nn.Module()
+        root.true_branch = make_branch()
+        root.false_branch = make_branch()
+        graph = Graph()
+        pred = graph.placeholder("pred")
+        pred.meta["spec"] = TensorSpec(torch.bool, torch.Size([1]))
+        x = graph.placeholder("x")
+        x.meta["spec"] = TensorSpec(torch.float32, torch.Size([16]))
+        cond = graph.call_function(
+            torch.ops.higher_order.cond,
+            (pred, graph.get_attr("true_branch"), graph.get_attr("false_branch"), [x]),
+        )
+        cond.meta["spec"] = TensorSpec(torch.float32, torch.Size([64]))
+        during = alloc(graph, 16)
+        result = add(graph, cond, during)
+        after = alloc(graph, 256)
+        output = add(graph, result, after)
+        graph.output(output).meta["spec"] = output.meta["spec"]
+        return GraphModule(root, graph), cond, during, after
+
+    def test_control_flow_submodules_share_storage(self) -> None:
+        graph_module, cond, during, after = self.make_cond_graph()
+
+        # naive places pred, x, the cond output and `during` in the first 208
+        # bytes, followed by `after`.
+        bufsizes = apply_algo(get_algo("naive"), graph_module, 16)
+        self.assertEqual(during.meta["spec"].mem_offset, 144)
+        self.assertEqual(after.meta["spec"].mem_offset, 208)
+        # The branch outputs become the cond result, so they must stay clear
+        # of `during`, but they can share the storage that `after` uses once
+        # the result is dead. Both branches share the same storage.
+        for branch in ("true_branch", "false_branch"):
+            submodule = getattr(graph_module, branch)
+            self.assertEqual(submodule.meta["non_const_buffer_sizes"], [0, 208 + 256])
+            for node in submodule.graph.nodes:
+                if node.target == memory.alloc:
+                    self.assertEqual(node.meta["spec"].mem_offset, 208)
+            self.assertGreater(
+                self.verify_with_submodule(graph_module, cond, submodule), 0
+            )
+        self.assertEqual(bufsizes, [0, 208 + 1024])
+        self.assertEqual(graph_module.meta["non_const_buffer_sizes"], bufsizes)
+
+        # Planning the branches only above the tensors alive at the cond
+        # would put their outputs over `during`.
+        for node in graph_module.true_branch.graph.nodes:
+            if node.target == memory.alloc:
+                node.meta["spec"].mem_offset = 144
+        with self.assertRaises(InternalError):
+            self.verify_with_submodule(graph_module, cond, graph_module.true_branch)
+
+    def make_add_chain(self) -> Tuple[GraphModule, List[Node], List[Node]]:
+        r"""
+        Return a graph that takes a 64 byte input `x` and runs a chain of
+        three ops writing 64, 256 and 64 byte tensors `a`, `b` and `c`, with
+        the alloc nodes and the op nodes of those tensors.
+        """
+        graph = Graph()
+        x = graph.placeholder("x")
+        x.meta["spec"] = TensorSpec(torch.float32, torch.Size([16]))
+        prev = x
+        allocs = []
+        ops = []
+        for numel in (16, 64, 16):
+            out = graph.call_function(memory.alloc, (((numel,), torch.float32),))
+            out.meta["spec"] = TensorSpec(torch.float32, torch.Size([numel]))
+            prev = graph.call_function(
+                torch.ops.aten.add.out, (prev, prev), {"out": out}
+            )
+            prev.meta["spec"] = out.meta["spec"]
+            allocs.append(out)
+            ops.append(prev)
+        graph.output(prev).meta["spec"] = prev.meta["spec"]
+        return GraphModule(torch.nn.Module(), graph), allocs, ops
+
+    def test_assign_mem_ids_spills_to_next_arena(self) -> None:
+        graph_module, allocs, _ = self.make_add_chain()
+        x = next(iter(graph_module.graph.nodes))
+        a, b, c = (node.meta["spec"] for node in allocs)
+        # Pin the last tensor to the second arena.
+        allocs[2].meta["mem_id"] = 2
+
+        arenas = [MemoryArena(1, capacity=200), MemoryArena(2)]
+        assign_mem_ids(graph_module, arenas, 16)
+        # x and `a` are alive together and fit in 200 bytes, `b` does not.
+        self.assertEqual(
+            [x.meta["spec"].mem_id, a.mem_id, b.mem_id, c.mem_id], [1, 1, 2, 2]
+        )
+
+        bufsizes = apply_algo(get_algo("greedy_by_size"), graph_module, 16)
+        self.assertEqual(bufsizes, [0, 128, 256 + 64])
+        self.assertEqual(graph_module.meta["non_const_buffer_sizes"], bufsizes)
+        check_arena_capacities(bufsizes, arenas)
+        with self.assertRaises(ExportError):
+            check_arena_capacities(bufsizes, [MemoryArena(1, capacity=100)])
+
+    def test_assign_mem_ids_counts_assigned_tensors(self) -> None:
+        graph_module, allocs, _ = self.make_add_chain()
+        x = next(iter(graph_module.graph.nodes))
+        a, b, c = (node.meta["spec"] for node in allocs)
+        allocs[2].meta["mem_id"] = 2
+        # `b` was already assigned to the first arena, and takes up most of it
+        # while `a` is alive.
+        b.mem_id = 1
+
+        assign_mem_ids(graph_module, [MemoryArena(1, capacity=300), MemoryArena(2)], 16)
+        self.assertEqual(
+            [x.meta["spec"].mem_id, a.mem_id, b.mem_id, c.mem_id], [1, 2, 1, 2]
+        )
+
+    def test_assign_mem_ids_skips_submodule_inputs(self) -> None:
+        graph_module, _, _, _ = self.make_cond_graph()
+        assign_mem_ids(graph_module, [MemoryArena(1)], 16, alloc_graph_input=False)
+        for branch in (graph_module.true_branch, graph_module.false_branch):
+            for node in branch.graph.nodes:
+                if node.op == "placeholder":
+                    self.assertIsNone(node.meta["spec"].mem_id)
+                elif node.target == memory.alloc:
+                    self.assertEqual(node.meta["spec"].mem_id, 1)
+        # The inputs of the root graph are only skipped if alloc_graph_input is
+        # False.
+        for node in graph_module.graph.nodes:
+            if node.op == "placeholder":
+                self.assertIsNone(node.meta["spec"].mem_id)
+
+        graph_module, _, _, _ = self.make_cond_graph()
+        assign_mem_ids(graph_module, [MemoryArena(1)], 16)
+        for node in graph_module.graph.nodes:
+            if node.op == "placeholder":
+                self.assertEqual(node.meta["spec"].mem_id, 1)
+
+    def test_memory_plan_report(self) -> None:
+        graph_module, _, ops = self.make_add_chain()
+        apply_algo(get_algo("greedy_by_size"), graph_module, 16)
+        report = build_memory_plan_report(graph_module, top_n=1)
+
+        self.assertEqual(list(report.buffers.keys()), [1])
+        buffer = report.buffers[1]
+        # x, a, b and c live over nodes [0, 2], [1, 4], [3, 6] and [5, 7].
+        self.assertEqual(buffer.live_bytes, [64, 128, 128, 320, 320, 320, 320, 64])
+        self.assertEqual(buffer.peak_node_idx, 3)
+        self.assertEqual(buffer.lower_bound, 320)
+        self.assertEqual(buffer.arena_size, 320)
+        self.assertEqual(buffer.fragmentation_percent, 0.0)
+        self.assertEqual(report.bufsizes, [0, 320])
+        # `b` is the largest tensor at the peak, named after the op writing it.
+        self.assertEqual(len(buffer.top_tensors), 1)
+        self.assertEqual(buffer.top_tensors[0].node_name, ops[1].name)
+        self.assertEqual(buffer.top_tensors[0].size, 256)
+        report_json = json.loads(report.to_json())
+        self.assertEqual(report_json["buffers"]["1"]["lower_bound"], 320)
+
     def quantize(self, eager_model: nn.Module) -> nn.Module:
         quantized_model = eager_model
         linear_qconfig_mapping = QConfigMapping().set_object_type(
@@ -520,6 +853,16 @@ class TestMisc(unittest.TestCase):
                 [(1, 0), (3, 0), (1, 4), (3, 4), (1, 0)],
                 [0, 8, 0, 8],
             ),
+            (
+                "greedy_heap",
+                [(1, 0), (3, 0), (1, 4), (3, 4), (1, 0)],
+                [0, 8, 0, 8],
+            ),
+            (
+                "greedy_by_size",
+                [(1, 0), (3, 0), (1, 4), (3, 4), (1, 0)],
+                [0, 8, 0, 8],
+            ),
         ]
     )
     def test_multiple_pools(
@@ -0,0 +1,126 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Writes profiling timelines in the Chrome Trace Event Format, which can be
+opened in chrome://tracing and in the Perfetto UI (https://ui.perfetto.dev).
+
+Events are written to the file as they are added, so traces of large profiling
+dumps never need to be held in memory.
+"""
+
+import json
+from types import TracebackType
+from typing import Any, Dict, Optional, TextIO, Type
+
+
+class ChromeTraceWriter:
+    """
+    Streams trace events to a Chrome Trace Event Format JSON file.
+
+    Processes (pid) and threads (tid) are shown as groups of tracks and tracks.
+    Complete events on the same track are nested by their time ranges.
+
+    Usage:
+        with ChromeTraceWriter(path) as writer:
+            writer.add_complete_event("add", ts_us=0, dur_us=5, pid=0, tid=0)
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._file: Optional[TextIO] = None
+        self._num_events = 0
+        self._thread_names: Dict[int, Dict[int, str]] = {}
+
+    def __enter__(self) -> "ChromeTraceWriter":
+        self._file = open(self._path, "w")
+        self._file.write('{"displayTimeUnit": "ns", "traceEvents": [\n')
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        assert self._file is not None
+        self._file.write("\n]}\n")
+        self._file.close()
+        self._file = None
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        if self._file is None:
+            raise RuntimeError("ChromeTraceWriter must be used as a context manager")
+        if self._num_events:
+            self._file.write(",\n")
+        self._file.write(json.dumps(event))
+        self._num_events += 1
+
+    def set_process_name(self, pid: int, name: str) -> None:
+        self._write(
+            {"ph": "M", "name": "process_name", "pid": pid, "args": {"name": name}}
+        )
+
+    def set_thread_name(self, pid: int, tid: int, name: str) -> None:
+        """
+        Names a track. Only the first name given to each track is written.
+        """
+        thread_names = self._thread_names.setdefault(pid, {})
+        if tid in thread_names:
+            return
+        thread_names[tid] = name
+        self._write(
+            {
+                "ph": "M",
+                "name": "thread_name",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+        )
+        # Keep the tracks in the order of their ids instead of their names
+        self._write(
+            {
+                "ph": "M",
+                "name": "thread_sort_index",
+                "pid": pid,
+                "tid": tid,
+                "args": {"sort_index": tid},
+            }
+        )
+
+    def add_complete_event(
+        self,
+        name: str,
+        ts_us: float,
+        dur_us: float,
+        pid: int,
+        tid: int,
+        args: Optional[Dict[str, Any]] = None,
+        cat: Optional[str] = None,
+    ) -> None:
+        event: Dict[str, Any] = {
+            "ph": "X",
+            "name": name,
+            "ts": ts_us,
+            "dur": dur_us,
+            "pid": pid,
+            "tid": tid,
+        }
+        if cat is not None:
+            event["cat"] = cat
+        if args:
+            event["args"] = args
+        self._write(event)
+
+    def add_counter(
+        self, name: str, ts_us: float, values: Dict[str, float], pid: int
+    ) -> None:
+        """
+        Sets the values of the series of a counter track, e.g. the bytes
+        allocated from each allocator, from ts_us on.
+        """
+        self._write({"ph": "C", "name": name, "ts": ts_us, "pid": pid, "args": values})
@@ -11,6 +11,8 @@ from enum import Enum
 
 from typing import Dict, List, Tuple
 
+import numpy as np
+from executorch.profiler.chrome_trace import ChromeTraceWriter
 from prettytable import PrettyTable
 
 # This version number should match the one defined in profiler.h
@@ -30,6 +32,29 @@ ALLOCATOR_STRUCT_FMT = "32sQ0Q"
 ALLOCATION_STRUCT_FMT = "2I0Q"
 CHAIN_IDX_NO_CHAIN = -1
 
+# The layouts of the prof_event_t and mem_prof_event_t structs as numpy dtypes,
+# so that all the entries of a profiling block can be read at once with
+# np.frombuffer(). align=True lays the fields out like the C compiler does.
+PROF_RESULT_DTYPE = np.dtype(
+    [
+        ("name", "S32"),
+        ("chain_idx", "i4"),
+        ("instruction_idx", "u4"),
+        ("start_time", "u8"),
+        ("end_time", "u8"),
+    ],
+    align=True,
+)
+ALLOCATION_DTYPE = np.dtype(
+    [
+        ("allocator_id", "u4"),
+        ("allocation_size", "u4"),
+    ],
+    align=True,
+)
+assert PROF_RESULT_DTYPE.itemsize == struct.calcsize(PROF_RESULT_STRUCT_FMT)
+assert ALLOCATION_DTYPE.itemsize == struct.calcsize(ALLOCATION_STRUCT_FMT)
+
 
 class TimeScale(Enum):
     TIME_IN_NS = 0
@@ -123,8 +148,41 @@ def adjust_time_scale(event: ProfileData, time_scale: TimeScale):
     return start_time, duration
 
 
+def _adjust_time_scale_arrays(
+    prof_events: np.ndarray, time_scale: TimeScale
+) -> Tuple[List[List[float]], List[List[float]]]:
+    """
+    Same as adjust_time_scale() for a 2D array of PROF_RESULT_DTYPE with one row
+    per iteration. Returns the start times and the durations of each event, i.e.
+    of each column.
+    """
+    time_div_factor = {
+        TimeScale.CPU_CYCLES: 1,
+        TimeScale.TIME_IN_MS: 1,
+        TimeScale.TIME_IN_US: 1000,
+        TimeScale.TIME_IN_NS: 1000000,
+    }
+    div_factor = time_div_factor[time_scale]
+    start_time = prof_events["start_time"].T.astype(np.int64)
+    duration = prof_events["end_time"].T.astype(np.int64) - start_time
+    if div_factor == 1:
+        return start_time.tolist(), duration.tolist()
+    # Use round() rather than np.round(), which differs from it in the last digit
+    # for some values
+    return (
+        [[round(t, 4) for t in row] for row in (start_time / div_factor).tolist()],
+        [[round(d, 4) for d in row] for row in (duration / div_factor).tolist()],
+    )
+
+
+def _decode_name(name: bytes) -> str:
+    # Names are 32 byte strings, where if the real log event is less than 32
+    # characters it'll be filled with 0 chars => trimming it
+    return name.decode("utf-8").replace("\u0000", "")
+
+
 def parse_prof_blocks(
-    prof_blocks: Dict[str, List[Tuple[List[ProfileData], List[MemAllocation]]]],
+    prof_blocks: Dict[str, List[Tuple[np.ndarray, np.ndarray]]],
     allocator_dict: Dict[int, str],
     time_scale: TimeScale,
 ) -> Tuple[Dict[str, List[ProfileEvent]], Dict[str, List[MemEvent]]]:
@@ -134,105 +192,95 @@ def parse_prof_blocks(
 
     # Iterate through all the profiling blocks data that have been grouped by name.
     for name, data_list in prof_blocks.items():
-        prof_data_list = []
-        mem_prof_data_list = []
-        # Each entry in data_list is a tuple in which the first entry is profiling data
-        # and the second entry is memory allocation data, also each entry in data_list
-        # represents one iteration of a code block.
-        for i in range(len(data_list)):
-            for idx, event in enumerate(data_list[i][0]):
-                # If the event represented by the index idx already exists in the list
-                # then just append the new time entry to the duration list present in
-                # the event object. If it doesn't exist then create a new entry and add
-                # it to the list.
-                if idx < len(prof_data_list):
-                    start_time, duration = adjust_time_scale(event, time_scale)
-                    prof_data_list[idx].ts.append(start_time)
-                    prof_data_list[idx].duration.append(duration)
-                else:
-                    start_time, duration = adjust_time_scale(event, time_scale)
-                    prof_data_list.append(
-                        ProfileEvent(
-                            event.name,
-                            [start_time],
-                            [duration],
-                            event.chain_idx,
-                            event.instruction_idx,
-                        )
-                    )
-
-            # Collect all the memory allocation events of this iteration of the code block
-            for idx, event in enumerate(data_list[i][1]):
-                if idx >= len(mem_prof_data_list):
-                    mem_prof_data_list.append(event)
-
-        # Group all the memory allocation events based on the allocator they were
-        # allocated from.
-        alloc_sum_dict = OrderedDict()
-        for alloc in mem_prof_data_list:
-            alloc_sum_dict[alloc.allocator_id] = (
-                alloc_sum_dict.get(alloc.allocator_id, 0) + alloc.allocation_size
+        # Each entry in data_list is a tuple in which the first entry is an array of
+        # profiling data and the second entry is an array of memory allocation data,
+        # also each entry in data_list represents one iteration of a code block.
+        # Stack the iterations so that each column holds all the iterations of one
+        # event.
+        prof_events = np.stack([prof_events for prof_events, _ in data_list])
+        start_times, durations = _adjust_time_scale_arrays(prof_events, time_scale)
+        first_iteration = prof_events[0]
+        prof_data[name] = [
+            ProfileEvent(
+                _decode_name(event_name),
+                ts,
+                duration,
+                chain_idx,
+                instruction_idx,
             )
+            for event_name, chain_idx, instruction_idx, ts, duration in zip(
+                first_iteration["name"].tolist(),
+                first_iteration["chain_idx"].tolist(),
+                first_iteration["instruction_idx"].tolist(),
+                start_times,
+                durations,
+            )
+        ]
 
-        mem_prof_sum_list = []
-        for allocator_id, allocation_size in alloc_sum_dict.items():
-            mem_prof_sum_list.append(
-                MemEvent(allocator_dict[allocator_id], allocation_size)
+        # All the iterations of the code block make the same memory allocations, so
+        # group the memory allocation events of the first iteration based on the
+        # allocator they were allocated from.
+        mem_events = data_list[0][1]
+        allocator_ids, first_indices, allocator_indices = np.unique(
+            mem_events["allocator_id"], return_index=True, return_inverse=True
+        )
+        allocation_sizes = np.zeros(len(allocator_ids), dtype=np.int64)
+        np.add.at(
+            allocation_sizes,
+            allocator_indices.reshape(-1),
+            mem_events["allocation_size"].astype(np.int64),
+        )
+        # Keep the allocators in the order of their first allocation
+        order = np.argsort(first_indices, kind="stable")
+        mem_prof_data[name] = [
+            MemEvent(allocator_dict[allocator_id], allocation_size)
+            for allocator_id, allocation_size in zip(
+                allocator_ids[order].tolist(), allocation_sizes[order].tolist()
             )
-        prof_data[name] = prof_data_list
-        mem_prof_data[name] = mem_prof_sum_list
+        ]
 
     return prof_data, mem_prof_data
 
 
 def sanity_check_prof_outputs(
-    prof_blocks: Dict[str, List[Tuple[List[ProfileData], List[MemAllocation]]]]
+    prof_blocks: Dict[str, List[Tuple[np.ndarray, np.ndarray]]]
 ):
     for _, prof_block_vals in prof_blocks.items():
-        for i in range(len(prof_block_vals) - 1):
-            prof_data_list_base = prof_block_vals[i][0]
-            prof_data_list_cmp = prof_block_vals[i + 1][0]
-
-            # Profiling blocks corresponding to the same name should always be of the same
-            # size as they essentially just represent one iteration of a code block that has been
-            # run multiple times.
-            if len(prof_data_list_base) != len(prof_data_list_cmp):
-                raise ValueError(
-                    "Profiling blocks corresponding to the same name shouldn't be of different lengths."
-                )
-
-            for idx in range(len(prof_data_list_base)):
-                if prof_data_list_base[idx].name != prof_data_list_cmp[idx].name:
-                    raise ValueError(
-                        "Corresponding entries in different iterations of the "
-                        "profiling block do not match"
-                    )
-
-            mem_prof_data_list_base = prof_block_vals[i][1]
-            mem_prof_data_list_cmp = prof_block_vals[i + 1][1]
+        # Profiling blocks corresponding to the same name should always be of the same
+        # size as they essentially just represent one iteration of a code block that has been
+        # run multiple times.
+        if len({len(prof_data) for prof_data, _ in prof_block_vals}) > 1:
+            raise ValueError(
+                "Profiling blocks corresponding to the same name shouldn't be of different lengths."
+            )
+        if len({len(mem_prof_data) for _, mem_prof_data in prof_block_vals}) > 1:
+            raise ValueError(
+                "Memory profiling blocks corresponding to the same name shouldn't be of different lengths."
+            )
 
-            if len(mem_prof_data_list_base) != len(mem_prof_data_list_cmp):
-                raise ValueError(
-                    "Memory profiling blocks corresponding to the same name shouldn't be of different lengths."
-                )
+        # Compare all the iterations with the first one at once
+        prof_names = np.stack([prof_data["name"] for prof_data, _ in prof_block_vals])
+        if (prof_names != prof_names[0]).any():
+            raise ValueError(
+                "Corresponding entries in different iterations of the "
+                "profiling block do not match"
+            )
 
-            for idx in range(len(mem_prof_data_list_base)):
-                if (
-                    mem_prof_data_list_base[idx].allocator_id
-                    != mem_prof_data_list_cmp[idx].allocator_id
-                ):
-                    raise ValueError(
-                        "Corresponding entries in different iterations of the memory "
-                        "profiling blocks do not have the same allocator id"
-                    )
-                if (
-                    mem_prof_data_list_base[idx].allocation_size
-                    != mem_prof_data_list_cmp[idx].allocation_size
-                ):
-                    raise ValueError(
-                        "Corresponding entries in different iterations of the memory "
-                        "profiling blocks do not have the same allocation size."
-                    )
+        mem_prof_data = np.stack(
+            [mem_prof_data for _, mem_prof_data in prof_block_vals]
+        )
+        if (mem_prof_data["allocator_id"] != mem_prof_data["allocator_id"][0]).any():
+            raise ValueError(
+                "Corresponding entries in different iterations of the memory "
+                "profiling blocks do not have the same allocator id"
+            )
+        if (
+            mem_prof_data["allocation_size"] != mem_prof_data["allocation_size"][0]
+        ).any():
+            raise ValueError(
+                "Corresponding entries in different iterations of the memory "
+                "profiling blocks do not have the same allocation size."
+            )
 
 
 def deserialize_profile_results(
@@ -261,25 +309,13 @@ def deserialize_profile_results(
         assert prof_header.prof_ver == ET_PROF_VER, (
             "Mismatch in version between profile dump" "and post-processing tool"
         )
-        # Get all the profiling (perf events) entries
-        prof_data = []
-        for i in range(prof_header.prof_entries):
-            name_bytes, type, id, start_time, end_time = struct.unpack_from(
-                PROF_RESULT_STRUCT_FMT,
-                buff,
-                offset=base_offset + i * prof_result_struct_size,
-            )
-            prof_data.append(
-                ProfileData(
-                    # name_bytes is 32 bytes string, where if the real log event is less
-                    # than 32 characters it'll be filled with 0 chars => trimming it
-                    name_bytes.decode("utf-8").replace("\u0000", ""),
-                    type,
-                    id,
-                    start_time,
-                    end_time,
-                )
-            )
+        # Get all the profiling (perf events) entries, without copying them
+        prof_data = np.frombuffer(
+            buff,
+            dtype=PROF_RESULT_DTYPE,
+            count=prof_header.prof_entries,
+            offset=base_offset,
+        )
 
         # Move forward in the profiling block to start parsing memory allocation events.
         base_offset += prof_result_struct_size * prof_header.max_prof_entries
@@ -299,24 +335,18 @@ def deserialize_profile_results(
         base_offset += prof_allocator_struct_size * prof_header.max_allocator_entries
 
         # Get all the profiling (memory allocation events) entries
-        mem_prof_data = []
-        for i in range(0, prof_header.mem_prof_entries):
-            mem_prof_entry = list(
-                struct.unpack_from(
-                    ALLOCATION_STRUCT_FMT,
-                    buff,
-                    offset=base_offset + i * prof_allocation_struct_size,
-                )
-            )
-            mem_prof_data.append(MemAllocation(*mem_prof_entry))
+        mem_prof_data = np.frombuffer(
+            buff,
+            dtype=ALLOCATION_DTYPE,
+            count=prof_header.mem_prof_entries,
+            offset=base_offset,
+        )
 
         base_offset += prof_allocation_struct_size * prof_header.max_mem_prof_entries
 
         # Get the name of this profiling block and append the profiling data and memory
         # allocation data we just parsed to the list that maps to this block name.
-        prof_blocks[prof_header.name] = prof_blocks.get(prof_header.name, []) + [
-            (prof_data, mem_prof_data)
-        ]
+        prof_blocks.setdefault(prof_header.name, []).append((prof_data, mem_prof_data))
 
     sanity_check_prof_outputs(prof_blocks)
     return parse_prof_blocks(prof_blocks, allocator_dict, time_scale)
@@ -376,22 +406,23 @@ def profile_aggregate_framework_tax(
 
     for name, prof_data_list in prof_data.items():
         execute_max = []
-        kernel_and_delegate_sum = []
+        kernel_and_delegate_durations = []
 
         for d in prof_data_list:
             if "Method::execute" in d.name:
                 execute_max = max(execute_max, d.duration)
 
             if "native_call" in d.name or "delegate_execute" in d.name:
-                for idx in range(len(d.duration)):
-                    if idx < len(kernel_and_delegate_sum):
-                        kernel_and_delegate_sum[idx] += d.duration[idx]
-                    else:
-                        kernel_and_delegate_sum.append(d.duration[idx])
+                kernel_and_delegate_durations.append(d.duration)
 
-        if len(execute_max) == 0 or len(kernel_and_delegate_sum) == 0:
+        if len(execute_max) == 0 or len(kernel_and_delegate_durations) == 0:
             continue
 
+        # Sum the durations of all the kernel and delegate calls of each iteration
+        kernel_and_delegate_sum = (
+            np.array(kernel_and_delegate_durations).sum(axis=0).tolist()
+        )
+
         framework_tax_list = [
             round((execute_time - kernel_delegate_call) / execute_time, 4) * 100
             for execute_time, kernel_delegate_call in zip(
@@ -432,6 +463,73 @@ def profile_framework_tax_table(
     return tables
 
 
+def write_profile_chrome_trace(
+    prof_data: Dict[str, List[ProfileEvent]],
+    mem_allocations: Dict[str, List[MemEvent]],
+    path: str,
+    time_scale: TimeScale = TimeScale.TIME_IN_NS,
+) -> None:
+    """
+    Writes the output of deserialize_profile_results() as a Chrome trace.
+
+    Each profiling block is a process with one track per chain, and a counter
+    track with the total size of the allocations made from each allocator.
+
+    Args:
+        prof_data: Profiling events by block name.
+        mem_allocations: Memory allocations by block name.
+        path: Path of the trace file to write.
+        time_scale: The time_scale that was passed to deserialize_profile_results().
+    """
+    # deserialize_profile_results() converts times in ns and us to ms, and keeps
+    # times in ms and cycles as they are. Trace timestamps are in us, and cycles
+    # are shown as us.
+    to_us = 1.0 if time_scale == TimeScale.CPU_CYCLES else 1000.0
+    with ChromeTraceWriter(path) as writer:
+        for pid, (name, prof_events) in enumerate(prof_data.items()):
+            writer.set_process_name(pid, name)
+            for event in prof_events:
+                # Tracks are numbered from 0 for events outside of any chain
+                tid = event.chain_idx - CHAIN_IDX_NO_CHAIN
+                writer.set_thread_name(
+                    pid,
+                    tid,
+                    f"chain {event.chain_idx}"
+                    if event.chain_idx != CHAIN_IDX_NO_CHAIN
+                    else "method",
+                )
+                for iteration, (ts, duration) in enumerate(
+                    zip(event.ts, event.duration)
+                ):
+                    writer.add_complete_event(
+                        event.name,
+                        ts * to_us,
+                        duration * to_us,
+                        pid,
+                        tid,
+                        args={
+                            "chain_idx": event.chain_idx,
+                            "instruction_idx": event.instruction_idx,
+                            "iteration": iteration,
+                        },
+                    )
+
+            # Only the total of each allocator is known, so show it from the
+            # start of the block
+            mem_events = mem_allocations.get(name, [])
+            if mem_events:
+                start_times = [event.ts[0] for event in prof_events if event.ts]
+                writer.add_counter(
+                    "allocated bytes",
+                    min(start_times, default=0) * to_us,
+                    {
+                        mem_event.allocator_name: mem_event.total_allocations_done
+                        for mem_event in mem_events
+                    },
+                    pid,
+                )
+
+
 def deserialize_profile_results_files(
     profile_results_path: str,
     model_ff_path: str,
@@ -13,12 +13,17 @@ from executorch.profiler.parse_profiler_results import (
     profile_aggregate_framework_tax,
     profile_framework_tax_table,
     profile_table,
+    write_profile_chrome_trace,
 )
 
 
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--prof_results_bin", help="profiling results binary file")
+    parser.add_argument(
+        "--chrome_trace",
+        help="optional path to write a Chrome trace of the profiling results to",
+    )
     args = parser.parse_args()
 
     with open(args.prof_results_bin, "rb") as prof_results_file:
@@ -38,6 +43,9 @@ def main() -> int:
     mem_prof_tables = mem_profile_table(mem_allocations)
     for table in mem_prof_tables:
         print(table)
+
+    if args.chrome_trace is not None:
+        write_profile_chrome_trace(prof_data, mem_allocations, args.chrome_trace)
     return 0
 
 
@@ -0,0 +1,164 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import struct
+import tempfile
+import unittest
+from typing import List, Tuple
+
+from executorch.profiler.parse_profiler_results import (
+    ALLOCATION_STRUCT_FMT,
+    ALLOCATOR_STRUCT_FMT,
+    deserialize_profile_results,
+    ET_PROF_VER,
+    MemEvent,
+    PROF_HEADER_STRUCT_FMT,
+    PROF_RESULT_STRUCT_FMT,
+    profile_aggregate_framework_tax,
+    ProfileEvent,
+    TimeScale,
+    write_profile_chrome_trace,
+)
+
+MAX_PROF_ENTRIES = 4
+MAX_ALLOCATOR_ENTRIES = 2
+MAX_MEM_PROF_ENTRIES = 4
+
+
+def gen_prof_block(
+    name: str,
+    prof_events: List[Tuple[str, int, int, int, int]],
+    allocators: List[Tuple[str, int]],
+    allocations: List[Tuple[int, int]],
+) -> bytes:
+    """
+    Serializes a profiling block the way the runtime lays it out, with each table
+    padded to its maximum number of entries.
+    """
+    block = struct.pack(
+        PROF_HEADER_STRUCT_FMT,
+        name.encode(),
+        ET_PROF_VER,
+        MAX_PROF_ENTRIES,
+        len(prof_events),
+        MAX_ALLOCATOR_ENTRIES,
+        len(allocators),
+        MAX_MEM_PROF_ENTRIES,
+        len(allocations),
+    )
+    for event_name, *event_args in prof_events:
+        block += struct.pack(PROF_RESULT_STRUCT_FMT, event_name.encode(), *event_args)
+    block += bytes(
+        struct.calcsize(PROF_RESULT_STRUCT_FMT) * (MAX_PROF_ENTRIES - len(prof_events))
+    )
+    for allocator_name, allocator_id in allocators:
+        block += struct.pack(
+            ALLOCATOR_STRUCT_FMT, allocator_name.encode(), allocator_id
+        )
+    block += bytes(
+        struct.calcsize(ALLOCATOR_STRUCT_FMT)
+        * (MAX_ALLOCATOR_ENTRIES - len(allocators))
+    )
+    for allocation in allocations:
+        block += struct.pack(ALLOCATION_STRUCT_FMT, *allocation)
+    block += bytes(
+        struct.calcsize(ALLOCATION_STRUCT_FMT)
+        * (MAX_MEM_PROF_ENTRIES - len(allocations))
+    )
+    return block
+
+
+class TestParseProfilerResults(unittest.TestCase):
+    def test_deserialize_profile_results(self) -> None:
+        allocators = [("planned", 0), ("temp", 1)]
+        allocations = [(1, 16), (0, 32), (1, 8)]
+        buff = b"".join(
+            gen_prof_block(
+                "default",
+                [
+                    ("Method::execute", -1, 0, start, start + 5000 + i),
+                    ("native_call_add.out", 0, 1, start + 1000, start + 4000),
+                ],
+                allocators,
+                allocations,
+            )
+            for i, start in enumerate([10000, 20000])
+        )
+
+        prof_data, mem_allocations = deserialize_profile_results(
+            buff, TimeScale.TIME_IN_US
+        )
+
+        self.assertEqual(
+            prof_data,
+            {
+                "default": [
+                    ProfileEvent("Method::execute", [10.0, 20.0], [5.0, 5.001], -1, 0),
+                    ProfileEvent("native_call_add.out", [11.0, 21.0], [3.0, 3.0], 0, 1),
+                ]
+            },
+        )
+        # Allocations are summed per allocator, in the order of first allocation
+        self.assertEqual(
+            mem_allocations,
+            {"default": [MemEvent("temp", 24), MemEvent("planned", 32)]},
+        )
+
+        framework_tax = profile_aggregate_framework_tax(prof_data)["default"]
+        self.assertEqual(framework_tax.exec_time, [5.0, 5.001])
+        self.assertEqual(framework_tax.kernel_and_delegate_time, [3.0, 3.0])
+
+    def test_deserialize_profile_results_mismatched_iterations(self) -> None:
+        buff = gen_prof_block(
+            "default", [("native_call_add.out", 0, 1, 0, 10)], [("planned", 0)], []
+        ) + gen_prof_block(
+            "default", [("native_call_mul.out", 0, 1, 0, 10)], [("planned", 0)], []
+        )
+
+        with self.assertRaises(ValueError):
+            deserialize_profile_results(buff)
+
+    def test_write_profile_chrome_trace(self) -> None:
+        prof_data = {
+            "default": [
+                ProfileEvent("Method::execute", [1.0, 2.0], [0.5, 0.5], -1, 0),
+                ProfileEvent("native_call_add.out", [1.1], [0.2], 0, 1),
+            ]
+        }
+        mem_allocations = {"default": [MemEvent("planned", 32)]}
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = os.path.join(tmpdirname, "trace.json")
+            write_profile_chrome_trace(prof_data, mem_allocations, path)
+            with open(path) as f:
+                trace_events = json.load(f)["traceEvents"]
+
+        # Times in ms are written in us, with one track per chain
+        complete_events = [
+            (event["name"], event["ts"], event["dur"], event["tid"])
+            for event in trace_events
+            if event["ph"] == "X"
+        ]
+        self.assertEqual(
+            complete_events,
+            [
+                ("Method::execute", 1000.0, 500.0, 0),
+                ("Method::execute", 2000.0, 500.0, 0),
+                ("native_call_add.out", 1100.0, 200.0, 1),
+            ],
+        )
+        thread_names = {
+            event["tid"]: event["args"]["name"]
+            for event in trace_events
+            if event["name"] == "thread_name"
+        }
+        self.assertEqual(thread_names, {0: "method", 1: "chain 0"})
+        counters = [event for event in trace_events if event["ph"] == "C"]
+        self.assertEqual(len(counters), 1)
+        self.assertEqual(counters[0]["ts"], 1000.0)
+        self.assertEqual(counters[0]["args"], {"planned": 32})
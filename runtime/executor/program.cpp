@@ -142,13 +142,44 @@ Result<executorch_flatbuffer::ExecutionPlan*> get_execution_plan(
   const executorch_flatbuffer::Program* flatbuffer_program =
       executorch_flatbuffer::GetProgram(program_data->data());
 
+  // Constant data may live in a segment rather than in the flatbuffer. Load it
+  // up front so that tensors can point into it for the life of the Program;
+  // mmap-based loaders can page it in lazily.
+  FreeableBuffer constant_segment_data;
+  const executorch_flatbuffer::SubsegmentOffsets* constant_segment =
+      flatbuffer_program->constant_segment();
+  if (constant_segment != nullptr && constant_segment->offsets() != nullptr &&
+      constant_segment->offsets()->size() > 0) {
+    EXECUTORCH_SCOPE_PROF("Program::load_constant_segment");
+    ET_CHECK_OR_RETURN_ERROR(
+        segment_base_offset != 0 && flatbuffer_program->segments() != nullptr,
+        InvalidProgram,
+        "Program has a constant segment but no segments");
+    const size_t segment_index = constant_segment->segment_index();
+    ET_CHECK_OR_RETURN_ERROR(
+        segment_index < flatbuffer_program->segments()->size(),
+        InvalidProgram,
+        "Constant segment index %zu out of range (>= %zu)",
+        segment_index,
+        (size_t)flatbuffer_program->segments()->size());
+    const executorch_flatbuffer::DataSegment* segment =
+        flatbuffer_program->segments()->Get(segment_index);
+    Result<FreeableBuffer> segment_data =
+        loader->Load(segment_base_offset + segment->offset(), segment->size());
+    if (!segment_data.ok()) {
+      return segment_data.error();
+    }
+    constant_segment_data = std::move(segment_data.get());
+  }
+
   // The FreeableBuffer owns the data that flatbuffer_program points into. Also
   // keep a pointer to the loader so it can load more segments when necessary.
   return Program(
       loader,
       segment_base_offset,
       std::move(program_data.get()),
-      flatbuffer_program);
+      flatbuffer_program,
+      std::move(constant_segment_data));
 }
 
 size_t Program::num_methods() const {
@@ -193,6 +224,27 @@ Result<const void*> Program::get_constant_buffer_data(
     size_t buffer_index) const {
   auto internal_program =
       static_cast<const executorch_flatbuffer::Program*>(internal_program_);
+
+  if (constant_segment_data_.data() != nullptr) {
+    // Constant data lives in a segment; look up the tensor's offset into it.
+    const auto* offsets = internal_program->constant_segment()->offsets();
+    ET_CHECK_OR_RETURN_ERROR(
+        buffer_index < offsets->size(),
+        InvalidArgument,
+        "Constant buffer %zu out of constant segment range %zu",
+        buffer_index,
+        (size_t)offsets->size());
+    const uint64_t offset = offsets->Get(buffer_index);
+    ET_CHECK_OR_RETURN_ERROR(
+        offset <= constant_segment_data_.size(),
+        InvalidProgram,
+        "Constant buffer %zu offset %" PRIu64 " > segment size %zu",
+        buffer_index,
+        offset,
+        constant_segment_data_.size());
+    return static_cast<const uint8_t*>(constant_segment_data_.data()) + offset;
+  }
+
   size_t size = internal_program->constant_buffer()->size();
   ET_CHECK_OR_RETURN_ERROR(
       buffer_index < size,
@@ -254,12 +254,14 @@ class Program final {
       DataLoader* loader,
       size_t segment_base_offset,
       FreeableBuffer&& program_data,
-      const executorch_flatbuffer::Program* internal_program)
+      const executorch_flatbuffer::Program* internal_program,
+      FreeableBuffer&& constant_segment_data)
       : program_data_(std::move(program_data)),
         // Don't need the loader if there are no segments.
         loader_(segment_base_offset > 0 ? loader : nullptr),
         internal_program_(internal_program),
-        segment_base_offset_(segment_base_offset) {}
+        segment_base_offset_(segment_base_offset),
+        constant_segment_data_(std::move(constant_segment_data)) {}
 
   // Not copyable or assignable.
   Program(const Program& rhs) = delete;
@@ -279,6 +281,11 @@ class Program final {
   /// The offset to the first segment, in bytes. If zero, no segments should
   /// be present in internal_program_.
   size_t segment_base_offset_;
+
+  /// Constant tensor data, if the program stores it in a segment instead of
+  /// in the constant_buffer table. Tensors will point directly into this
+  /// buffer.
+  FreeableBuffer constant_segment_data_;
 };
 
 } // namespace executor
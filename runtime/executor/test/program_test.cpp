@@ -326,3 +326,70 @@ TEST_F(ProgramTest, DEPRECATEDLoad) {
   Result<Program> program_res = Program::Load(multi_loader_.get());
   EXPECT_EQ(program_res.error(), Error::Ok);
 }
+
+class ProgramConstantSegmentTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    torch::executor::runtime_init();
+
+    // The same module, with its constant tensor data stored inline in the
+    // flatbuffer and in a segment.
+    Result<FileDataLoader> inline_loader =
+        FileDataLoader::from(std::getenv("ET_MODULE_LINEAR_PATH"));
+    ASSERT_EQ(inline_loader.error(), Error::Ok);
+    inline_loader_ =
+        std::make_unique<FileDataLoader>(std::move(inline_loader.get()));
+
+    Result<FileDataLoader> segment_loader = FileDataLoader::from(
+        std::getenv("ET_MODULE_LINEAR_CONSTANT_SEGMENT_PATH"));
+    ASSERT_EQ(segment_loader.error(), Error::Ok);
+    segment_loader_ =
+        std::make_unique<FileDataLoader>(std::move(segment_loader.get()));
+  }
+
+  std::unique_ptr<FileDataLoader> inline_loader_;
+  std::unique_ptr<FileDataLoader> segment_loader_;
+};
+
+TEST_F(ProgramConstantSegmentTest, ConstantDataMatchesInlineConstants) {
+  Result<Program> inline_program =
+      Program::load(inline_loader_.get(), kDefaultVerification);
+  ASSERT_EQ(inline_program.error(), Error::Ok);
+  Result<Program> segment_program =
+      Program::load(segment_loader_.get(), kDefaultVerification);
+  ASSERT_EQ(segment_program.error(), Error::Ok);
+
+  // ModuleLinear has two 2x2 float constants. Buffer 0 is reserved.
+  constexpr size_t kConstantSize = 4 * sizeof(float);
+  for (size_t i = 1; i <= 2; ++i) {
+    Result<const void*> inline_data =
+        inline_program->get_constant_buffer_data(i);
+    ASSERT_EQ(inline_data.error(), Error::Ok);
+    Result<const void*> segment_data =
+        segment_program->get_constant_buffer_data(i);
+    ASSERT_EQ(segment_data.error(), Error::Ok);
+
+    // Constants in the segment are aligned to the default
+    // constant_tensor_alignment of 16 bytes.
+    EXPECT_EQ(reinterpret_cast<uintptr_t>(segment_data.get()) % 16, 0);
+    EXPECT_EQ(memcmp(inline_data.get(), segment_data.get(), kConstantSize), 0);
+  }
+
+  // The two constants don't overlap.
+  const uint8_t* first = static_cast<const uint8_t*>(
+      segment_program->get_constant_buffer_data(1).get());
+  const uint8_t* second = static_cast<const uint8_t*>(
+      segment_program->get_constant_buffer_data(2).get());
+  EXPECT_GE(static_cast<size_t>(second - first), kConstantSize);
+}
+
+TEST_F(ProgramConstantSegmentTest, ConstantIndexOutOfRangeFails) {
+  Result<Program> program =
+      Program::load(segment_loader_.get(), kDefaultVerification);
+  ASSERT_EQ(program.error(), Error::Ok);
+
+  // The reserved buffer and the two constants.
+  EXPECT_EQ(program->get_constant_buffer_data(2).error(), Error::Ok);
+  EXPECT_EQ(
+      program->get_constant_buffer_data(3).error(), Error::InvalidArgument);
+}
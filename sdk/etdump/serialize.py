@@ -6,16 +6,28 @@
 
 # pyre-strict
 
+import functools
 import json
+import mmap
 import os
+import struct
 import tempfile
+from typing import Any, Callable, Dict, Iterator, Union
+
+import executorch.sdk.etdump.schema_flatcc as schema_flatcc
 
 import pkg_resources
 
-from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
+from executorch.exir._serialize._dataclass import _DataclassEncoder
 
-from executorch.exir._serialize._flatbuffer import _flatc_compile, _flatc_decompile
-from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC
+from executorch.exir._serialize._flatbuffer import _flatc_compile
+from executorch.exir._serialize._flatbuffer_schema import _parse_schema, _Schema
+from executorch.exir._serialize._flatbuffer_view import (
+    _enum_types,
+    _open_view,
+    _TableView,
+)
+from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC, RunData
 
 # The prefix of schema files used for etdump
 ETDUMP_FLATCC_SCHEMA_NAME = "etdump_schema_flatcc"
@@ -39,12 +51,6 @@ ETDump FlatCC Schema Implementations
 """
 
 
-# from json to etdump
-def _deserialize_from_json_to_etdump_flatcc(etdump_json: bytes) -> ETDumpFlatCC:
-    etdump_json = json.loads(etdump_json)
-    return _json_to_dataclass(etdump_json, ETDumpFlatCC)
-
-
 def _convert_to_flatcc(etdump_json: str) -> bytes:
     with tempfile.TemporaryDirectory() as d:
         # load given and common schema
@@ -62,22 +68,62 @@ def _convert_to_flatcc(etdump_json: str) -> bytes:
             return output_file.read()
 
 
-def _convert_from_flatcc(etdump_flatbuffer: bytes, size_prefixed: bool = True) -> bytes:
-    with tempfile.TemporaryDirectory() as d:
-        _write_schema(d, ETDUMP_FLATCC_SCHEMA_NAME)
-        _write_schema(d, SCALAR_TYPE_SCHEMA_NAME)
+@functools.lru_cache(maxsize=1)
+def _etdump_schema() -> _Schema:
+    return _parse_schema(
+        lambda name: pkg_resources.resource_string(__name__, name),
+        "{}.fbs".format(ETDUMP_FLATCC_SCHEMA_NAME),
+    )
 
-        schema_path = os.path.join(d, "{}.fbs".format(ETDUMP_FLATCC_SCHEMA_NAME))
-        bin_path = os.path.join(d, "schema.bin")
-        with open(bin_path, "wb") as bin_file:
-            bin_file.write(etdump_flatbuffer)
-        additional_args = []
-        if size_prefixed:
-            additional_args = ["--size-prefixed"]
-        _flatc_decompile(d, schema_path, bin_path, additional_args)
-        output_path = os.path.join(d, "schema.json")
-        with open(output_path, "rb") as output_file:
-            return output_file.read()
+
+def _open_etdump_view(
+    data: Union[bytes, memoryview], size_prefixed: bool = True
+) -> _TableView:
+    """
+    Returns a lazily-decoded view of the root ETDump table in `data`, which is
+    only read as its fields are accessed.
+    """
+    schema = _etdump_schema()
+    view = memoryview(data)
+    if size_prefixed:
+        (size,) = struct.unpack_from("<I", view, 0)
+        view = view[4 : 4 + size]
+    enums: Dict[str, Callable[[int], Any]] = _enum_types(schema_flatcc, schema)
+    # Value.val holds the name of its ValueType, like the JSON that flatc
+    # produces.
+    value_type_names = {
+        index: name for name, index in schema.enums["ValueType"].values.items()
+    }
+    enums["ValueType"] = value_type_names.__getitem__
+    return _open_view(view, schema, enums)
+
+
+def _iter_run_data(root: _TableView) -> Iterator[RunData]:
+    run_data = root.run_data
+    for run in run_data if run_data is not None else []:
+        yield run.to_dataclass(schema_flatcc)
+
+
+def iter_etdump_run_data(path: str, size_prefixed: bool = True) -> Iterator[RunData]:
+    """
+    Yields the RunData in an etdump file one at a time.
+
+    The file is memory-mapped and each RunData is decoded directly from the
+    flatbuffer data when it is reached, so only the RunData being processed
+    needs to fit in memory, no matter how large the file is.
+
+    Args:
+        path: Path to an etdump file constructed using the FlatCC schema.
+        size_prefixed: Whether the flatbuffer data starts with its size.
+    Returns:
+        An iterator over the RunData in the file.
+    """
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        # The views into the mapped data must be gone before it is unmapped,
+        # so they only live in the inner generator.
+        yield from _iter_run_data(_open_etdump_view(memoryview(mapped), size_prefixed))
 
 
 def serialize_to_etdump_flatcc(
@@ -105,6 +151,5 @@ def deserialize_from_etdump_flatcc(
     Returns:
         Deserialized ETDump python object.
     """
-    return _deserialize_from_json_to_etdump_flatcc(
-        _convert_from_flatcc(data, size_prefixed)
-    )
+    root = _open_etdump_view(data, size_prefixed)
+    return ETDumpFlatCC(version=root.version, run_data=list(_iter_run_data(root)))
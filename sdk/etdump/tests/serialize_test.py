@@ -8,6 +8,7 @@
 
 import difflib
 import json
+import tempfile
 import unittest
 from pprint import pformat
 from typing import List
@@ -17,6 +18,7 @@ from executorch.exir._serialize._dataclass import _DataclassEncoder
 
 from executorch.sdk.etdump.serialize import (
     deserialize_from_etdump_flatcc,
+    iter_etdump_run_data,
     serialize_to_etdump_flatcc,
 )
 
@@ -118,3 +120,12 @@ class TestSerializeFlatCC(unittest.TestCase):
                 )
             ),
         )
+
+    def test_iter_run_data(self) -> None:
+        program = get_sample_etdump_flatcc()
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(serialize_to_etdump_flatcc(program))
+            f.flush()
+            run_data = list(iter_etdump_run_data(f.name, size_prefixed=False))
+        self.assertEqual(run_data, program.run_data)
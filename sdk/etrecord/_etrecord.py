@@ -5,9 +5,10 @@
 # LICENSE file in the root directory of this source tree.
 
 import json
+import operator
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from zipfile import BadZipFile, ZipFile
 
 from executorch import exir
@@ -22,6 +23,7 @@ from executorch.exir import (
 )
 from executorch.exir.emit._emitter import _DelegateDebugIdentifierMap
 from executorch.exir.serde.serialize import deserialize, serialize
+from executorch.sdk.debug_format.et_schema import FXOperatorGraph, RESERVED_METADATA_ARG
 
 
 class ETRecordReservedFileNames(str, Enum):
@@ -31,6 +33,7 @@ class ETRecordReservedFileNames(str, Enum):
     ET_DIALECT_GRAPH_MODULE = "et_dialect_graph_module"
     DEBUG_HANDLE_MAP_NAME = "debug_handle_map"
     DELEGATE_MAP_NAME = "delegate_map"
+    DEBUG_HANDLE_TO_OP_NODE_MAP_NAME = "debug_handle_to_op_node_map"
 
 
 @dataclass
@@ -42,6 +45,51 @@ class ETRecord:
     _delegate_map: Optional[
         Dict[str, Dict[int, Dict[str, Union[str, _DelegateDebugIdentifierMap]]]]
     ] = None
+    _debug_handle_to_op_node_map: Optional[Dict[str, Dict[int, Dict[str, Any]]]] = None
+
+
+def _gen_debug_handle_to_op_node_map(
+    exported_program: ExportedProgram,
+) -> Optional[Dict[int, Dict[str, Any]]]:
+    """
+    Returns the name, op and metadata of the operator node that each debug handle
+    of the given program maps to in its operator graph, so that the Inspector
+    doesn't have to generate the graph to look them up. Returns None if a debug
+    handle is shared between nodes, which the Inspector reports when it
+    generates the graph.
+    """
+    op_nodes = {}
+    for node in exported_program.graph_module.graph.nodes:
+        # Same nodes as the OperatorNodes of FXOperatorGraph.gen_operator_graph()
+        if node.op != "call_function" or node.target in (
+            exir.memory.alloc,
+            operator.getitem,
+        ):
+            continue
+        metadata = FXOperatorGraph._extract_metadata(node.meta)
+        debug_handle = metadata.get(RESERVED_METADATA_ARG.DEBUG_HANDLE.value)
+        if debug_handle is None:
+            continue
+        if debug_handle in op_nodes:
+            return None
+        module_stack = metadata.get(RESERVED_METADATA_ARG.MODULE_STACK.value)
+        if module_stack is not None:
+            # Module types are stored by name, as in the serialized program
+            metadata[RESERVED_METADATA_ARG.MODULE_STACK.value] = {
+                key: [
+                    path,
+                    module_type
+                    if isinstance(module_type, str)
+                    else f"{module_type.__module__}.{module_type.__qualname__}",
+                ]
+                for key, (path, module_type) in module_stack.items()
+            }
+        op_nodes[debug_handle] = {
+            "name": FXOperatorGraph._get_node_name(node),
+            "op": FXOperatorGraph._get_op_name(node),
+            "metadata": metadata,
+        }
+    return op_nodes
 
 
 def _handle_exported_program(
@@ -127,12 +175,12 @@ def generate_etrecord(
     """
     Generates an `ETRecord` from the given objects, serializes it and saves it to the given path.
     The objects that will be serialized to an `ETRecord` are all the graph modules present
-    in the `export_modules` dict, the graph module present in the edge dialect program object,
+    in the `export_modules` dict, the graph modules of all methods present in the edge dialect program object,
     and also the graph module present in the ExecuTorch program object, which
     is the closest graph module representation of what is eventually run on the device.
     In addition to all the graph modules, we also serialize the program buffer, which the users
-    can provide to the ExecuTorch runtime to run the model, and the debug handle map
-    for SDK tooling usage.
+    can provide to the ExecuTorch runtime to run the model, the debug handle map, and
+    the operator node data of each debug handle of the edge dialect program for SDK tooling usage.
 
     Args:
         etrecord_path: Path to where the `ETRecord` file will be saved to.
@@ -171,11 +219,27 @@ def generate_etrecord(
             etrecord_zip,
             edge_dialect_program.exported_program(),
         )
+        edge_dialect_programs = {
+            method_name: edge_dialect_program.exported_program(method_name)
+            for method_name in edge_dialect_program.methods
+        }
+        # The other methods of a multi-method program are stored next to it, and
+        # end up in the graph map of the parsed ETRecord under the same names.
+        for method_name in sorted(edge_dialect_program.methods):
+            if method_name == "forward":
+                continue
+            _handle_exported_program(
+                etrecord_zip,
+                ETRecordReservedFileNames.EDGE_DIALECT_EXPORTED_PROGRAM.value,
+                method_name,
+                edge_dialect_program.exported_program(method_name),
+            )
     elif isinstance(edge_dialect_program, ExirExportedProgram):
         _handle_edge_dialect_exported_program(
             etrecord_zip,
             edge_dialect_program.exported_program,
         )
+        edge_dialect_programs = {"forward": edge_dialect_program.exported_program}
     else:
         raise RuntimeError(
             f"Unsupported type of edge_dialect_program passed in {type(edge_dialect_program)}."
@@ -191,6 +255,28 @@ def generate_etrecord(
         json.dumps(executorch_program.delegate_map),
     )
 
+    debug_handle_to_op_node_map = {}
+    for method_name, exported_program in edge_dialect_programs.items():
+        op_nodes = _gen_debug_handle_to_op_node_map(exported_program)
+        if op_nodes is not None:
+            debug_handle_to_op_node_map[method_name] = op_nodes
+    etrecord_zip.writestr(
+        ETRecordReservedFileNames.DEBUG_HANDLE_TO_OP_NODE_MAP_NAME,
+        json.dumps(debug_handle_to_op_node_map),
+    )
+
+
+def _parse_debug_handle_to_op_node_map(
+    serialized: bytes,
+) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    # JSON object keys are strings, the debug handles are restored as ints
+    return {
+        method_name: {
+            int(debug_handle): op_node for debug_handle, op_node in op_nodes.items()
+        }
+        for method_name, op_nodes in json.loads(serialized).items()
+    }
+
 
 def parse_etrecord(etrecord_path: str) -> ETRecord:
     """
@@ -239,7 +325,10 @@ def parse_etrecord(etrecord_path: str) -> ETRecord:
             )
         elif entry == ETRecordReservedFileNames.PROGRAM_BUFFER:
             program_buffer = etrecord_zip.read(ETRecordReservedFileNames.PROGRAM_BUFFER)
-        elif entry == ETRecordReservedFileNames.ETRECORD_IDENTIFIER:
+        elif entry in (
+            ETRecordReservedFileNames.ETRECORD_IDENTIFIER,
+            ETRecordReservedFileNames.DEBUG_HANDLE_TO_OP_NODE_MAP_NAME,
+        ):
             continue
         elif entry == ETRecordReservedFileNames.EDGE_DIALECT_EXPORTED_PROGRAM:
             edge_dialect_program = deserialize(
@@ -264,10 +353,22 @@ def parse_etrecord(etrecord_path: str) -> ETRecord:
             etrecord_zip.read(serialized_state_dict_file),
         )
 
+    # Missing from ETRecords generated before it was added
+    debug_handle_to_op_node_map = (
+        _parse_debug_handle_to_op_node_map(
+            etrecord_zip.read(
+                ETRecordReservedFileNames.DEBUG_HANDLE_TO_OP_NODE_MAP_NAME
+            )
+        )
+        if ETRecordReservedFileNames.DEBUG_HANDLE_TO_OP_NODE_MAP_NAME in file_list
+        else None
+    )
+
     return ETRecord(
         edge_dialect_program=edge_dialect_program,
         graph_map=graph_map,
         program_buffer=program_buffer,
         _debug_handle_map=debug_handle_map,
         _delegate_map=delegate_map,
+        _debug_handle_to_op_node_map=debug_handle_to_op_node_map,
     )
@@ -40,6 +40,19 @@ class TestETRecord(unittest.TestCase):
         edge_program_copy = copy.deepcopy(edge_program)
         return (aten_dialect, edge_program_copy, edge_program.to_executorch())
 
+    def get_test_model_with_multiple_methods(self):
+        f = models.BasicSinMax()
+        g = models.Mul()
+        edge_program: EdgeProgramManager = to_edge(
+            {
+                "forward": export(f, f.get_random_inputs()),
+                "forward2": export(g, g.get_random_inputs()),
+            },
+            compile_config=EdgeCompileConfig(_check_ir_validity=False),
+        )
+        edge_program_copy = copy.deepcopy(edge_program)
+        return (edge_program_copy, edge_program.to_executorch())
+
     # Serialized and deserialized graph modules are not completely the same, so we check
     # that they are close enough and match especially on the parameters we care about in the SDK.
     def check_graph_closeness(self, graph_a, graph_b):
@@ -101,6 +114,35 @@ class TestETRecord(unittest.TestCase):
                 json.loads(json.dumps(et_output.debug_handle_map)),
             )
 
+    def test_etrecord_generation_with_multiple_methods(self):
+        edge_output, et_output = self.get_test_model_with_multiple_methods()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(
+                tmpdirname + "/etrecord.bin",
+                edge_output,
+                et_output,
+            )
+
+            etrecord = parse_etrecord(tmpdirname + "/etrecord.bin")
+            self.check_graph_closeness(
+                etrecord.edge_dialect_program,
+                edge_output.exported_program().graph_module,
+            )
+            self.check_graph_closeness(
+                etrecord.graph_map[
+                    f"{ETRecordReservedFileNames.EDGE_DIALECT_EXPORTED_PROGRAM.value}/forward2"
+                ],
+                edge_output.exported_program("forward2").graph_module,
+            )
+            self.assertEqual(set(etrecord._debug_handle_map), {"forward", "forward2"})
+            self.assertEqual(
+                set(etrecord._debug_handle_to_op_node_map), {"forward", "forward2"}
+            )
+            self.assertEqual(
+                etrecord._debug_handle_map,
+                json.loads(json.dumps(et_output.debug_handle_map)),
+            )
+
     def test_etrecord_invalid_input(self):
         captured_output, edge_output, et_output = self.get_test_model()
         with tempfile.TemporaryDirectory() as tmpdirname:
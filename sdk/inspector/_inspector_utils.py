@@ -4,29 +4,56 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Dict, Mapping, Optional
+from typing import Collection, Dict, Iterator, Mapping, Optional
 
 from executorch.sdk.debug_format.base_schema import OperatorNode
 
 from executorch.sdk.debug_format.et_schema import FXOperatorGraph, OperatorGraph
-from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC
+from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC, RunData
 
-from executorch.sdk.etdump.serialize import deserialize_from_etdump_flatcc
+from executorch.sdk.etdump.serialize import (
+    deserialize_from_etdump_flatcc,
+    iter_etdump_run_data,
+)
 from executorch.sdk.etrecord import ETRecord
+from executorch.sdk.etrecord._etrecord import ETRecordReservedFileNames
 
+FORWARD = "forward"
 EDGE_DIALECT_GRAPH_KEY = "edge_dialect_graph_module"
 
 
+def get_edge_dialect_graph_key(method_name: str) -> str:
+    """
+    Returns the name of the edge dialect graph of the given method in the mapping
+    returned by gen_graphs_from_etrecord().
+    """
+    if method_name == FORWARD:
+        return EDGE_DIALECT_GRAPH_KEY
+    # Stored in the graph map of the ETRecord, see generate_etrecord()
+    return (
+        f"{ETRecordReservedFileNames.EDGE_DIALECT_EXPORTED_PROGRAM.value}/{method_name}"
+    )
+
+
 def gen_graphs_from_etrecord(
     etrecord: ETRecord,
+    graph_names: Optional[Collection[str]] = None,
 ) -> Mapping[str, OperatorGraph]:
+    """
+    Generates the operator graphs of the graphs in the ETRecord, or only of the
+    ones named in graph_names if provided, since generating them for large
+    models is expensive.
+    """
     op_graph_map = {}
     if etrecord.graph_map is not None:
         op_graph_map = {
             name: FXOperatorGraph.gen_operator_graph(exported_program.graph_module)
             for name, exported_program in etrecord.graph_map.items()
+            if graph_names is None or name in graph_names
         }
-    if etrecord.edge_dialect_program is not None:
+    if etrecord.edge_dialect_program is not None and (
+        graph_names is None or EDGE_DIALECT_GRAPH_KEY in graph_names
+    ):
         op_graph_map[EDGE_DIALECT_GRAPH_KEY] = FXOperatorGraph.gen_operator_graph(
             etrecord.edge_dialect_program.graph_module
         )
@@ -61,6 +88,33 @@ def create_debug_handle_to_op_node_mapping(
                 debug_handle_to_op_node_map[debug_handle] = element
 
 
+def gen_debug_handle_to_op_node_map_from_etrecord(
+    etrecord: ETRecord, method_name: str
+) -> Optional[Dict[int, OperatorNode]]:
+    """
+    Returns the mapping from debug handle to op node of the edge dialect graph of
+    the given method from the index stored in the ETRecord, without generating
+    the graph, or None if the ETRecord has no index for the method.
+    """
+    if (
+        etrecord._debug_handle_to_op_node_map is None
+        or (op_nodes := etrecord._debug_handle_to_op_node_map.get(method_name)) is None
+    ):
+        return None
+    debug_handle_to_op_node_map = {}
+    for debug_handle, op_node in op_nodes.items():
+        metadata = dict(op_node["metadata"])
+        if (module_stack := metadata.get("nn_module_stack")) is not None:
+            # Stored as JSON lists, the deserialized graphs hold tuples
+            metadata["nn_module_stack"] = {
+                key: tuple(module) for key, module in module_stack.items()
+            }
+        debug_handle_to_op_node_map[debug_handle] = OperatorNode(
+            op_node["name"], metadata=metadata, op=op_node["op"]
+        )
+    return debug_handle_to_op_node_map
+
+
 def gen_etdump_object(etdump_path: Optional[str] = None) -> ETDumpFlatCC:
     # Gen event blocks from etdump
     if etdump_path is None:
@@ -68,3 +122,11 @@ def gen_etdump_object(etdump_path: Optional[str] = None) -> ETDumpFlatCC:
     with open(etdump_path, "rb") as buff:
         etdump = deserialize_from_etdump_flatcc(buff.read())
         return etdump
+
+
+def gen_etdump_run_data(etdump_path: Optional[str] = None) -> Iterator[RunData]:
+    # Decode the RunData from etdump one at a time, without reading the
+    # whole file into memory
+    if etdump_path is None:
+        raise ValueError("Etdump_path must be specified.")
+    return iter_etdump_run_data(etdump_path)
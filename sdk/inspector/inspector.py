@@ -4,13 +4,15 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import bisect
 import dataclasses
 import logging
-from collections import defaultdict, OrderedDict
 from dataclasses import dataclass
 from enum import Enum
 from typing import (
+    Collection,
     Dict,
+    Iterable,
     List,
     Mapping,
     Optional,
@@ -25,20 +27,22 @@ import numpy as np
 import pandas as pd
 import torch
 from executorch.exir import ExportedProgram
+from executorch.profiler.chrome_trace import ChromeTraceWriter
 
-from executorch.sdk.debug_format.et_schema import OperatorNode
-from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC, ProfileEvent
+from executorch.sdk.debug_format.et_schema import OperatorGraph, OperatorNode
+from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC, ProfileEvent, RunData
 from executorch.sdk.etrecord import parse_etrecord
 from executorch.sdk.inspector._inspector_utils import (
     create_debug_handle_to_op_node_mapping,
-    EDGE_DIALECT_GRAPH_KEY,
-    gen_etdump_object,
+    FORWARD,
+    gen_debug_handle_to_op_node_map_from_etrecord,
+    gen_etdump_run_data,
     gen_graphs_from_etrecord,
+    get_edge_dialect_graph_key,
 )
 
 from tabulate import tabulate
 
-FORWARD = "forward"
 RESERVED_FRAMEWORK_EVENT_NAMES = [
     "Method::init",
     "Program::load_method",
@@ -52,6 +56,12 @@ EXCLUDED_COLUMNS_WHEN_PRINTING = [
     "debug_data",
 ]
 EXCLUDED_EVENTS_WHEN_PRINTING = {"OPERATOR_CALL"}
+# Framework events, and the framework tax of operator calls, which would count
+# the time of the operators they belong to twice
+EXCLUDED_EVENTS_FROM_AGGREGATION = {
+    *RESERVED_FRAMEWORK_EVENT_NAMES,
+    *EXCLUDED_EVENTS_WHEN_PRINTING,
+}
 
 
 log: logging.Logger = logging.getLogger(__name__)
@@ -117,25 +127,69 @@ time_scale_dict = {
 class PerfData:
     def __init__(self, raw: List[float]):
         self.raw: List[float] = raw
+        # Summary statistics computed for many PerfData at once, see
+        # _gen_from_durations()
+        self._stats: Optional[Dict[str, float]] = None
+
+    @staticmethod
+    def _gen_from_durations(durations: np.ndarray) -> List["PerfData"]:
+        """
+        Given a 2D array with the durations of one event per row, return the
+        PerfData of each row, with the summary statistics of all rows computed
+        in a few batched calls instead of one event at a time.
+
+        Each row is reduced along the contiguous axis, so the statistics are
+        identical to those computed from the row alone.
+        """
+        durations = np.ascontiguousarray(durations, dtype=np.float64)
+        if durations.shape[1] == 0:
+            return [PerfData([]) for _ in range(durations.shape[0])]
+        p50s, p90s = np.percentile(durations, [50, 90], axis=1)
+        avgs = np.mean(durations, axis=1)
+        mins = durations.min(axis=1).tolist()
+        maxs = durations.max(axis=1).tolist()
+
+        perf_data_list = []
+        for i, raw in enumerate(durations.tolist()):
+            perf_data = PerfData(raw)
+            perf_data._stats = {
+                "p50": p50s[i],
+                "p90": p90s[i],
+                "avg": avgs[i],
+                "min": mins[i],
+                "max": maxs[i],
+            }
+            perf_data_list.append(perf_data)
+        return perf_data_list
 
     @property
     def p50(self) -> float:
+        if self._stats is not None:
+            return self._stats["p50"]
         return np.percentile(self.raw, 50)
 
     @property
     def p90(self) -> float:
+        if self._stats is not None:
+            return self._stats["p90"]
         return np.percentile(self.raw, 90)
 
     @property
     def avg(self) -> float:
+        if self._stats is not None:
+            return self._stats["avg"]
         return np.mean(self.raw)
 
     @property
     def min(self) -> float:
+        if self._stats is not None:
+            return self._stats["min"]
         return min(self.raw)
 
     @property
     def max(self) -> float:
+        if self._stats is not None:
+            return self._stats["max"]
         return max(self.raw)
 
 
@@ -184,6 +238,22 @@ class Event:
 
         An optional inverse scale factor can be provided to adjust the event timestamps
         """
+        perf_data = PerfData(
+            [
+                float(event.end_time - event.start_time) / scale_factor
+                for event in events
+            ]
+        )
+        return Event._gen_from_perf_data(signature, perf_data)
+
+    @staticmethod
+    def _gen_from_perf_data(
+        signature: ProfileEventSignature, perf_data: PerfData
+    ) -> "Event":
+        """
+        Given a ProfileEventSignature and the PerfData of the ProfileEvents with
+        that signature, return an Event object matching the ProfileEventSignature
+        """
         if signature.delegate_id is not None:  # 0 is a valid value
             delegate_debug_identifier = signature.delegate_id
         else:
@@ -193,12 +263,6 @@ class Event:
         is_delegated_op = delegate_debug_identifier is not None
         name = signature.name if not is_delegated_op else str(delegate_debug_identifier)
 
-        perf_data = PerfData(
-            [
-                float(event.end_time - event.start_time) / scale_factor
-                for event in events
-            ]
-        )
         return Event(
             name=name,
             perf_data=perf_data,
@@ -245,12 +309,14 @@ class EventBlock:
     Args:
         name: Name of the profiling/debugging block.
         events: List of `Event`\ s associated with the profiling/debugging block.
+        method_name: Name of the method that the block was run for, if known.
     """
 
     name: str
     events: List[Event] = dataclasses.field(default_factory=list)
     source_time_scale: TimeScale = TimeScale.NS
     target_time_scale: TimeScale = TimeScale.MS
+    method_name: Optional[str] = None
 
     def to_dataframe(self, include_units: bool = False) -> pd.DataFrame:
         """
@@ -306,51 +372,129 @@ class EventBlock:
         An optional (inverse) scale factor can be provided to adjust the
         etdump timestamps associated with each EventBlocks
         """
+        return EventBlock._gen_from_run_data(
+            etdump.run_data, source_time_scale, target_time_scale
+        )
+
+    @staticmethod
+    def _gen_from_run_data(
+        run_data: Iterable[RunData],
+        source_time_scale: TimeScale = TimeScale.NS,
+        target_time_scale: TimeScale = TimeScale.MS,
+        method_names: Optional[Collection[str]] = None,
+    ) -> List["EventBlock"]:
+        """
+        Given the RunData of an etdump, generate a list of EventBlocks corresponding
+        to the contents.
 
-        # Group all the RunData by the set of profile events
-        profile_run_groups: Mapping[
-            RunSignature,
-            OrderedDict[ProfileEventSignature, List[ProfileEvent]],
-        ] = defaultdict(OrderedDict)
-        for run in etdump.run_data:
+        run_data is only iterated once, and only the durations of the profile
+        events are kept from each RunData, so it can be a stream of RunData
+        decoded one at a time.
+
+        RunData whose name is one of method_names are attributed to that method,
+        and never grouped with the RunData of other methods.
+        """
+
+        # Intern each ProfileEventSignature as an index into signatures. Events
+        # are first looked up by their raw fields, which is cheaper than
+        # building a signature for every event.
+        signatures: List[ProfileEventSignature] = []
+        signature_ids: Dict[ProfileEventSignature, int] = {}
+        raw_signature_ids: Dict[Tuple, int] = {}
+
+        def intern(profile_event: ProfileEvent, raw_signature: Tuple) -> int:
+            signature = ProfileEventSignature._gen_from_event(profile_event)
+            signature_id = signature_ids.get(signature)
+            if signature_id is None:
+                signature_id = signature_ids[signature] = len(signatures)
+                signatures.append(signature)
+            raw_signature_ids[raw_signature] = signature_id
+            return signature_id
+
+        # Group all the RunData by their method and set of profile events. For
+        # each group, keep the signature ids of its events, in the order of the
+        # RunSignature, and one row per run with the duration of each event.
+        profile_run_groups: Dict[
+            Tuple[Optional[str], bytes], Tuple[np.ndarray, List[np.ndarray]]
+        ] = {}
+        for run in run_data:
             if (run_events := run.events) is None:
                 continue
+            method_name = (
+                run.name
+                if method_names is not None and run.name in method_names
+                else None
+            )
 
-            # Identify all the ProfileEventSignatures
-            profile_events: OrderedDict[
-                ProfileEventSignature, ProfileEvent
-            ] = OrderedDict()
+            # Decode the profile events of the run into columns of signature
+            # ids, start times and end times. This is the only per-event work
+            # done in Python.
+            id_list: List[int] = []
+            start_list: List[int] = []
+            end_list: List[int] = []
             for event in run_events:
-                if (profile_event := event.profile_event) is not None:
-                    signature = ProfileEventSignature._gen_from_event(profile_event)
-                    profile_events[signature] = profile_event
-
-            # Create a RunSignature from the ProfileEventSignature found
-            run_signature: RunSignature = tuple(profile_events.keys())
+                if (profile_event := event.profile_event) is None:
+                    continue
+                raw_signature = (
+                    profile_event.name,
+                    profile_event.instruction_id,
+                    profile_event.delegate_debug_id_int,
+                    profile_event.delegate_debug_id_str,
+                )
+                signature_id = raw_signature_ids.get(raw_signature)
+                id_list.append(
+                    intern(profile_event, raw_signature)
+                    if signature_id is None
+                    else signature_id
+                )
+                start_list.append(profile_event.start_time)
+                end_list.append(profile_event.end_time)
+            ids = np.array(id_list, dtype=np.int64)
+
+            # The RunSignature lists each signature in the order of its first
+            # event, and the last event with a signature provides its duration
+            # in this run.
+            run_signature, first_index = np.unique(ids, return_index=True)
+            _, last_reversed_index = np.unique(ids[::-1], return_index=True)
+            order = np.argsort(first_index, kind="stable")
+            run_signature = run_signature[order]
+            last_index = len(ids) - 1 - last_reversed_index[order]
+            durations = (
+                np.array(end_list, dtype=np.int64)[last_index]
+                - np.array(start_list, dtype=np.int64)[last_index]
+            )
 
             # Update the Profile Run Groups, indexed on the RunSignature
-            run_signature_events: OrderedDict[
-                ProfileEventSignature, List[ProfileEvent]
-            ] = profile_run_groups[run_signature]
-            for event_signature, event in profile_events.items():
-                run_signature_events.setdefault(event_signature, []).append(event)
+            profile_run_groups.setdefault(
+                (method_name, run_signature.tobytes()), (run_signature, [])
+            )[1].append(durations)
 
         scale_factor = (
             time_scale_dict[source_time_scale] / time_scale_dict[target_time_scale]
         )
-        # Create EventBlocks from the Profile Run Groups
-        return [
-            EventBlock(
-                name=str(index),
-                events=[
-                    Event._gen_from_profile_events(signature, event, scale_factor)
-                    for signature, event in profile_events.items()
-                ],
-                source_time_scale=source_time_scale,
-                target_time_scale=target_time_scale,
+        # Create EventBlocks from the Profile Run Groups, with the durations of
+        # each event in a row
+        event_blocks = []
+        for index, ((method_name, _), (run_signature, run_durations_list)) in enumerate(
+            profile_run_groups.items()
+        ):
+            durations = np.stack(run_durations_list).T.astype(np.float64) / scale_factor
+            event_blocks.append(
+                EventBlock(
+                    name=str(index),
+                    events=[
+                        Event._gen_from_perf_data(signatures[signature_id], perf_data)
+                        for signature_id, perf_data in zip(
+                            run_signature.tolist(),
+                            PerfData._gen_from_durations(durations),
+                        )
+                    ],
+                    source_time_scale=source_time_scale,
+                    target_time_scale=target_time_scale,
+                    method_name=method_name,
+                )
             )
-            for index, profile_events in enumerate(profile_run_groups.values())
-        ]
+        return event_blocks
 
     # TODO: Considering changing ETRecord deserialization logic to cast the ints in string format to actual ints
     def _gen_resolve_debug_handles(
@@ -406,6 +550,231 @@ class EventBlock:
                 )
 
 
+class AggregateBy(Enum):
+    """
+    The attribute of an `Event` that `Inspector.aggregate()` groups events by.
+    Events with several values of the attribute count towards each of them.
+    """
+
+    OP_TYPE = "op_type"
+    # Each module in the module hierarchy of the event, including the modules
+    # that contain other modules
+    MODULE = "module"
+    DELEGATE_BACKEND = "delegate_backend"
+    DEBUG_HANDLE = "debug_handle"
+
+
+@dataclass
+class EventAggregate:
+    """
+    The latency of a group of events, see `Inspector.aggregate()`.
+
+    Args:
+        key: The op type, module name, delegate backend name or debug handle of the group.
+        num_events: Number of events in the group.
+        num_runs: Number of latency samples: one for each run of each EventBlock with events in the group.
+        sum: Total latency of the group over all runs.
+        mean, p50, p90, min, max: Statistics of the latency of the group in a single run.
+    """
+
+    key: Union[str, int]
+    num_events: int
+    num_runs: int
+    sum: float
+    mean: float
+    p50: float
+    p90: float
+    min: float
+    max: float
+
+
+class _EventIndex:
+    """
+    Index over the events of a list of EventBlocks, built once so that
+    aggregation queries over large ETDumps do not walk every event again.
+    """
+
+    def __init__(self, event_blocks: List[EventBlock]) -> None:
+        self.event_blocks = event_blocks
+        self.events: List[Event] = []
+        # The range of indices into events, and the durations of each event in
+        # each run, of each EventBlock
+        self._block_ranges: List[Tuple[int, int]] = []
+        self._block_durations: List[np.ndarray] = []
+        for block in event_blocks:
+            start = len(self.events)
+            self.events.extend(block.events)
+            self._block_ranges.append((start, len(self.events)))
+            raws = [event.perf_data.raw for event in block.events]
+            num_runs = max((len(raw) for raw in raws), default=0)
+            durations = np.zeros((len(raws), num_runs), dtype=np.float64)
+            for i, raw in enumerate(raws):
+                durations[i, : len(raw)] = raw
+            self._block_durations.append(durations)
+
+        # The modules of each event, and the events in each module. Module names
+        # are kept sorted for prefix lookups.
+        self._event_modules: List[List[str]] = []
+        self.module_events: Dict[str, List[int]] = {}
+        for event_id, event in enumerate(self.events):
+            modules = {}
+            for hierarchy in event.module_hierarchy.values():
+                if hierarchy:
+                    modules.update(dict.fromkeys(hierarchy.keys()))
+            self._event_modules.append(list(modules))
+            for module in modules:
+                self.module_events.setdefault(module, []).append(event_id)
+        self.module_names: List[str] = sorted(self.module_events)
+
+        self._aggregates: Dict[
+            Tuple[AggregateBy, Optional[str]], List[EventAggregate]
+        ] = {}
+
+    def modules_with_prefix(self, prefix: str) -> List[str]:
+        """
+        Returns the names of the modules that start with prefix.
+        """
+        start = bisect.bisect_left(self.module_names, prefix)
+        end = start
+        while end < len(self.module_names) and self.module_names[end].startswith(
+            prefix
+        ):
+            end += 1
+        return self.module_names[start:end]
+
+    def _group_keys(self, event_id: int, by: AggregateBy) -> Iterable[Union[str, int]]:
+        event = self.events[event_id]
+        if by == AggregateBy.OP_TYPE:
+            return dict.fromkeys(event.op_types)
+        if by == AggregateBy.MODULE:
+            return self._event_modules[event_id]
+        if by == AggregateBy.DELEGATE_BACKEND:
+            backend = event.delegate_backend_name
+            return [backend] if backend is not None else []
+        debug_handles = event.debug_handles
+        if debug_handles is None:
+            return []
+        if isinstance(debug_handles, int):
+            return [debug_handles]
+        return dict.fromkeys(debug_handles)
+
+    def aggregate(
+        self, by: AggregateBy, module_prefix: Optional[str] = None
+    ) -> List[EventAggregate]:
+        """
+        Returns the latency of each group of events, highest total first. Only
+        the events in modules starting with module_prefix are included if it is
+        provided.
+
+        The latency of a group in a run of an EventBlock is the sum of the
+        durations of the group's events in that run, and the statistics are
+        computed over these sums for all the runs of all EventBlocks with
+        events in the group.
+        """
+        if (cached := self._aggregates.get((by, module_prefix))) is not None:
+            return cached
+
+        if module_prefix is not None:
+            event_ids = sorted(
+                {
+                    event_id
+                    for module in self.modules_with_prefix(module_prefix)
+                    for event_id in self.module_events[module]
+                }
+            )
+        else:
+            event_ids = range(len(self.events))
+
+        # Pair each event with each of its groups
+        group_ids: Dict[Union[str, int], int] = {}
+        pair_groups: List[int] = []
+        pair_events: List[int] = []
+        for event_id in event_ids:
+            if self.events[event_id].name in EXCLUDED_EVENTS_FROM_AGGREGATION:
+                continue
+            for key in self._group_keys(event_id, by):
+                group_id = group_ids.get(key)
+                if group_id is None:
+                    group_id = group_ids[key] = len(group_ids)
+                pair_groups.append(group_id)
+                pair_events.append(event_id)
+        keys = list(group_ids)
+        groups = np.array(pair_groups, dtype=np.int64)
+        events = np.array(pair_events, dtype=np.int64)
+        num_events = np.bincount(groups, minlength=len(keys)).tolist()
+
+        # Sum the durations of the events of each group in each run of each
+        # EventBlock, and record the row of each group in the sums of each
+        # EventBlock, or -1 if it has no events there
+        block_sums: List[np.ndarray] = []
+        block_rows = np.full((len(self._block_ranges), len(keys)), -1, dtype=np.int64)
+        for block_index, (start, end) in enumerate(self._block_ranges):
+            in_block = (events >= start) & (events < end)
+            block_groups = groups[in_block]
+            order = np.argsort(block_groups, kind="stable")
+            block_groups = block_groups[order]
+            rows = self._block_durations[block_index][events[in_block][order] - start]
+            present, offsets = np.unique(block_groups, return_index=True)
+            if len(present) and rows.shape[1]:
+                sums = np.add.reduceat(rows, offsets, axis=0)
+            else:
+                sums = np.zeros((len(present), rows.shape[1]), dtype=np.float64)
+            block_sums.append(sums)
+            block_rows[block_index, present] = np.arange(len(present))
+
+        # Groups with events in the same EventBlocks have the same number of
+        # samples, so their statistics are computed together
+        aggregates: List[Optional[EventAggregate]] = [None] * len(keys)
+        patterns, pattern_ids = np.unique(
+            block_rows.T >= 0, axis=0, return_inverse=True
+        )
+        for pattern_id, pattern in enumerate(patterns):
+            pattern_groups = np.flatnonzero(pattern_ids.reshape(-1) == pattern_id)
+            samples = np.concatenate(
+                [np.zeros((len(pattern_groups), 0), dtype=np.float64)]
+                + [
+                    block_sums[block_index][block_rows[block_index, pattern_groups]]
+                    for block_index in np.flatnonzero(pattern)
+                ],
+                axis=1,
+            )
+            pattern_groups = pattern_groups.tolist()
+            num_runs = samples.shape[1]
+            if num_runs:
+                p50s, p90s = np.percentile(samples, [50, 90], axis=1)
+                stats = zip(
+                    samples.sum(axis=1).tolist(),
+                    samples.mean(axis=1).tolist(),
+                    p50s.tolist(),
+                    p90s.tolist(),
+                    samples.min(axis=1).tolist(),
+                    samples.max(axis=1).tolist(),
+                )
+            else:
+                stats = zip(*[[0.0] * len(pattern_groups)] * 6)
+            for group_id, (total, mean, p50, p90, min_, max_) in zip(
+                pattern_groups, stats
+            ):
+                aggregates[group_id] = EventAggregate(
+                    key=keys[group_id],
+                    num_events=num_events[group_id],
+                    num_runs=num_runs,
+                    sum=total,
+                    mean=mean,
+                    p50=p50,
+                    p90=p90,
+                    min=min_,
+                    max=max_,
+                )
+
+        result = sorted(
+            (aggregate for aggregate in aggregates if aggregate is not None),
+            key=lambda aggregate: -aggregate.sum,
+        )
+        self._aggregates[(by, module_prefix)] = result
+        return result
+
+
 class Inspector:
     """
     APIs for examining model architecture and performance stats.
@@ -415,6 +784,9 @@ class Inspector:
 
     Private Attributes:
         _etrecord: Optional[ETRecord]. File under etrecord_path deserialized into an object.
+        _op_graph_dict: Dict[str, OperatorGraph]. Operator graphs of the ETRecord, generated the first time each is needed.
+        _debug_handle_to_op_node_maps: Dict[str, Dict[int, OperatorNode]]. Mapping from debug handle to op node for each method, read from the ETRecord index (or built from the op graph) the first time each is needed.
+        _event_index: Optional[_EventIndex]. Index over the events of event_blocks for aggregation queries, built the first time it is needed.
     """
 
     def __init__(
@@ -444,7 +816,6 @@ class Inspector:
             else None
         )
 
-        etdump = gen_etdump_object(etdump_path=etdump_path)
         if (source_time_scale == TimeScale.CYCLES) ^ (
             target_time_scale == TimeScale.CYCLES
         ):
@@ -452,36 +823,122 @@ class Inspector:
                 "For TimeScale in cycles both the source and target time scale have to be in cycles."
             )
 
+        self._etdump_path = etdump_path
         self._source_time_scale = source_time_scale
         self._target_time_scale = target_time_scale
-        self.event_blocks = EventBlock._gen_from_etdump(
-            etdump, self._source_time_scale, self._target_time_scale
+        self._op_graph_dict: Dict[str, OperatorGraph] = {}
+        self._debug_handle_to_op_node_maps: Dict[str, Dict[int, OperatorNode]] = {}
+        self._event_index: Optional[_EventIndex] = None
+
+        debug_handle_map = (
+            self._etrecord._debug_handle_map if self._etrecord is not None else None
+        )
+        # Aggregate the RunData as they are decoded from the etdump, so that the
+        # whole etdump never needs to be in memory. Runs named after a method
+        # of the ETRecord are kept in EventBlocks of their own.
+        self.event_blocks = EventBlock._gen_from_run_data(
+            gen_etdump_run_data(etdump_path=etdump_path),
+            self._source_time_scale,
+            self._target_time_scale,
+            debug_handle_map.keys() if debug_handle_map is not None else None,
         )
 
         # No additional data association can be done without ETRecord, so return early
-        if self._etrecord is None:
+        if self._etrecord is None or debug_handle_map is None:
             return
 
-        # Use the delegate map from etrecord, associate debug handles with each event
         for event_block in self.event_blocks:
-            event_block._gen_resolve_debug_handles(
-                self._etrecord._debug_handle_map[FORWARD],
-                self._etrecord._delegate_map[FORWARD]
-                if self._etrecord._delegate_map is not None
-                else None,
+            self._associate_with_etrecord(
+                event_block, event_block.method_name or self._default_method_name()
+            )
+
+    def _associate_with_etrecord(
+        self, event_block: EventBlock, method_name: str
+    ) -> None:
+        """
+        Populates the debug handles of the events of event_block, and the op graph
+        node data that they map to, from the ETRecord data of the given method.
+        """
+        if (
+            self._etrecord is None
+            or (debug_handle_map := self._etrecord._debug_handle_map) is None
+        ):
+            return
+        if method_name not in debug_handle_map:
+            log.warning(
+                f"No debug handle map found in the ETRecord for method {method_name}"
             )
+            return
 
-        # Traverse the edge dialect op graph to create mapping from debug_handle to op node
-        op_graph_dict = gen_graphs_from_etrecord(etrecord=self._etrecord)
-        debug_handle_to_op_node_map = {}
-        create_debug_handle_to_op_node_mapping(
-            op_graph_dict[EDGE_DIALECT_GRAPH_KEY],
-            debug_handle_to_op_node_map,
+        # Use the delegate map from etrecord, associate debug handles with each event
+        event_block._gen_resolve_debug_handles(
+            debug_handle_map[method_name],
+            self._etrecord._delegate_map.get(method_name)
+            if self._etrecord._delegate_map is not None
+            else None,
         )
 
-        for event_block in self.event_blocks:
-            for event in event_block.events:
-                event._associate_with_op_graph_nodes(debug_handle_to_op_node_map)
+        # Only the op graph of the methods that were run are generated
+        debug_handle_to_op_node_map = self._get_debug_handle_to_op_node_map(method_name)
+        for event in event_block.events:
+            event._associate_with_op_graph_nodes(debug_handle_to_op_node_map)
+
+    def _default_method_name(self) -> str:
+        """
+        Returns the method that EventBlocks not named after a method belong to:
+        the only method of the ETRecord if there is one, forward otherwise.
+        """
+        debug_handle_map = (
+            self._etrecord._debug_handle_map if self._etrecord is not None else None
+        )
+        if debug_handle_map is not None and len(debug_handle_map) == 1:
+            return next(iter(debug_handle_map))
+        return FORWARD
+
+    def _get_op_graph(self, graph_name: str) -> Optional[OperatorGraph]:
+        """
+        Returns the operator graph of the named ETRecord graph, generating it on
+        first use.
+        """
+        if self._etrecord is None:
+            return None
+        if graph_name not in self._op_graph_dict:
+            self._op_graph_dict.update(
+                gen_graphs_from_etrecord(
+                    etrecord=self._etrecord, graph_names=[graph_name]
+                )
+            )
+        return self._op_graph_dict.get(graph_name)
+
+    def _get_debug_handle_to_op_node_map(
+        self, method_name: str
+    ) -> Dict[int, OperatorNode]:
+        """
+        Returns the mapping from debug handle to op node of the edge dialect
+        graph of the given method, read from the index stored in the ETRecord,
+        or built by traversing the graph on first use if the ETRecord has none.
+        """
+        if method_name in self._debug_handle_to_op_node_maps:
+            return self._debug_handle_to_op_node_maps[method_name]
+
+        debug_handle_to_op_node_map = (
+            gen_debug_handle_to_op_node_map_from_etrecord(self._etrecord, method_name)
+            if self._etrecord is not None
+            else None
+        )
+        if debug_handle_to_op_node_map is None:
+            debug_handle_to_op_node_map = {}
+            op_graph = self._get_op_graph(get_edge_dialect_graph_key(method_name))
+            if op_graph is not None:
+                create_debug_handle_to_op_node_mapping(
+                    op_graph, debug_handle_to_op_node_map
+                )
+            else:
+                log.warning(
+                    f"No edge dialect graph found in the ETRecord for method {method_name}"
+                )
+        self._debug_handle_to_op_node_maps[method_name] = debug_handle_to_op_node_map
+        return debug_handle_to_op_node_map
 
     def print_data_tabular(self, include_units: bool = True) -> None:
         """
@@ -522,7 +979,17 @@ class Inspector:
         except:
             print(tabulate(filtered_df, headers="keys", tablefmt="fancy_grid"))
 
-    # TODO: write unit test
+    def _get_event_index(self) -> _EventIndex:
+        """
+        Returns the index over the events of event_blocks, rebuilding it if
+        event_blocks was replaced since it was built.
+        """
+        if self._event_index is None or (
+            self._event_index.event_blocks is not self.event_blocks
+        ):
+            self._event_index = _EventIndex(self.event_blocks)
+        return self._event_index
+
     def find_total_for_module(self, module_name: str) -> float:
         """
         Returns the total average compute time of all operators within the specified module.
@@ -534,27 +1001,199 @@ class Inspector:
             Sum of the average compute time (in seconds) of all operators within the module with "module_name".
         """
 
+        # Match against the distinct module names instead of every event
+        event_index = self._get_event_index()
+        event_ids = set()
+        for module in event_index.module_names:
+            if module_name in module:
+                event_ids.update(event_index.module_events[module])
+
         total = 0.0
-        for block in self.event_blocks:
-            for event in block.events:
-                module_hierarchy = event.module_hierarchy.values()
-                for hierarchy in module_hierarchy:
-                    if not hierarchy:
-                        continue
-                    found = any(module_name in key for key in hierarchy.keys())
-                    if found:
-                        total += event.perf_data.avg
-                        break
+        for event_id in sorted(event_ids):
+            total += event_index.events[event_id].perf_data.avg
         return total
 
+    def aggregate(
+        self,
+        by: AggregateBy = AggregateBy.OP_TYPE,
+        top_k: Optional[int] = None,
+        module_prefix: Optional[str] = None,
+    ) -> List[EventAggregate]:
+        r"""
+        Groups the events of all EventBlocks by op type, module, delegate backend or
+        debug handle, and returns the latency statistics of each group across runs,
+        most expensive first.
+
+        Framework events and OPERATOR_CALL events are not included. The results are
+        cached, so repeated queries, e.g. for different top_k, are cheap.
+
+        Args:
+            by: The attribute of the events to group them by.
+            top_k: If provided, only the top_k groups with the highest total latency are returned.
+            module_prefix: If provided, only the events within modules whose names start with module_prefix are included.
+
+        Returns:
+            A list of `EventAggregate`\ s, sorted by decreasing total latency.
+        """
+        aggregates = self._get_event_index().aggregate(by, module_prefix)
+        return aggregates[:top_k] if top_k is not None else list(aggregates)
+
     def get_op_list(
         self, event_block: str, show_delegated_ops: Optional[bool] = True
     ) -> Dict[str, List[Event]]:
         """
         Return a map of op_types to Events of that op_type
+
+        Args:
+            event_block: Name of the EventBlock to get the Events from.
+            show_delegated_ops: Whether to include delegated Events.
+
+        Returns:
+            A dict from each op type to the Events in the EventBlock with that op type, in order. Framework events and OPERATOR_CALL events are not included.
         """
-        # TODO: implement
-        return {}
+        op_list: Dict[str, List[Event]] = {}
+        for block in self.event_blocks:
+            if block.name != event_block:
+                continue
+            for event in block.events:
+                if event.name in EXCLUDED_EVENTS_FROM_AGGREGATION:
+                    continue
+                if not show_delegated_ops and event.is_delegated_op:
+                    continue
+                for op_type in dict.fromkeys(event.op_types):
+                    op_list.setdefault(op_type, []).append(event)
+        return op_list
+
+    def write_chrome_trace(self, path: str) -> None:
+        """
+        Writes the profiling events of the ETDump as a timeline in the Chrome Trace Event
+        Format, which can be opened in chrome://tracing or the Perfetto UI.
+
+        The runs of each name (e.g. of each method) are a process with a track for each
+        chain, and a track for each delegate call where delegated events are nested by
+        their time ranges. The bytes allocated from each allocator during a run are
+        shown as counters. If an ETRecord was provided, events are named after the ops
+        that they correspond to, and list their debug handles and op types.
+
+        The ETDump is read again one RunData at a time and the trace is written as it is
+        read, so that neither needs to fit in memory.
+
+        Args:
+            path: Path of the trace file to write.
+
+        Returns:
+            None
+        """
+        # Trace timestamps are in us. Cycles are shown as us.
+        to_us = (
+            1.0
+            if self._source_time_scale == TimeScale.CYCLES
+            else time_scale_dict[TimeScale.US]
+            / time_scale_dict[self._source_time_scale]
+        )
+        debug_handle_map = (
+            self._etrecord._debug_handle_map if self._etrecord is not None else None
+        )
+
+        # The events with the ETRecord data of each signature, by method
+        trace_events: Dict[Tuple[Optional[str], ProfileEventSignature], Event] = {}
+        pids: Dict[str, int] = {}
+        tids: Dict[Tuple[int, Tuple[Union[str, int], ...]], int] = {}
+        with ChromeTraceWriter(path) as writer:
+            for run in gen_etdump_run_data(etdump_path=self._etdump_path):
+                if (run_events := run.events) is None:
+                    continue
+                if (pid := pids.get(run.name)) is None:
+                    pid = pids[run.name] = len(pids)
+                    writer.set_process_name(pid, run.name)
+                method_name = (
+                    run.name
+                    if debug_handle_map is not None and run.name in debug_handle_map
+                    else None
+                )
+                allocator_names = [allocator.name for allocator in run.allocators or []]
+
+                allocated_bytes: Dict[str, int] = {}
+                allocations_pending = False
+                end_ts = 0.0
+                for run_event in run_events:
+                    if (allocation_event := run_event.allocation_event) is not None:
+                        allocator_id = allocation_event.allocator_id
+                        allocator_name = (
+                            allocator_names[allocator_id]
+                            if 0 <= allocator_id < len(allocator_names)
+                            else f"allocator {allocator_id}"
+                        )
+                        allocated_bytes[allocator_name] = (
+                            allocated_bytes.get(allocator_name, 0)
+                            + allocation_event.allocation_size
+                        )
+                        allocations_pending = True
+                        continue
+                    if (profile_event := run_event.profile_event) is None:
+                        continue
+
+                    start_ts = profile_event.start_time * to_us
+                    end_ts = profile_event.end_time * to_us
+                    # Allocations have no timestamps, so they are shown at the start
+                    # of the next profiling event
+                    if allocations_pending:
+                        writer.add_counter(
+                            "allocated bytes", start_ts, dict(allocated_bytes), pid
+                        )
+                        allocations_pending = False
+
+                    signature = ProfileEventSignature._gen_from_event(profile_event)
+                    event = trace_events.get((method_name, signature))
+                    if event is None:
+                        event = Event._gen_from_perf_data(signature, PerfData([]))
+                        self._associate_with_etrecord(
+                            EventBlock(name="", events=[event]),
+                            method_name or self._default_method_name(),
+                        )
+                        trace_events[(method_name, signature)] = event
+
+                    # Delegated events go on a track of their delegate call
+                    chain_id = profile_event.chain_id
+                    track = (
+                        (chain_id, signature.instruction_id)
+                        if event.is_delegated_op
+                        else (chain_id,)
+                    )
+                    if (tid := tids.get((pid, track))) is None:
+                        tid = tids[(pid, track)] = len(tids)
+                        delegate = (
+                            event.delegate_backend_name or signature.instruction_id
+                        )
+                        writer.set_thread_name(
+                            pid,
+                            tid,
+                            f"chain {chain_id} delegate {delegate}"
+                            if event.is_delegated_op
+                            else f"chain {chain_id}",
+                        )
+
+                    args = {
+                        "event_name": event.name,
+                        "instruction_id": signature.instruction_id,
+                        "delegate_debug_identifier": event.delegate_debug_identifier,
+                        "delegate_backend_name": event.delegate_backend_name,
+                        "debug_handles": event.debug_handles,
+                        "op_types": event.op_types or None,
+                    }
+                    writer.add_complete_event(
+                        ", ".join(event.stack_traces.keys()) or event.name,
+                        start_ts,
+                        end_ts - start_ts,
+                        pid,
+                        tid,
+                        args={key: val for key, val in args.items() if val is not None},
+                    )
+
+                if allocations_pending:
+                    writer.add_counter(
+                        "allocated bytes", end_ts, dict(allocated_bytes), pid
+                    )
 
     def write_tensorboard_artifact(self, path: str) -> None:
         """
@@ -20,6 +20,11 @@ if __name__ == "__main__":
         required=False,
         help="Provide an optional ETRecord file path.",
     )
+    parser.add_argument(
+        "--chrome_trace_path",
+        required=False,
+        help="Provide an optional path to write a Chrome trace of the ETDump to.",
+    )
 
     args = parser.parse_args()
 
@@ -27,3 +32,5 @@ if __name__ == "__main__":
         etdump_path=args.etdump_path, etrecord_path=args.etrecord_path
     )
     inspector.print_data_tabular()
+    if args.chrome_trace_path is not None:
+        inspector.write_chrome_trace(args.chrome_trace_path)
@@ -5,6 +5,7 @@
 # LICENSE file in the root directory of this source tree.
 
 # pyre-strict
+import random
 import unittest
 from typing import List, Optional, Tuple, Union
 
@@ -139,6 +140,122 @@ class TestEventBlock(unittest.TestCase):
         }
         self.assertSetEqual(run_counts, {(1, 2), (2, 1)})
 
+    def test_gen_from_etdump_perf_data(self) -> None:
+        """
+        Test that the summary statistics computed for all events of an EventBlock
+        at once match those computed from the raw data of each event
+        """
+        rng = random.Random(0)
+        run_data = []
+        durations: List[List[int]] = [[] for _ in range(10)]
+        for _ in range(20):
+            events = []
+            for instruction_id in range(10):
+                start_time = rng.randint(0, 1000000)
+                durations[instruction_id].append(rng.randint(0, 1000000))
+                profile_event = TestEventBlock._gen_sample_profile_event(
+                    name=f"op_{instruction_id}",
+                    instruction_id=instruction_id,
+                    time=(start_time, start_time + durations[instruction_id][-1]),
+                )
+                events.append(
+                    flatcc.Event(
+                        allocation_event=None,
+                        debug_event=None,
+                        profile_event=profile_event,
+                    )
+                )
+            run_data.append(flatcc.RunData(name="run", allocators=[], events=events))
+        etdump = ETDumpFlatCC(version=0, run_data=run_data)
+
+        blocks = EventBlock._gen_from_etdump(etdump)
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(len(blocks[0].events), 10)
+        for instruction_id, event in enumerate(blocks[0].events):
+            self.assertEqual(event.name, f"op_{instruction_id}")
+            self.assertEqual(
+                event.perf_data.raw,
+                [float(duration) / 1000000 for duration in durations[instruction_id]],
+            )
+            expected = PerfData(event.perf_data.raw)
+            for stat in ("p50", "p90", "avg", "min", "max"):
+                self.assertEqual(
+                    getattr(event.perf_data, stat), getattr(expected, stat), stat
+                )
+
+    def test_gen_from_run_data_method_names(self) -> None:
+        """
+        Test that RunData named after a method are kept in EventBlocks of their
+        own, even when they have the same profile events as other RunData
+        """
+        run_data = []
+        for name in ("encoder", "decoder", "decoder", "run"):
+            profile_event = TestEventBlock._gen_sample_profile_event(
+                name="profile_1", instruction_id=1, time=(0, 1)
+            )
+            run_data.append(
+                flatcc.RunData(
+                    name=name,
+                    allocators=[],
+                    events=[
+                        flatcc.Event(
+                            allocation_event=None,
+                            debug_event=None,
+                            profile_event=profile_event,
+                        )
+                    ],
+                )
+            )
+
+        blocks = EventBlock._gen_from_run_data(
+            run_data, method_names={"encoder", "decoder"}
+        )
+        self.assertEqual(
+            [
+                (block.method_name, len(block.events[0].perf_data.raw))
+                for block in blocks
+            ],
+            [("encoder", 1), ("decoder", 2), (None, 1)],
+        )
+
+    def test_gen_from_run_data_repeated_signature(self) -> None:
+        """
+        Test that a profile event repeated within a run keeps its first position
+        but takes its duration from the last occurrence, and that runs without
+        events are skipped
+        """
+
+        def _event(
+            name: str, instruction_id: int, time: Tuple[int, int]
+        ) -> flatcc.Event:
+            return flatcc.Event(
+                allocation_event=None,
+                debug_event=None,
+                profile_event=TestEventBlock._gen_sample_profile_event(
+                    name=name, instruction_id=instruction_id, time=time
+                ),
+            )
+
+        run_data = [
+            flatcc.RunData(name="run", allocators=[], events=None),
+            flatcc.RunData(
+                name="run",
+                allocators=[],
+                events=[
+                    _event("op_0", 0, (0, 1)),
+                    _event("op_1", 1, (1, 3)),
+                    _event("op_0", 0, (3, 7)),
+                ],
+            ),
+        ]
+
+        blocks = EventBlock._gen_from_run_data(run_data)
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(
+            [(event.name, event.perf_data.raw) for event in blocks[0].events],
+            [("op_0", [4.0 / 1000000]), ("op_1", [2.0 / 1000000])],
+        )
+
     def test_inspector_event_generation(self) -> None:
         """
         Test Inspector.Event derivation from various ProfileEvent cases
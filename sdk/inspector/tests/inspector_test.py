@@ -4,16 +4,19 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import json
 import random
 import statistics
 import tempfile
 import unittest
 from contextlib import redirect_stdout
 
-from typing import List
+from typing import List, Optional, Tuple
 
 from unittest.mock import patch
 
+import executorch.sdk.etdump.schema_flatcc as flatcc
+
 from executorch.exir import ExportedProgram
 from executorch.sdk.debug_format.et_schema import OperatorNode
 from executorch.sdk.etrecord import generate_etrecord, parse_etrecord
@@ -21,7 +24,14 @@ from executorch.sdk.etrecord.tests.etrecord_test import TestETRecord
 
 from executorch.sdk.inspector import inspector
 
-from executorch.sdk.inspector.inspector import Event, EventBlock, Inspector, PerfData
+from executorch.sdk.inspector.inspector import (
+    AggregateBy,
+    Event,
+    EventAggregate,
+    EventBlock,
+    Inspector,
+    PerfData,
+)
 
 
 OP_TYPE = "aten::add"
@@ -56,9 +66,9 @@ class TestInspector(unittest.TestCase):
         with patch.object(
             inspector, "parse_etrecord", return_value=None
         ) as mock_parse_etrecord, patch.object(
-            inspector, "gen_etdump_object", return_value=None
+            inspector, "gen_etdump_run_data", return_value=iter([])
         ) as mock_gen_etdump, patch.object(
-            EventBlock, "_gen_from_etdump"
+            EventBlock, "_gen_from_run_data"
         ) as mock_gen_from_etdump, patch.object(
             inspector, "gen_graphs_from_etrecord"
         ) as mock_gen_graphs_from_etrecord:
@@ -78,8 +88,8 @@ class TestInspector(unittest.TestCase):
     def test_inspector_print_data_tabular(self):
         # Create a context manager to patch functions called by Inspector.__init__
         with patch.object(inspector, "parse_etrecord", return_value=None), patch.object(
-            inspector, "gen_etdump_object", return_value=None
-        ), patch.object(EventBlock, "_gen_from_etdump"), patch.object(
+            inspector, "gen_etdump_run_data", return_value=iter([])
+        ), patch.object(EventBlock, "_gen_from_run_data"), patch.object(
             inspector, "gen_graphs_from_etrecord"
         ):
             # Call the constructor of Inspector
@@ -97,6 +107,210 @@ class TestInspector(unittest.TestCase):
             with redirect_stdout(None):
                 inspector_instance.print_data_tabular()
 
+    def test_inspector_get_op_list(self):
+        inspector_instance = self._gen_mock_inspector()
+        events = [
+            Event(name="op_0", perf_data=PerfData([1.0]), op_types=["add"]),
+            Event(
+                name="op_1",
+                perf_data=PerfData([2.0]),
+                op_types=["add", "mul"],
+                is_delegated_op=True,
+            ),
+            Event(name="OPERATOR_CALL", perf_data=PerfData([3.0]), op_types=["add"]),
+        ]
+        inspector_instance.event_blocks = [
+            EventBlock(name=EVENT_BLOCK_NAME, events=events)
+        ]
+
+        self.assertEqual(
+            inspector_instance.get_op_list(EVENT_BLOCK_NAME),
+            {"add": [events[0], events[1]], "mul": [events[1]]},
+        )
+        self.assertEqual(
+            inspector_instance.get_op_list(EVENT_BLOCK_NAME, show_delegated_ops=False),
+            {"add": [events[0]]},
+        )
+        self.assertEqual(inspector_instance.get_op_list("other_block"), {})
+
+    def test_inspector_aggregate(self):
+        inspector_instance = self._gen_mock_inspector()
+        encoder = {"L__self___encoder": ("encoder", None)}
+        encoder_layer = {
+            **encoder,
+            "L__self___encoder_layer": ("encoder.layer", None),
+        }
+        decoder = {"L__self___decoder": ("decoder", None)}
+        inspector_instance.event_blocks = [
+            EventBlock(
+                name="block_0",
+                events=[
+                    Event(
+                        name="op_0",
+                        perf_data=PerfData([1.0, 2.0]),
+                        op_types=["add"],
+                        module_hierarchy={"add": encoder_layer},
+                    ),
+                    Event(
+                        name="op_1",
+                        perf_data=PerfData([3.0, 4.0]),
+                        op_types=["mul"],
+                        module_hierarchy={"mul": encoder},
+                        delegate_backend_name="backend",
+                    ),
+                    Event(
+                        name="OPERATOR_CALL",
+                        perf_data=PerfData([5.0, 5.0]),
+                        op_types=["mul"],
+                        module_hierarchy={"mul": encoder},
+                    ),
+                ],
+            ),
+            EventBlock(
+                name="block_1",
+                events=[
+                    Event(
+                        name="op_0",
+                        perf_data=PerfData([6.0]),
+                        op_types=["add"],
+                        module_hierarchy={"add": decoder},
+                    ),
+                ],
+            ),
+        ]
+
+        def summary(aggregates: List[EventAggregate]) -> List[Tuple]:
+            return [
+                (aggregate.key, aggregate.num_events, aggregate.num_runs, aggregate.sum)
+                for aggregate in aggregates
+            ]
+
+        # The latency of a group in a run is the sum over its events, and the
+        # runs of all EventBlocks are samples
+        aggregates = inspector_instance.aggregate(AggregateBy.OP_TYPE)
+        self.assertEqual(summary(aggregates), [("add", 2, 3, 9.0), ("mul", 1, 2, 7.0)])
+        self.assertEqual(aggregates[0].p50, 2.0)
+        self.assertEqual(aggregates[0].min, 1.0)
+        self.assertEqual(aggregates[0].max, 6.0)
+
+        self.assertEqual(
+            summary(inspector_instance.aggregate(AggregateBy.MODULE)),
+            [
+                ("L__self___encoder", 2, 2, 10.0),
+                ("L__self___decoder", 1, 1, 6.0),
+                ("L__self___encoder_layer", 1, 2, 3.0),
+            ],
+        )
+        self.assertEqual(
+            summary(
+                inspector_instance.aggregate(
+                    AggregateBy.OP_TYPE, top_k=1, module_prefix="L__self___encoder"
+                )
+            ),
+            [("mul", 1, 2, 7.0)],
+        )
+        self.assertEqual(
+            summary(inspector_instance.aggregate(AggregateBy.DELEGATE_BACKEND)),
+            [("backend", 1, 2, 7.0)],
+        )
+
+    def test_inspector_find_total_for_module(self):
+        inspector_instance = self._gen_mock_inspector()
+        inspector_instance.event_blocks = [
+            EventBlock(
+                name=EVENT_BLOCK_NAME,
+                events=[
+                    Event(
+                        name="op_0",
+                        perf_data=PerfData([1.0, 3.0]),
+                        module_hierarchy={
+                            "add": {"L__self___encoder_layer": ("encoder.layer", None)}
+                        },
+                    ),
+                    Event(
+                        name="op_1",
+                        perf_data=PerfData([4.0]),
+                        module_hierarchy={
+                            "mul": {"L__self___decoder": ("decoder", None)}
+                        },
+                    ),
+                ],
+            )
+        ]
+
+        self.assertEqual(inspector_instance.find_total_for_module("encoder"), 2.0)
+        self.assertEqual(inspector_instance.find_total_for_module("L__self__"), 6.0)
+        self.assertEqual(inspector_instance.find_total_for_module("other"), 0.0)
+
+    def test_inspector_write_chrome_trace(self):
+        inspector_instance = self._gen_mock_inspector()
+
+        def gen_event(
+            profile_event: Optional[flatcc.ProfileEvent] = None,
+            allocation_event: Optional[flatcc.AllocationEvent] = None,
+        ) -> flatcc.Event:
+            return flatcc.Event(
+                profile_event=profile_event,
+                allocation_event=allocation_event,
+                debug_event=None,
+            )
+
+        run_data = [
+            flatcc.RunData(
+                name="forward",
+                allocators=[flatcc.Allocator("planned")],
+                events=[
+                    gen_event(allocation_event=flatcc.AllocationEvent(0, 64)),
+                    gen_event(
+                        flatcc.ProfileEvent(
+                            "OPERATOR_CALL", 0, 1, -1, "", "", 1000, 3000
+                        )
+                    ),
+                    gen_event(
+                        flatcc.ProfileEvent(
+                            "DELEGATE_CALL", 0, 2, -1, "", "", 3000, 9000
+                        )
+                    ),
+                    gen_event(flatcc.ProfileEvent("", 0, 2, 7, "", "", 4000, 8000)),
+                ],
+            )
+        ]
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = tmpdirname + "/trace.json"
+            with patch.object(
+                inspector, "gen_etdump_run_data", return_value=iter(run_data)
+            ):
+                inspector_instance.write_chrome_trace(path)
+            with open(path) as f:
+                trace_events = json.load(f)["traceEvents"]
+
+        # Timestamps in ns are written in us, delegated events on a track of
+        # their own
+        complete_events = [
+            (event["name"], event["ts"], event["dur"], event["tid"])
+            for event in trace_events
+            if event["ph"] == "X"
+        ]
+        self.assertEqual(
+            complete_events,
+            [
+                ("OPERATOR_CALL", 1.0, 2.0, 0),
+                ("DELEGATE_CALL", 3.0, 6.0, 0),
+                ("7", 4.0, 4.0, 1),
+            ],
+        )
+        thread_names = {
+            event["tid"]: event["args"]["name"]
+            for event in trace_events
+            if event["name"] == "thread_name"
+        }
+        self.assertEqual(thread_names, {0: "chain 0", 1: "chain 0 delegate 2"})
+        counters = [
+            (event["ts"], event["args"]) for event in trace_events if event["ph"] == "C"
+        ]
+        self.assertEqual(counters, [(1.0, {"planned": 64})])
+
     def test_inspector_associate_with_op_graph_nodes_single_debug_handle(self):
         # Test on an event with a single debug handle
         debug_handle = 111
@@ -184,8 +398,8 @@ class TestInspector(unittest.TestCase):
     def test_inspector_get_exported_program(self):
         # Create a context manager to patch functions called by Inspector.__init__
         with patch.object(inspector, "parse_etrecord", return_value=None), patch.object(
-            inspector, "gen_etdump_object", return_value=None
-        ), patch.object(EventBlock, "_gen_from_etdump"), patch.object(
+            inspector, "gen_etdump_run_data", return_value=iter([])
+        ), patch.object(EventBlock, "_gen_from_run_data"), patch.object(
             inspector, "gen_graphs_from_etrecord"
         ), patch.object(
             inspector, "create_debug_handle_to_op_node_mapping"
@@ -218,6 +432,51 @@ class TestInspector(unittest.TestCase):
                     )
                 )
 
+    def test_inspector_associate_with_etrecord_of_multiple_methods(self):
+        edge_output, et_output = TestETRecord().get_test_model_with_multiple_methods()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(tmpdirname + "/etrecord.bin", edge_output, et_output)
+
+            with patch.object(inspector, "gen_etdump_run_data", return_value=iter([])):
+                inspector_instance = Inspector(
+                    etdump_path=ETDUMP_PATH,
+                    etrecord_path=tmpdirname + "/etrecord.bin",
+                )
+
+        # Events of the second method resolve against its own graph
+        handle_map = et_output.debug_handle_map["forward2"]
+        event_block = EventBlock(
+            name=EVENT_BLOCK_NAME,
+            events=[
+                Event(
+                    name=f"op_{instruction_id}",
+                    perf_data=PerfData([]),
+                    _instruction_id=int(instruction_id),
+                )
+                for instruction_id in handle_map
+            ],
+            method_name="forward2",
+        )
+        inspector_instance._associate_with_etrecord(event_block, "forward2")
+
+        for event in event_block.events:
+            self.assertEqual(
+                event.debug_handles, handle_map[str(event._instruction_id)]
+            )
+        op_types = [op for event in event_block.events for op in event.op_types]
+        self.assertTrue(any("mul" in op for op in op_types))
+        self.assertFalse(any("sin" in op for op in op_types))
+
+    def _gen_mock_inspector(self) -> Inspector:
+        # Create a context manager to patch functions called by Inspector.__init__
+        with patch.object(inspector, "parse_etrecord", return_value=None), patch.object(
+            inspector, "gen_etdump_run_data", return_value=iter([])
+        ), patch.object(EventBlock, "_gen_from_run_data", return_value=[]):
+            return Inspector(
+                etdump_path=ETDUMP_PATH,
+                etrecord_path=ETRECORD_PATH,
+            )
+
     def _gen_random_float_list(self) -> List[float]:
         return [random.uniform(0, 10) for _ in range(RAW_DATA_SIZE)]
 
@@ -21,7 +21,9 @@ from executorch.sdk.etrecord.tests.etrecord_test import TestETRecord
 from executorch.sdk.inspector._inspector_utils import (
     create_debug_handle_to_op_node_mapping,
     EDGE_DIALECT_GRAPH_KEY,
+    gen_debug_handle_to_op_node_map_from_etrecord,
     gen_graphs_from_etrecord,
+    get_edge_dialect_graph_key,
 )
 
 
@@ -50,6 +52,26 @@ class TestInspectorUtils(unittest.TestCase):
             )
             self.assertTrue(isinstance(graphs[EDGE_DIALECT_GRAPH_KEY], FXOperatorGraph))
 
+    def test_gen_graphs_from_etrecord_graph_names(self):
+        captured_output, edge_output, et_output = TestETRecord().get_test_model()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(
+                tmpdirname + "/etrecord.bin",
+                edge_output,
+                et_output,
+                {
+                    "aten_dialect_output": captured_output,
+                },
+            )
+
+            etrecord = parse_etrecord(tmpdirname + "/etrecord.bin")
+
+            graphs = gen_graphs_from_etrecord(
+                etrecord, graph_names=[get_edge_dialect_graph_key("forward")]
+            )
+
+            self.assertEqual(list(graphs.keys()), [EDGE_DIALECT_GRAPH_KEY])
+
     def test_create_debug_handle_to_op_node_mapping(self):
         debug_handle_to_op_node_map = {}
         graph, expected_mapping = gen_mock_operator_graph_with_expected_map()
@@ -57,6 +79,40 @@ class TestInspectorUtils(unittest.TestCase):
 
         self.assertEqual(debug_handle_to_op_node_map, expected_mapping)
 
+    def test_gen_debug_handle_to_op_node_map_from_etrecord(self):
+        edge_output, et_output = TestETRecord().get_test_model_with_multiple_methods()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(tmpdirname + "/etrecord.bin", edge_output, et_output)
+
+            etrecord = parse_etrecord(tmpdirname + "/etrecord.bin")
+
+        for method_name in ("forward", "forward2"):
+            graph_key = get_edge_dialect_graph_key(method_name)
+            expected_mapping = {}
+            create_debug_handle_to_op_node_mapping(
+                gen_graphs_from_etrecord(etrecord, graph_names=[graph_key])[graph_key],
+                expected_mapping,
+            )
+
+            # The stored index has the same node data as the op graph
+            mapping = gen_debug_handle_to_op_node_map_from_etrecord(
+                etrecord, method_name
+            )
+            self.assertEqual(
+                {
+                    debug_handle: (node.name, node.op, node.metadata)
+                    for debug_handle, node in mapping.items()
+                },
+                {
+                    debug_handle: (node.name, node.op, node.metadata)
+                    for debug_handle, node in expected_mapping.items()
+                },
+            )
+
+        self.assertIsNone(
+            gen_debug_handle_to_op_node_map_from_etrecord(etrecord, "missing_method")
+        )
+
 
 def gen_mock_operator_graph_with_expected_map() -> Tuple[
     OperatorGraph, Dict[int, OperatorNode]
@@ -63,6 +63,7 @@ class ExportedModule:
         ignore_to_out_var_failure: bool = False,
         dynamic_memory_planning_mode: DynamicMemoryPlanningMode = DynamicMemoryPlanningMode.UPPER_BOUND,
         capture_config=None,
+        extract_constant_segment: bool = False,
     ) -> "ExportedModule":
         """
         Creates a new ExportedModule for the specified module class.
@@ -74,6 +75,8 @@ class ExportedModule:
                 functional op does not have an out variant.
             dynamic_memory_planning_mode: The dynamic memory planning mode to
                 use.
+            extract_constant_segment: Whether to store constant tensor data in
+                a segment instead of in the flatbuffer.
         """
 
         def get_inputs_adapter(
@@ -166,6 +169,7 @@ class ExportedModule:
                     dynamic_memory_planning_mode=dynamic_memory_planning_mode,
                     memory_planning_pass=memory_planning_pass,
                     to_out_var_pass=ToOutVarPass(ignore_to_out_var_failure),
+                    extract_constant_segment=extract_constant_segment,
                 )
             )
         )
@@ -130,6 +130,14 @@ class ModuleLinear(torch.nn.Module):
         return (torch.ones(2, 2, dtype=torch.float),)
 
 
+class ModuleLinearConstantSegment(ModuleLinear):
+    """ModuleLinear with its constant tensor data stored in a segment."""
+
+    @staticmethod
+    def get_export_kwargs() -> Dict[str, Any]:
+        return {"extract_constant_segment": True}
+
+
 class ModuleMultipleEntry(torch.nn.Module):
     def __init__(self):
         super().__init__()
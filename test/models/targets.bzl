@@ -62,6 +62,7 @@ def define_common_targets():
         "ModuleAdd",
         "ModuleBasic",
         "ModuleLinear",
+        "ModuleLinearConstantSegment",
         "ModuleMultipleEntry",
         "ModuleIndex",
         "ModuleDynamicCatUnallocatedIO",